@@ -1,18 +1,206 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .ledger import InsufficientBalances, adjust_balances, refund_spends
 from .models import (
     User, DimStudent, Wallet, WalletTransaction,
     Product, Cart, CartItem, Order, OrderItem,
-    QRScanLog, Notification
+    QRScanLog, Notification, OutboxEvent
 )
 
-admin.site.register(User)
-admin.site.register(DimStudent)
-admin.site.register(Wallet)
-admin.site.register(WalletTransaction)
-admin.site.register(Product)
-admin.site.register(Cart)
-admin.site.register(CartItem)
-admin.site.register(Order)
-admin.site.register(OrderItem)
-admin.site.register(QRScanLog)
-admin.site.register(Notification)
\ No newline at end of file
+# Below this many rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_BELOW = 10_000
+
+
+def estimated_row_count(queryset):
+    """Cheap row estimate for an unfiltered table, or None if there is none."""
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else None  # -1 until the first ANALYZE
+    # Elsewhere the id range, two index lookups, stands in for the count
+    bounds = model._base_manager.using(queryset.db).aggregate(low=Min('pk'), high=Max('pk'))
+    return bounds['high'] - bounds['low'] + 1 if bounds['high'] is not None else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the big ledger tables: the unfiltered changelist shows an
+    estimated total instead of running COUNT(*) over the whole table.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list)
+            if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skips the second, unfiltered COUNT(*)
+    list_per_page = 50
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'first_name', 'last_name', 'user_type', 'gender', 'is_active')
+    list_filter = ('user_type', 'gender', 'is_active')
+    search_fields = ('username', 'first_name', 'last_name', 'email')
+
+
+@admin.register(DimStudent)
+class DimStudentAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'level', 'streak', 'last_activity')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+
+
+class AdjustBalanceForm(forms.Form):
+    amount = forms.IntegerField(help_text='Points to add; negative to deduct.')
+    reason = forms.CharField(max_length=200)
+
+    def clean_amount(self):
+        if self.cleaned_data['amount'] == 0:
+            raise forms.ValidationError('Amount must not be zero.')
+        return self.cleaned_data['amount']
+
+
+@admin.register(Wallet)
+class WalletAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'balance', 'opening_balance', 'last_updated')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    # Balances change through adjust_selected_balances, which writes the ledger row
+    readonly_fields = ('balance', 'opening_balance', 'opening_balance_at')
+    actions = ['adjust_selected_balances']
+
+    @admin.action(description='Adjust balances of selected wallets')
+    def adjust_selected_balances(self, request, queryset):
+        form = AdjustBalanceForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            user_ids = list(queryset.values_list('user_id', flat=True))
+            try:
+                adjust_balances(user_ids, form.cleaned_data['amount'], form.cleaned_data['reason'])
+            except InsufficientBalances as exc:
+                short = User.objects.filter(pk__in=exc.user_ids).order_by('username').values_list('username', flat=True)
+                self.message_user(
+                    request, f"Nothing was adjusted: the deduction exceeds the balance of {', '.join(short)}.",
+                    messages.ERROR,
+                )
+                return None
+            self.message_user(
+                request, f"Adjusted {len(user_ids)} wallet(s) by {form.cleaned_data['amount']} points.",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(request, 'admin/api/wallet/adjust_balances.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Adjust balances',
+            'opts': self.model._meta,
+            'form': form,
+            'wallets': queryset.select_related('user'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+@admin.register(WalletTransaction)
+class WalletTransactionAdmin(LargeTableAdmin):
+    list_display = ('id', 'wallet', 'transaction_type', 'amount', 'description', 'timestamp')
+    list_select_related = ('wallet__user',)
+    list_filter = ('transaction_type',)
+    raw_id_fields = ('wallet', 'refund_of')
+    date_hierarchy = 'timestamp'
+    actions = ['refund_selected']
+
+    # Rows are written by the ledger along with the balance they move; an
+    # edited or hand-added row would no longer add up to Wallet.balance
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Refund selected spend transactions')
+    def refund_selected(self, request, queryset):
+        refunded = refund_spends(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Refunded {refunded} transaction(s).', messages.SUCCESS)
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'price_in_points', 'stock')
+    search_fields = ('name',)
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'quantity', 'is_selected')
+    list_select_related = ('product', 'cart__user')
+    raw_id_fields = ('cart',)
+    autocomplete_fields = ('product',)
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'total_points', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('status',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'points_spent')
+    list_select_related = ('product', 'order__user')
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('product',)
+
+
+@admin.register(QRScanLog)
+class QRScanLogAdmin(LargeTableAdmin):
+    list_display = ('__str__', 'points_given', 'timestamp')
+    list_select_related = ('user', 'scanned_by')
+    autocomplete_fields = ('user', 'scanned_by')
+    date_hierarchy = 'timestamp'
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('__str__', 'message', 'is_read', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('is_read',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdmin):
+    list_display = ('id', 'topic', 'status', 'attempts', 'created_at', 'dispatched_at')
+    list_filter = ('status', 'topic')
+    readonly_fields = ('topic', 'payload', 'created_at', 'dispatched_at', 'last_error')
+    actions = ['retry_selected']
+
+    @admin.action(description='Retry selected events now')
+    def retry_selected(self, request, queryset):
+        retried = queryset.exclude(status='done').update(status='pending', available_at=timezone.now())
+        self.message_user(request, f'Queued {retried} event(s) for retry.', messages.SUCCESS)
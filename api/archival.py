@@ -0,0 +1,101 @@
+"""
+Ledger archival.
+
+WalletTransaction and QRScanLog rows older than the horizon are moved to
+ArchivedWalletTransaction and ArchivedQRScanLog in batches of
+LEDGER_ARCHIVE_BATCH_SIZE rows, each batch in its own short transaction so
+live awards never wait long for a lock. Archived transactions are first
+folded into Wallet.opening_balance, so the balance always equals the
+opening balance plus the signed sum of the live rows.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .ledger import signed_amount
+from .models import (
+    ArchivedQRScanLog, ArchivedWalletTransaction, JobCheckpoint, QRScanLog, Wallet, WalletTransaction,
+)
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'LEDGER_ARCHIVE_AFTER_DAYS', 365)
+ARCHIVE_BATCH_SIZE = getattr(settings, 'LEDGER_ARCHIVE_BATCH_SIZE', 1000)
+CHECKPOINT_NAME = 'archive_ledger'
+
+TRANSACTION_FIELDS = ('id', 'wallet_id', 'amount', 'transaction_type', 'description', 'timestamp')
+SCAN_FIELDS = ('id', 'user_id', 'scanned_by_id', 'points_given', 'timestamp')
+
+
+def archive_horizon(days=ARCHIVE_AFTER_DAYS, now=None):
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _archive_transactions_batch(horizon, batch_size):
+    with transaction.atomic():
+        rows = list(
+            WalletTransaction.objects.filter(timestamp__lt=horizon)
+            .order_by('id').values(*TRANSACTION_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        totals = defaultdict(int)
+        for row in rows:
+            totals[row['wallet_id']] += signed_amount(row['transaction_type'], row['amount'])
+        by_total = defaultdict(list)
+        for wallet_id, total in totals.items():
+            by_total[total].append(wallet_id)
+        for total, wallet_ids in by_total.items():
+            Wallet.objects.filter(pk__in=wallet_ids).update(
+                opening_balance=F('opening_balance') + total,
+                opening_balance_at=Greatest(Coalesce('opening_balance_at', Value(horizon)), Value(horizon)),
+            )
+
+        ArchivedWalletTransaction.objects.bulk_create([ArchivedWalletTransaction(**row) for row in rows])
+        WalletTransaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def _archive_scans_batch(horizon, batch_size):
+    with transaction.atomic():
+        rows = list(
+            QRScanLog.objects.filter(timestamp__lt=horizon)
+            .order_by('id').values(*SCAN_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedQRScanLog.objects.bulk_create([ArchivedQRScanLog(**row) for row in rows])
+        QRScanLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_ledger(horizon=None, batch_size=ARCHIVE_BATCH_SIZE, pause=0.0, max_batches=None):
+    """
+    Archive everything older than ``horizon`` (default: LEDGER_ARCHIVE_AFTER_DAYS ago).
+
+    ``pause`` seconds are slept between batches to leave room for live
+    traffic; ``max_batches`` caps the work done per table in one call.
+    Returns the number of rows moved per table.
+    """
+    horizon = horizon or archive_horizon()
+    moved = {}
+    for name, archive_batch in (('transactions', _archive_transactions_batch), ('scans', _archive_scans_batch)):
+        moved[name] = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = archive_batch(horizon, batch_size)
+            if not count:
+                break
+            moved[name] += count
+            batches += 1
+            if pause:
+                time.sleep(pause)
+
+    JobCheckpoint.objects.update_or_create(
+        name=CHECKPOINT_NAME, defaults={'last_run_at': horizon}
+    )
+    return moved
@@ -0,0 +1,127 @@
+"""
+Printable QR badge sheets.
+
+Badges (the student's QR from generate_qr_image with their name under it)
+are laid out BADGE_COLUMNS x BADGE_ROWS to an A4 page. render_badges
+renders pages in a process pool, a page per task, handed back in order
+through a bounded window, so only a few finished pages are held in memory
+however many students are on the sheet (see api/rendering.py); the web
+view renders them one by one in its own worker. The PDF is written
+incrementally: each page is one flate-compressed greyscale image, and the
+page tree and cross-reference table follow the last page.
+"""
+import zlib
+from io import BytesIO
+
+from .models import User
+from .rendering import RENDER_WORKERS, PdfWriter, render_ordered
+
+DPI = 150
+PAGE_POINTS = (595.28, 841.89)  # A4
+PAGE_PIXELS = tuple(round(points / 72 * DPI) for points in PAGE_POINTS)
+BADGE_COLUMNS = 3
+BADGE_ROWS = 4
+BADGES_PER_PAGE = BADGE_COLUMNS * BADGE_ROWS
+MARGIN = 60
+QR_SIZE = 300
+NAME_FONT_SIZE = 28
+CUT_LINE = 200  # grey of the cutting guides
+
+FORMATS = {'pdf': 'application/pdf', 'png': 'image/png'}
+
+
+def badge_rows(student_ids=None):
+    """(qr_value, name) for the selected (default: all active) students, in roster order."""
+    students = User.objects.filter(user_type=2, qr_value__isnull=False)
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+    else:
+        students = students.filter(is_active=True)
+    return [
+        (qr_value, f'{first_name} {last_name}'.strip() or username)
+        for qr_value, first_name, last_name, username in students.order_by('last_name', 'first_name', 'id')
+        .values_list('qr_value', 'first_name', 'last_name', 'username')
+    ]
+
+
+def pages_of(badges):
+    return [badges[start:start + BADGES_PER_PAGE] for start in range(0, len(badges), BADGES_PER_PAGE)]
+
+
+# ===== RENDERING (runs in the pool) =====
+def draw_page(badges):
+    """One page of badges as a greyscale PIL image."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    from .serializers import generate_qr_image
+
+    page = Image.new('L', PAGE_PIXELS, 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=NAME_FONT_SIZE)
+    cell_width = (PAGE_PIXELS[0] - 2 * MARGIN) // BADGE_COLUMNS
+    cell_height = (PAGE_PIXELS[1] - 2 * MARGIN) // BADGE_ROWS
+
+    for index, (qr_value, name) in enumerate(badges):
+        left = MARGIN + (index % BADGE_COLUMNS) * cell_width
+        top = MARGIN + (index // BADGE_COLUMNS) * cell_height
+        draw.rectangle((left, top, left + cell_width, top + cell_height), outline=CUT_LINE)
+
+        qr = generate_qr_image(qr_value).get_image().convert('L').resize((QR_SIZE, QR_SIZE), Image.NEAREST)
+        qr_top = top + (cell_height - QR_SIZE - NAME_FONT_SIZE * 2) // 2
+        page.paste(qr, (left + (cell_width - QR_SIZE) // 2, qr_top))
+
+        while draw.textlength(name, font=font) > cell_width - 20 and len(name) > 1:
+            name = name[:-2] + '…'
+        draw.text(
+            (left + cell_width / 2, qr_top + QR_SIZE + NAME_FONT_SIZE), name, fill=0, font=font, anchor='mt'
+        )
+    return page
+
+
+def render_pdf_page(badges):
+    return zlib.compress(draw_page(badges).tobytes(), 6)
+
+
+def render_png_page(badges):
+    buffer = BytesIO()
+    draw_page(badges).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+# ===== OUTPUT =====
+def pdf_stream(compressed_pages):
+    """Write a PDF of full-page greyscale images, yielding it in chunks."""
+    pdf = PdfWriter()
+    yield pdf.header()
+    yield pdf.obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    width, height = PAGE_PIXELS
+    draw = f'q {PAGE_POINTS[0]} 0 0 {PAGE_POINTS[1]} 0 0 cm /Im0 Do Q'.encode()
+    kids = []
+    for index, pixels in enumerate(compressed_pages):
+        page, image, content = 3 + 3 * index, 4 + 3 * index, 5 + 3 * index
+        kids.append(f'{page} 0 R')
+        yield pdf.obj(page, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_POINTS[0]} {PAGE_POINTS[1]}] '
+            f'/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>'
+        ).encode())
+        yield pdf.obj(image, (
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray '
+            f'/BitsPerComponent 8 /Filter /FlateDecode /Length {len(pixels)} >>'
+        ).encode(), pixels)
+        yield pdf.obj(content, f'<< /Length {len(draw)} >>'.encode(), draw)
+
+    yield pdf.obj(2, f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode())
+    yield pdf.trailer()
+
+
+def badge_sheet(badges, workers=RENDER_WORKERS):
+    """The PDF sheet for ``badges`` (from badge_rows), as a stream of byte chunks."""
+    pages = pages_of(badges)
+    return pdf_stream(render_ordered(render_pdf_page, pages, workers if len(pages) > 1 else 1))
+
+
+def badge_pngs(badges, workers=RENDER_WORKERS):
+    """One PNG per page for ``badges``, in order."""
+    pages = pages_of(badges)
+    return render_ordered(render_png_page, pages, workers if len(pages) > 1 else 1)
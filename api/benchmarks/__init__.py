@@ -0,0 +1,8 @@
+"""
+Reproducible load benchmarks for the API.
+
+``seed_benchmark`` fills a scratch database with a deterministic dataset and
+``run_benchmark`` drives scripted scenarios through the WSGI/ASGI apps,
+reporting latency percentiles, throughput and queries per request, and
+saving JSON baselines to compare between commits.
+"""
@@ -0,0 +1,202 @@
+"""
+In-process load driver.
+
+Requests are fed straight into the project's WSGI or ASGI application, so
+the numbers cover the full Django stack (middleware, auth, views, ORM)
+without a network hop. call_http sends the same calls to a running server
+instead (see server.py). Query counts come from the Server-Timing header
+set by RequestMetricsMiddleware.
+"""
+import asyncio
+import http.client
+import io
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from wsgiref.util import setup_testing_defaults
+
+QUERY_COUNT_RE = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Call:
+    method: str
+    path: str
+    body: dict = None
+    token: str = None
+    headers: dict = None
+
+
+@dataclass
+class Sample:
+    latency: float
+    status: int
+    queries: int
+    size: int
+
+
+def _queries(server_timing):
+    match = QUERY_COUNT_RE.search(server_timing or '')
+    return int(match.group(1)) if match else 0
+
+
+def _encode(call):
+    body = json.dumps(call.body).encode() if call.body is not None else b''
+    path, _, query = call.path.partition('?')
+    return body, path, query
+
+
+def call_wsgi(app, call):
+    body, path, query = _encode(call)
+    environ = {
+        'REQUEST_METHOD': call.method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    if call.token:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {call.token}'
+    for name, value in (call.headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = dict(headers)
+
+    started = time.perf_counter()
+    chunks = app(environ, start_response)
+    try:
+        size = sum(len(chunk) for chunk in chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    latency = time.perf_counter() - started
+    return Sample(latency, response['status'], _queries(response['headers'].get('Server-Timing')), size)
+
+
+async def call_asgi(app, call):
+    body, path, query = _encode(call)
+    headers = [
+        (b'host', b'localhost'),
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+    ]
+    if call.token:
+        headers.append((b'authorization', f'Bearer {call.token}'.encode()))
+    headers.extend((name.lower().encode(), value.encode()) for name, value in (call.headers or {}).items())
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': call.method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'headers': headers,
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+    request_sent = False
+    response = {'size': 0}
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.Event().wait()  # the client never disconnects early
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {k.decode().lower(): v.decode() for k, v in message['headers']}
+        elif message['type'] == 'http.response.body':
+            response['size'] += len(message.get('body', b''))
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    latency = time.perf_counter() - started
+    return Sample(latency, response['status'], _queries(response['headers'].get('server-timing')), response['size'])
+
+
+def call_http(address, call):
+    """Send one call to a server at (host, port) on a fresh connection."""
+    body, _, _ = _encode(call)
+    headers = {'Content-Type': 'application/json', **(call.headers or {})}
+    if call.token:
+        headers['Authorization'] = f'Bearer {call.token}'
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection(*address, timeout=60)
+    try:
+        connection.request(call.method, call.path, body=body or None, headers=headers)
+        response = connection.getresponse()
+        size = len(response.read())
+    except OSError:  # reset or refused: count it as an error, like a proxy's 502
+        return Sample(time.perf_counter() - started, 502, 0, 0)
+    finally:
+        connection.close()
+    latency = time.perf_counter() - started
+    return Sample(latency, response.status, _queries(response.getheader('Server-Timing')), size)
+
+
+def run_wsgi(app, calls, concurrency):
+    """Returns (samples, wall_seconds)."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda call: call_wsgi(app, call), calls))
+    return samples, time.perf_counter() - started
+
+
+def run_asgi(app, calls, concurrency):
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(call):
+            async with semaphore:
+                return await call_asgi(app, call)
+
+        return await asyncio.gather(*(bounded(call) for call in calls))
+
+    started = time.perf_counter()
+    samples = asyncio.run(main())
+    return samples, time.perf_counter() - started
+
+
+def run_http(address, calls, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda call: call_http(address, call), calls))
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(sample.latency for sample in samples)
+    queries = [sample.queries for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 400),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else 0.0,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+        'bytes_mean': round(sum(sample.size for sample in samples) / len(samples)) if samples else 0,
+    }
@@ -0,0 +1,77 @@
+"""
+Scripted benchmark scenarios.
+
+Each scenario turns one iteration into a list of Calls, drawing students,
+teachers and values from a seeded RNG so runs are repeatable.
+"""
+from dataclasses import dataclass
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Product, User
+
+from .driver import Call
+from .seed import BENCH_PASSWORD
+
+
+@dataclass
+class Context:
+    teachers: list  # [(user, access_token)]
+    students: list  # [(user, access_token)]
+    product_ids: list
+
+
+def build_context():
+    def with_tokens(users):
+        return [(user, str(RefreshToken.for_user(user).access_token)) for user in users]
+
+    teachers = User.objects.filter(username__startswith='bench_teacher', user_type=1).order_by('id')
+    students = User.objects.filter(username__startswith='bench_student', user_type=2).order_by('id')
+    return Context(
+        teachers=with_tokens(teachers),
+        students=with_tokens(students.only('id', 'username', 'qr_value')),
+        product_ids=list(Product.objects.values_list('id', flat=True)),
+    )
+
+
+def scan_storm(ctx, rng):
+    """Sunday door: scan a badge, then award points for it."""
+    _, token = rng.choice(ctx.teachers)
+    student, _ = rng.choice(ctx.students)
+    return [
+        Call('POST', '/api/students/scan-qr/', {'qr_value': student.qr_value}, token),
+        Call('POST', '/api/students/award-points/', {
+            'student_id': student.id,
+            'points': rng.choice((5, 10, 20)),
+            'reason': 'Attendance',
+        }, token),
+    ]
+
+
+def dashboard(ctx, rng):
+    _, token = rng.choice(ctx.teachers)
+    return [Call('GET', '/api/teacher/stats/', token=token)]
+
+
+def roster(ctx, rng):
+    _, token = rng.choice(ctx.teachers)
+    return [Call('GET', '/api/students/', token=token)]
+
+
+def catalog(ctx, rng):
+    _, token = rng.choice(ctx.students)
+    return [Call('GET', '/api/products/', token=token)]
+
+
+def login(ctx, rng):
+    student, _ = rng.choice(ctx.students)
+    return [Call('POST', '/api/token/', {'username': student.username, 'password': BENCH_PASSWORD})]
+
+
+SCENARIOS = {
+    'scan_storm': scan_storm,
+    'dashboard': dashboard,
+    'roster': roster,
+    'catalog': catalog,
+    'login': login,
+}
@@ -0,0 +1,131 @@
+"""
+Deterministic benchmark dataset.
+
+Shapes roughly follow production: a few very active students and a long
+tail, most points earned in Sunday scan sessions, typical award sizes of
+5-50 points and occasional store purchases.
+"""
+import random
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import DimStudent, Product, QRScanLog, User, Wallet, WalletTransaction
+
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+AWARD_SIZES = (5, 10, 10, 20, 20, 25, 50)
+SPEND_SIZES = (20, 50, 100, 150)
+
+
+def _sunday_morning(rng, weeks_back):
+    today = timezone.localdate()
+    last_sunday = today - timedelta(days=(today.weekday() + 1) % 7)
+    day = last_sunday - timedelta(weeks=weeks_back)
+    moment = datetime.combine(day, time(9, 0)) + timedelta(minutes=rng.randint(0, 180))
+    return timezone.make_aware(moment)
+
+
+@transaction.atomic
+def seed(teachers=5, students=500, transactions=20_000, products=40, weeks=26, seed_value=42):
+    """Insert the dataset with bulk_create; returns a summary dict."""
+    rng = random.Random(seed_value)
+    password = make_password(BENCH_PASSWORD)  # hash once, PBKDF2 is deliberately slow
+    first_names = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Grace', 'John', 'Joy', 'Paul', 'Faith']
+    last_names = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Ocampo', 'Garcia', 'Mendoza', 'Alamag']
+
+    def make_user(username, user_type, **extra):
+        birthday = date(2005, 1, 1) + timedelta(days=rng.randint(0, 365 * 8))
+        saved = birthday + timedelta(days=rng.randint(365 * 8, 365 * 15))
+        user = User(
+            username=username,
+            password=password,
+            email=f'{username}@bench.local',
+            first_name=rng.choice(first_names),
+            last_name=rng.choice(last_names),
+            user_type=user_type,
+            gender=rng.choice(['male', 'female']),
+            birthday=birthday,
+            salvation_date=saved if saved < timezone.localdate() and rng.random() < 0.6 else None,
+            phone_number=f'09{rng.randint(100000000, 999999999)}',
+            qr_value=uuid.UUID(int=rng.getrandbits(128)).hex[:16].upper(),
+            **extra,
+        )
+        user.sync_anniversary_keys()
+        return user
+
+    User.objects.bulk_create(
+        [make_user(f'bench_teacher{i}', 1, is_staff=True) for i in range(teachers)]
+        + [make_user(f'bench_student{i}', 2) for i in range(students)],
+        batch_size=BATCH_SIZE,
+    )
+    teacher_ids = list(User.objects.filter(username__startswith='bench_teacher').values_list('id', flat=True))
+    student_ids = list(User.objects.filter(username__startswith='bench_student').values_list('id', flat=True))
+
+    Wallet.objects.bulk_create([Wallet(user_id=uid) for uid in student_ids], batch_size=BATCH_SIZE)
+    DimStudent.objects.bulk_create([DimStudent(user_id=uid) for uid in student_ids], batch_size=BATCH_SIZE)
+    wallet_ids = dict(Wallet.objects.filter(user__username__startswith='bench_student').values_list('user_id', 'id'))
+
+    Product.objects.bulk_create(
+        [
+            Product(
+                name=f'Item {i}',
+                description='Benchmark product',
+                price_in_points=rng.choice(SPEND_SIZES),
+                stock=rng.randint(0, 50),
+            )
+            for i in range(products)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    # Pareto-ish activity: a few students collect most of the points
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(student_ids))]
+    rng.shuffle(weights)
+    balances = dict.fromkeys(student_ids, 0)
+    last_activity = {}
+    ledger, scans = [], []
+    for student_id in rng.choices(student_ids, weights=weights, k=transactions):
+        when = _sunday_morning(rng, rng.randint(0, weeks - 1))
+        if balances[student_id] >= 50 and rng.random() < 0.2:
+            amount = min(rng.choice(SPEND_SIZES), balances[student_id])
+            balances[student_id] -= amount
+            ledger.append(WalletTransaction(
+                wallet_id=wallet_ids[student_id], amount=amount, transaction_type='spend',
+                description='Store purchase', timestamp=when,
+            ))
+        else:
+            amount = rng.choice(AWARD_SIZES)
+            balances[student_id] += amount
+            ledger.append(WalletTransaction(
+                wallet_id=wallet_ids[student_id], amount=amount, transaction_type='earn',
+                description='Awarded during service', timestamp=when,
+            ))
+            scans.append(QRScanLog(
+                user_id=student_id, scanned_by_id=rng.choice(teacher_ids), points_given=amount, timestamp=when,
+            ))
+        last_activity[student_id] = max(when, last_activity.get(student_id, when))
+
+    WalletTransaction.objects.bulk_create(ledger, batch_size=BATCH_SIZE)
+    QRScanLog.objects.bulk_create(scans, batch_size=BATCH_SIZE)
+
+    wallets = list(Wallet.objects.filter(user__username__startswith='bench_student'))
+    for wallet in wallets:
+        wallet.balance = balances[wallet.user_id]
+    Wallet.objects.bulk_update(wallets, ['balance'], batch_size=BATCH_SIZE)
+
+    profiles = list(DimStudent.objects.filter(user__username__startswith='bench_student'))
+    for profile in profiles:
+        profile.last_activity = last_activity.get(profile.user_id)
+    DimStudent.objects.bulk_update(profiles, ['last_activity'], batch_size=BATCH_SIZE)
+
+    return {
+        'teachers': len(teacher_ids),
+        'students': len(student_ids),
+        'transactions': len(ledger),
+        'scans': len(scans),
+        'products': products,
+    }
@@ -0,0 +1,140 @@
+"""
+Gunicorn profiles under load.
+
+Each profile starts gunicorn with gunicorn.conf.py and a few environment
+overrides, waits for its workers, drives the scenarios over HTTP
+(driver.run_http) and then reads every process's memory from /proc. RSS
+counts pages shared with the master in full; PSS splits them between the
+processes sharing them, so PSS is what preloading saves.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from importlib.util import find_spec
+from pathlib import Path
+
+from .driver import Call, call_http
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+PROFILES = {
+    # Gunicorn's defaults, as deployed before gunicorn.conf.py: each sync worker imports Django itself
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'false'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread'},
+    'uvicorn': {'GUNICORN_WORKER_CLASS': 'uvicorn'},
+}
+REQUIRES = {'uvicorn': 'uvicorn'}  # profile -> module it needs
+WARMUP_PATH = '/api/metrics/'  # 401 without credentials, before any query
+
+
+@dataclass
+class Memory:
+    rss_kb: int
+    pss_kb: int
+
+
+def available(profile):
+    module = REQUIRES.get(profile)
+    return module is None or find_spec(module) is not None
+
+
+def children(pid):
+    found = []
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        # The command name is parenthesised and may contain spaces; ppid is the 2nd field after it
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            found.append(int(entry.name))
+    return sorted(found)
+
+
+def memory(pid):
+    values = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+        name, _, rest = line.partition(':')
+        if name in ('Rss', 'Pss'):
+            values[name] = int(rest.split()[0])
+    return Memory(values['Rss'], values['Pss'])
+
+
+class Server:
+    """A gunicorn master for one profile; use as a context manager."""
+
+    def __init__(self, profile, workers=None, port=8765, boot_timeout=60):
+        self.profile = profile
+        self.workers = workers
+        self.address = ('127.0.0.1', port)
+        self.boot_timeout = boot_timeout
+        self.process = None
+        self.log = None
+        self.boot_seconds = None
+
+    def __enter__(self):
+        env = {**os.environ, **PROFILES[self.profile], 'REQUEST_LOG_LEVEL': 'WARNING'}
+        if self.workers:
+            env['WEB_CONCURRENCY'] = str(self.workers)
+        self.log = tempfile.TemporaryFile()
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', '%s:%s' % self.address],
+            cwd=BASE_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self._wait_for_workers()
+        except Exception:
+            self.__exit__()
+            raise
+        self.boot_seconds = time.perf_counter() - started
+        return self
+
+    def _wait_for_workers(self):
+        deadline = time.monotonic() + self.boot_timeout
+        counts = []
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited ({self.process.returncode}):\n{self.output()}')
+            workers = children(self.process.pid)
+            counts.append(len(workers))
+            # The master forks workers one by one: wait for the expected count, or for it to settle
+            settled = len(counts) > 5 and len(set(counts[-5:])) == 1
+            if workers and (len(workers) == self.workers or not self.workers and settled):
+                try:
+                    socket.create_connection(self.address, timeout=1).close()
+                except OSError:
+                    pass
+                else:
+                    # Without preload, a worker only imports the project on its first requests
+                    for _ in range(4 * len(workers)):
+                        call_http(self.address, Call('GET', WARMUP_PATH))
+                    self.workers = len(workers)
+                    return
+            time.sleep(0.1)
+        raise RuntimeError(f'gunicorn did not start within {self.boot_timeout}s:\n{self.output()}')
+
+    def memory(self):
+        """(master, [worker, ...]) Memory."""
+        return memory(self.process.pid), [memory(pid) for pid in children(self.process.pid)]
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors='replace')[-2000:]
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
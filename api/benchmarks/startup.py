@@ -0,0 +1,83 @@
+"""
+Cold-start measurement.
+
+Each probe boots a fresh interpreter under ``python -X importtime``, loads
+backend.wsgi the way gunicorn does and serves one request, so the numbers
+include URLconf, views and serializers (which Django imports lazily on the
+first request). The probe request needs no database.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+PROBE_PATH = '/api/metrics/'  # 401 without credentials, before any query
+
+PROBE = f"""
+import time
+started = time.perf_counter()
+import json, sys
+from backend.wsgi import application
+booted = time.perf_counter()
+from api.benchmarks.driver import Call, call_wsgi
+sample = call_wsgi(application, Call('GET', {PROBE_PATH!r}))
+print(json.dumps({{
+    'boot': booted - started,
+    'first_response': time.perf_counter() - started,
+    'status': sample.status,
+    'modules': sorted(sys.modules),
+}}))
+"""
+
+
+@dataclass
+class Probe:
+    boot: float  # seconds to import backend.wsgi
+    first_response: float  # boot plus the first request
+    process: float  # wall time of the whole child, interpreter start included
+    status: int
+    modules: list
+    imports: list = field(default_factory=list)  # [(cumulative_us, self_us, module)]
+
+
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        imports.append((int(cumulative_us), int(self_us), name))
+    return imports
+
+
+def probe():
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings'}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    process = time.perf_counter() - started
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return Probe(
+        boot=data['boot'],
+        first_response=data['first_response'],
+        process=process,
+        status=data['status'],
+        modules=data['modules'],
+        imports=parse_importtime(result.stderr),
+    )
+
+
+def by_package(imports):
+    """Self time per top-level package, in microseconds, largest first."""
+    totals = defaultdict(int)
+    for _, self_us, name in imports:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
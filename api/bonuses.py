@@ -0,0 +1,94 @@
+"""
+Birthday and salvation-anniversary bonuses.
+
+Students are found through the indexed ``birthday_md``/``salvation_md``
+keys, credited in one transaction, and recorded in BonusAward so a second
+run for the same year awards nothing. Two runs racing each other both see
+the same students as due; the unique (user, kind, year) constraint rolls
+back whichever commits second, and that run is retried, so it awards only
+what the first one left.
+"""
+import calendar
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import notifications
+from .leaderboard import leaderboards
+from .ledger import credit_many
+from .models import BonusAward, User, month_day_key
+
+BONUS_KINDS = {
+    # kind: (User date field, indexed key field, settings name, description, notification)
+    'birthday': (
+        'birthday', 'birthday_md', 'BIRTHDAY_BONUS_POINTS',
+        'Birthday bonus', 'Happy birthday! You received {points} bonus points.',
+    ),
+    'salvation': (
+        'salvation_date', 'salvation_md', 'SALVATION_BONUS_POINTS',
+        'Salvation anniversary bonus', 'Happy spiritual birthday! You received {points} bonus points.',
+    ),
+}
+
+
+def anniversary_keys(on_date):
+    """Month/day keys celebrated on a date; Feb 29 is celebrated on Feb 28 in common years."""
+    keys = [month_day_key(on_date)]
+    if (on_date.month, on_date.day) == (2, 28) and not calendar.isleap(on_date.year):
+        keys.append(229)
+    return keys
+
+
+def award_anniversary_bonuses(on_date=None):
+    """
+    Award every bonus due on ``on_date`` (default: today).
+
+    Returns ``{kind: number_of_students_awarded}``.
+    """
+    on_date = on_date or timezone.localdate()
+    try:
+        return _award(on_date)
+    except IntegrityError:
+        # A concurrent run for the same day committed first
+        return _award(on_date)
+
+
+def _award(on_date):
+    keys = anniversary_keys(on_date)
+    awarded = {}
+
+    with transaction.atomic():
+        entries = []
+        bonus_rows = []
+        for kind, (date_field, key_field, setting, description, message) in BONUS_KINDS.items():
+            points = getattr(settings, setting, 0)
+            awarded[kind] = 0
+            if points <= 0:
+                continue
+
+            already = BonusAward.objects.filter(kind=kind, year=on_date.year).values('user_id')
+            user_ids = list(
+                User.objects.filter(
+                    user_type=2,
+                    is_active=True,
+                    **{f'{key_field}__in': keys, f'{date_field}__lt': on_date},
+                ).exclude(id__in=already).values_list('id', flat=True)
+            )
+            if not user_ids:
+                continue
+
+            entries.extend((user_id, points, description) for user_id in user_ids)
+            bonus_rows.extend(
+                BonusAward(user_id=user_id, kind=kind, year=on_date.year, points=points)
+                for user_id in user_ids
+            )
+            notifications.broadcast(user_ids, message.format(points=points))
+            awarded[kind] = len(user_ids)
+
+        if entries:
+            BonusAward.objects.bulk_create(bonus_rows)
+            credit_many(entries)
+            transaction.on_commit(leaderboards.invalidate)
+
+    return awarded
@@ -0,0 +1,225 @@
+"""
+Deploy-time fixture loading.
+
+A faster, re-runnable ``loaddata`` for Django JSON fixtures. The file is
+streamed object by object, each run of same-model objects is diffed
+against the rows already stored under the same primary keys, and only new
+rows (bulk_create) and changed rows (bulk_create with update_conflicts,
+grouped by the columns that changed) are written. Only the fields present
+in the fixture are compared and written, so columns it doesn't mention
+(counters, denormalized keys) keep their live values. Many-to-many values
+are written for new and changed rows.
+
+Those writes bypass save() and post_save, so the caches post_save would
+have invalidated are dropped here once the load commits: the home summary
+of every student whose wallet, ledger or profile rows were written, and
+the leaderboards when users, wallets or ledger rows were.
+
+A fixture whose content hash matches the last applied one is skipped
+without being parsed.
+"""
+import hashlib
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import connection, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from . import home
+from .leaderboard import leaderboards
+from .models import DimStudent, JobCheckpoint, User, Wallet, WalletTransaction
+
+BOOTSTRAP_CHUNK_SIZE = 500
+READ_SIZE = 64 * 1024
+CHECKPOINT_PREFIX = 'bootstrap_data:'
+
+# bulk_create skips save() and signals, so derived columns are filled here:
+# model -> (method computing them, the columns it sets)
+DERIVED_FIELDS = {
+    User: (User.sync_anniversary_keys, ('birthday_md', 'salvation_md')),
+}
+# model -> lookup from its rows to the user whose cached home summary they feed
+HOME_OWNERS = {
+    Wallet: 'user_id',
+    WalletTransaction: 'wallet__user_id',
+    DimStudent: 'user_id',
+}
+LEADERBOARD_MODELS = (User, Wallet, WalletTransaction)
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fixture:
+        while block := fixture.read(READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_fixture(path):
+    """Yield the objects of a JSON fixture (a top-level array) without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer, position, opened = '', 0, False
+    with open(path, encoding='utf-8-sig') as fixture:
+        while True:
+            block = fixture.read(READ_SIZE)
+            buffer = buffer[position:] + block
+            position = 0
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position >= len(buffer):
+                    break
+                if not opened:
+                    if buffer[position] != '[':
+                        raise ValueError(f'{path}: expected a JSON array')
+                    opened = True
+                    position += 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    obj, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not block:
+                        raise
+                    break  # object continues in the next block
+                yield obj
+            if not block:
+                raise ValueError(f'{path}: unexpected end of fixture')
+
+
+def _chunks(objects, size):
+    """Group consecutive objects of the same model, at most ``size`` per group."""
+    chunk = []
+    for obj in objects:
+        if chunk and (obj['model'] != chunk[0]['model'] or len(chunk) >= size):
+            yield chunk
+            chunk = []
+        chunk.append(obj)
+    if chunk:
+        yield chunk
+
+
+def _comparable(value):
+    return value.name if isinstance(value, FieldFile) else value
+
+
+def _apply_chunk(raw_objects, stats, insert_only, home_owners):
+    model = apps.get_model(raw_objects[0]['model'])
+    meta = model._meta
+    derive, derived_columns = DERIVED_FIELDS.get(model, (None, ()))
+
+    records = []  # (instance, fields to compare/write, m2m data)
+    for raw, deserialized in zip(raw_objects, PythonDeserializer(raw_objects, ignorenonexistent=True)):
+        instance = deserialized.object
+        fields = []
+        for name in raw['fields']:
+            try:
+                field = meta.get_field(name)
+            except FieldDoesNotExist:
+                continue  # same leniency as loaddata --ignorenonexistent
+            if field.concrete and not field.many_to_many and not getattr(field, 'auto_now', False):
+                fields.append(field)
+        if derive is not None:
+            derive(instance)
+            fields.extend(meta.get_field(name) for name in derived_columns)
+        records.append((instance, fields, deserialized.m2m_data))
+
+    columns = {field.attname for _, fields, _ in records for field in fields}
+    existing = {
+        row['pk']: row
+        for row in model._base_manager.filter(pk__in=[instance.pk for instance, _, _ in records])
+        .values('pk', *columns)
+    }
+
+    new, changed = [], defaultdict(list)
+    for instance, fields, _ in records:
+        stored = existing.get(instance.pk)
+        if stored is None:
+            new.append(instance)
+            continue
+        if insert_only:
+            continue
+        differing = tuple(sorted(
+            field.name for field in fields
+            if _comparable(getattr(instance, field.attname)) != _comparable(stored[field.attname])
+        ))
+        if differing:
+            changed[differing].append(instance)
+
+    if new:
+        model._base_manager.bulk_create(new, batch_size=BOOTSTRAP_CHUNK_SIZE)
+    for update_fields, instances in changed.items():
+        model._base_manager.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=[meta.pk.name],
+            update_fields=list(update_fields),
+            batch_size=BOOTSTRAP_CHUNK_SIZE,
+        )
+
+    inserted = {instance.pk for instance in new}
+    written = inserted | {instance.pk for instances in changed.values() for instance in instances}
+    for instance, _, m2m_data in records:
+        if instance.pk not in written:
+            continue
+        for name, values in m2m_data.items():
+            if values or instance.pk not in inserted:
+                getattr(instance, name).set(values)
+
+    if written and model in HOME_OWNERS:
+        home_owners.update(
+            model._base_manager.filter(pk__in=written).values_list(HOME_OWNERS[model], flat=True)
+        )
+
+    counts = stats[meta.label]
+    counts['inserted'] += len(new)
+    counts['updated'] += sum(len(instances) for instances in changed.values())
+    counts['unchanged'] += len(records) - len(written)
+    return model if new else None
+
+
+def bootstrap_fixture(path, chunk_size=BOOTSTRAP_CHUNK_SIZE, force=False, insert_only=False):
+    """
+    Apply one fixture. Returns ``None`` when it was skipped because its hash
+    matches the last applied one, otherwise per-model insert/update counts.
+    """
+    path = Path(path)
+    digest = content_hash(path)
+    checkpoint_name = CHECKPOINT_PREFIX + path.name
+    if not force and JobCheckpoint.objects.filter(name=checkpoint_name, value=digest).exists():
+        return None
+
+    stats = defaultdict(lambda: {'inserted': 0, 'updated': 0, 'unchanged': 0})
+    inserted_models = set()
+    home_owners = set()
+    with transaction.atomic():
+        for chunk in _chunks(iter_fixture(path), chunk_size):
+            model = _apply_chunk(chunk, stats, insert_only, home_owners)
+            if model is not None:
+                inserted_models.add(model)
+
+        # Rows came with explicit ids, so move sequences past them (as loaddata does)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(inserted_models))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+        home.invalidate(home_owners)
+        if any(
+            counts['inserted'] or counts['updated']
+            for label, counts in stats.items() if apps.get_model(label) in LEADERBOARD_MODELS
+        ):
+            transaction.on_commit(leaderboards.invalidate)
+
+        JobCheckpoint.objects.update_or_create(
+            name=checkpoint_name, defaults={'value': digest, 'last_run_at': timezone.now()}
+        )
+    return dict(stats)
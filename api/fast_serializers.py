@@ -0,0 +1,71 @@
+"""
+Read-only serializers for the hot list endpoints.
+
+These work from ``.values()`` rows instead of model instances and produce
+exactly the same payloads as WalletTransactionSerializer and
+StudentSerializer, without DRF's per-field overhead. Lookup tables are
+built once at import time.
+"""
+
+TRANSACTION_ICONS = {
+    "earn": "🌟",
+    "spend": "💸",
+    "transfer": "🔄",
+    "refund": "↩️",
+    "adjustment": "⚖️",
+}
+DEFAULT_TRANSACTION_ICON = "💰"
+EARN_COLOR = "text-green-500"
+OTHER_COLOR = "text-red-500"
+
+AVATARS = {"male": "👦", "female": "👧"}
+DEFAULT_AVATAR = "⭐"
+
+TRANSACTION_VALUES = ("id", "transaction_type", "amount", "description", "timestamp")
+STUDENT_VALUES = (
+    "id", "level", "streak", "last_activity",
+    "user__first_name", "user__last_name", "user__is_active", "user__gender", "user__last_login",
+    "user__wallet__balance", "user__wallet__last_updated",
+)
+
+
+def format_time(value):
+    # Same output as strftime("%Y-%m-%d %H:%M:%S"), several times faster
+    return value.isoformat(" ", "seconds")[:19]
+
+
+def transaction_rows(rows):
+    """WalletTransactionSerializer output for rows fetched with TRANSACTION_VALUES."""
+    icons = TRANSACTION_ICONS
+    return [
+        {
+            "id": row["id"],
+            "transaction_type": row["transaction_type"],
+            "amount": row["amount"],
+            "description": row["description"],
+            "icon": icons.get(row["transaction_type"], DEFAULT_TRANSACTION_ICON),
+            "time": format_time(row["timestamp"]),
+            "color": EARN_COLOR if row["transaction_type"] == "earn" else OTHER_COLOR,
+        }
+        for row in rows
+    ]
+
+
+def student_rows(rows):
+    """StudentSerializer (read side) output for rows fetched with STUDENT_VALUES."""
+    students = []
+    for row in rows:
+        last_activity = (
+            row["last_activity"] or row["user__last_login"] or row["user__wallet__last_updated"]
+        )
+        students.append({
+            "id": row["id"],
+            "name": f"{row['user__first_name']} {row['user__last_name']}",
+            "balance": row["user__wallet__balance"],
+            "level": row["level"],
+            "streak": row["streak"],
+            "last_activity": format_time(last_activity) if last_activity else "N/A",
+            "status": "active" if row["user__is_active"] else "inactive",
+            "avatar": AVATARS.get(row["user__gender"], DEFAULT_AVATAR),
+        })
+    return students
@@ -0,0 +1,78 @@
+"""
+The student app's start screen in one response (GET /api/me/home/).
+
+Profile and unread count come off ``request.user``, which authentication
+has already loaded. The wallet part (balance, level/streak and the latest
+ledger rows) takes one joined query plus one ledger slice. With a shared
+cache (settings.SHARED_CACHE) it is cached per user until a write to that
+user's wallet invalidates it; HOME_CACHE_SECONDS bounds a summary cached
+by a read that raced a write. A per-process cache would only be
+invalidated in the worker that handled the write, so without one the
+summary is read fresh every time. Streak and level are recomputed by the
+nightly compute_streaks job.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .fast_serializers import TRANSACTION_VALUES, transaction_rows
+from .models import User, WalletTransaction
+
+HOME_CACHE_SECONDS = getattr(settings, 'HOME_CACHE_SECONDS', 300)
+CACHED = getattr(settings, 'SHARED_CACHE', False)
+HOME_TRANSACTIONS = 10
+CACHE_PREFIX = 'home:'
+
+
+def cache_key(user_id):
+    return f'{CACHE_PREFIX}{user_id}'
+
+
+def invalidate(user_ids):
+    """Drop the cached home of users whose wallet changed, once the write commits."""
+    keys = [cache_key(user_id) for user_id in user_ids]
+    if CACHED and keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def wallet_summary(user_id):
+    summary = cache.get(cache_key(user_id)) if CACHED else None
+    if summary is not None:
+        return summary
+
+    row = User.objects.filter(pk=user_id).values(
+        'wallet__balance', 'wallet__last_updated', 'student_profile__level', 'student_profile__streak',
+    ).first() or {}
+    rows = (
+        WalletTransaction.objects.filter(wallet__user_id=user_id)
+        .order_by('-timestamp', '-id')
+        .values(*TRANSACTION_VALUES)[:HOME_TRANSACTIONS]
+    )
+    summary = {
+        'balance': row.get('wallet__balance') or 0,
+        'last_updated': row.get('wallet__last_updated'),
+        'level': row.get('student_profile__level'),
+        'streak': row.get('student_profile__streak'),
+        'recent_transactions': transaction_rows(rows),
+    }
+    if CACHED:
+        cache.set(cache_key(user_id), summary, HOME_CACHE_SECONDS)
+    return summary
+
+
+def home_payload(request, user):
+    profile_pic = request.build_absolute_uri(user.profile_pic.url) if user.profile_pic else None
+    return {
+        'profile': {
+            'id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+            'gender': user.gender,
+            'user_type': user.user_type,
+            'profile_pic': profile_pic,
+        },
+        **wallet_summary(user.id),
+        'unread_notifications': user.unread_notifications,
+    }
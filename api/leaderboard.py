@@ -0,0 +1,187 @@
+"""
+Points leaderboard.
+
+Rankings are kept in process as sorted lists so top-N and "my rank" are
+bisect lookups instead of sorting every wallet on each request. Boards are
+built from the database on first use, updated incrementally after each
+committed balance change, and rebuilt after LEADERBOARD_TTL_SECONDS so
+workers that didn't see a change catch up.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import User, Wallet, WalletTransaction
+from .replicas import use_primary
+
+BOARD_TTL_SECONDS = getattr(settings, 'LEADERBOARD_TTL_SECONDS', 300)
+GENDER_BOARDS = ('male', 'female')
+
+
+class RankBoard:
+    """Scores sorted descending, with ties broken by user id."""
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})
+        self._keys = sorted((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def score(self, user_id):
+        return self._scores.get(user_id)
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+        insort(self._keys, (-score, user_id))
+        self._scores[user_id] = score
+
+    def add(self, user_id, delta):
+        self.set(user_id, self._scores.get(user_id, 0) + delta)
+
+    def remove(self, user_id):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+
+    def rank(self, user_id):
+        """1-based competition rank (ties share a rank), or None."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score,)) + 1
+
+    def top(self, limit, offset=0):
+        """[(rank, user_id, score), ...] for the requested slice."""
+        entries = []
+        for neg_score, user_id in self._keys[offset:offset + limit]:
+            entries.append((bisect_left(self._keys, (neg_score,)) + 1, user_id, -neg_score))
+        return entries
+
+
+def week_start(now=None):
+    """Monday 00:00 of the current week in the project time zone."""
+    now = timezone.localtime(now)
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class Leaderboards:
+    """The set of boards served by the API, rebuilt together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = None
+        self._built_at = 0.0
+        self._week_start = None
+
+    def _build(self):
+        # Boards outlive the request, so never build them from a lagging replica
+        with use_primary():
+            self._load()
+
+    def _load(self):
+        overall = {}
+        by_gender = {gender: {} for gender in GENDER_BOARDS}
+        wallets = Wallet.objects.filter(
+            user__user_type=2, user__is_active=True
+        ).values_list('user_id', 'balance', 'user__gender')
+        for user_id, balance, gender in wallets:
+            overall[user_id] = balance
+            if gender in by_gender:
+                by_gender[gender][user_id] = balance
+
+        current_week = week_start()
+        weekly = dict(
+            WalletTransaction.objects.filter(
+                transaction_type='earn',
+                timestamp__gte=current_week,
+                wallet__user__user_type=2,
+                wallet__user__is_active=True,
+            ).values('wallet__user_id').annotate(total=Sum('amount')).values_list('wallet__user_id', 'total')
+        )
+
+        boards = {'overall': RankBoard(overall), 'weekly': RankBoard(weekly)}
+        for gender, scores in by_gender.items():
+            boards[gender] = RankBoard(scores)
+        self._boards = boards
+        self._built_at = time.monotonic()
+        self._week_start = current_week
+
+    def _fresh_boards(self):
+        # Caller holds the lock
+        if (
+            self._boards is None
+            or time.monotonic() - self._built_at > BOARD_TTL_SECONDS
+            or week_start() != self._week_start
+        ):
+            self._build()
+        return self._boards
+
+    def top(self, name, limit, offset=0):
+        with self._lock:
+            return self._fresh_boards()[name].top(limit, offset)
+
+    def standing(self, name, user_id):
+        with self._lock:
+            board = self._fresh_boards()[name]
+            return board.rank(user_id), board.score(user_id), len(board)
+
+    def apply_change(self, user_id, gender, balance, earned=0):
+        with self._lock:
+            if self._boards is None:
+                return  # Nothing built yet; the first read loads current balances
+            self._boards['overall'].set(user_id, balance)
+            if gender in GENDER_BOARDS:
+                self._boards[gender].set(user_id, balance)
+            if earned:
+                self._boards['weekly'].add(user_id, earned)
+
+    def invalidate(self):
+        with self._lock:
+            self._boards = None
+
+
+leaderboards = Leaderboards()
+
+
+def record_balance_change(user, balance, earned=0):
+    """Update the boards once the surrounding transaction commits."""
+    if user.user_type != 2:
+        return
+    transaction.on_commit(
+        lambda: leaderboards.apply_change(user.id, user.gender, balance, earned)
+    )
+
+
+def top_entries(name, limit, offset=0):
+    """Top-N rows with display names, loaded in one query."""
+    rows = leaderboards.top(name, limit, offset)
+    users = User.objects.only('id', 'username', 'first_name', 'last_name', 'gender').in_bulk(
+        [user_id for _, user_id, _ in rows]
+    )
+    entries = []
+    for rank, user_id, score in rows:
+        user = users.get(user_id)
+        if user is None:
+            continue
+        entries.append({
+            'rank': rank,
+            'id': user_id,
+            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+            'gender': user.gender,
+            'points': score,
+        })
+    return entries
@@ -0,0 +1,215 @@
+"""
+Bulk ledger writes.
+
+Balance changes for many wallets are applied with one UPDATE per distinct
+amount and the matching WalletTransaction rows with bulk_create, inside the
+caller's transaction. refund_spends and adjust_balances wrap credit_many in
+their own transaction for staff corrections; a deduction that would take
+any wallet below zero is rejected as a whole.
+
+transfer moves points between two wallets without row locks: both balances
+change through single-row UPDATEs issued in ascending user id order (so two
+crossing transfers wait on each other instead of deadlocking), the debit is
+conditional on the balance covering it, and the pair of signed ledger rows
+is written in the same transaction. Lock conflicts are retried.
+"""
+import random
+import time
+from collections import defaultdict
+
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import home
+from .leaderboard import leaderboards, record_balance_change
+from .models import Wallet, WalletTransaction
+from .replicas import pin_to_primary
+
+BULK_BATCH_SIZE = 500
+REFUND_DESCRIPTION = "Refund of transaction #{id}"
+TRANSFER_RETRIES = 8
+TRANSFER_BACKOFF_SECONDS = 0.02
+
+# Effect of a WalletTransaction row on the balance. Spends are stored as
+# positive amounts; transfers and adjustments carry their own sign.
+DEBIT_TYPES = ('spend',)
+
+
+def signed_amount(transaction_type, amount):
+    return -amount if transaction_type in DEBIT_TYPES else amount
+
+
+class InsufficientBalance(Exception):
+    def __init__(self, balance):
+        super().__init__(f'Insufficient balance: {balance} points')
+        self.balance = balance
+
+
+class InsufficientBalances(Exception):
+    """A bulk debit that some wallets can't cover; ``user_ids`` lists them."""
+
+    def __init__(self, user_ids):
+        super().__init__(f'Insufficient balance in {len(user_ids)} wallet(s)')
+        self.user_ids = user_ids
+
+
+def credit_many(entries, transaction_type='earn', allow_negative=True):
+    """
+    Credit wallets in bulk.
+
+    ``entries`` is an iterable of ``(user_id, amount, description)``, with
+    the refunded spend's id as a fourth item for refunds; a user may appear
+    more than once. Missing wallets are created. With ``allow_negative``
+    off, a net debit only applies to wallets that cover it, and
+    InsufficientBalances is raised (for the caller's transaction to roll
+    back) if any didn't. Returns the new balances keyed by user id.
+    """
+    entries = list(entries)
+    if not entries:
+        return {}
+
+    totals = defaultdict(int)
+    for user_id, amount, *_ in entries:
+        totals[user_id] += amount
+
+    Wallet.objects.bulk_create(
+        [Wallet(user_id=user_id) for user_id in totals],
+        ignore_conflicts=True,
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    by_total = defaultdict(list)
+    for user_id, total in totals.items():
+        by_total[total].append(user_id)
+    now = timezone.now()
+    for total, user_ids in by_total.items():
+        wallets = Wallet.objects.filter(user_id__in=user_ids)
+        if total < 0 and not allow_negative:
+            wallets = wallets.filter(balance__gte=-total)
+        updated = wallets.update(balance=F('balance') + total, last_updated=now)
+        if updated < len(user_ids):
+            raise InsufficientBalances(sorted(
+                Wallet.objects.filter(user_id__in=user_ids, balance__lt=-total).values_list('user_id', flat=True)
+            ))
+
+    wallets = dict(Wallet.objects.filter(user_id__in=totals).values_list('user_id', 'id'))
+    WalletTransaction.objects.bulk_create(
+        [
+            WalletTransaction(
+                wallet_id=wallets[user_id],
+                amount=amount,
+                transaction_type=transaction_type,
+                description=description,
+                timestamp=now,
+                refund_of_id=refund_of[0] if refund_of else None,
+            )
+            for user_id, amount, description, *refund_of in entries
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    pin_to_primary(totals)
+    home.invalidate(totals)
+    return dict(Wallet.objects.filter(user_id__in=totals).values_list('user_id', 'balance'))
+
+
+def refund_spends(transaction_ids):
+    """
+    Credit back the listed spend transactions in one transaction. Spends
+    that were already refunded (or aren't spends) are skipped. Returns the
+    number of refunds written.
+    """
+    with transaction.atomic():
+        spends = (
+            WalletTransaction.objects.select_for_update(of=('self',))
+            .filter(id__in=transaction_ids, transaction_type='spend', refund__isnull=True)
+            .values_list('id', 'wallet__user_id', 'amount')
+        )
+        entries = [
+            (user_id, amount, REFUND_DESCRIPTION.format(id=pk), pk)
+            for pk, user_id, amount in spends
+        ]
+        credit_many(entries, transaction_type='refund')
+        if entries:
+            transaction.on_commit(leaderboards.invalidate)
+    return len(entries)
+
+
+def adjust_balances(user_ids, amount, reason):
+    """
+    Add ``amount`` (negative to deduct) to each user's wallet in one
+    transaction. Raises InsufficientBalances, changing nothing, if a
+    deduction exceeds any of the balances.
+    """
+    with transaction.atomic():
+        balances = credit_many(
+            [(user_id, amount, f"Adjustment: {reason}") for user_id in user_ids],
+            transaction_type='adjustment',
+            allow_negative=False,
+        )
+        if balances:
+            transaction.on_commit(leaderboards.invalidate)
+    return balances
+
+
+def _transfer_once(sender, recipient, amount, note):
+    with transaction.atomic():
+        Wallet.objects.bulk_create(
+            [Wallet(user_id=sender.id), Wallet(user_id=recipient.id)], ignore_conflicts=True
+        )
+        now = timezone.now()
+        for user_id in sorted((sender.id, recipient.id)):
+            if user_id == sender.id:
+                debited = Wallet.objects.filter(user_id=user_id, balance__gte=amount).update(
+                    balance=F('balance') - amount, last_updated=now
+                )
+                if not debited:
+                    raise InsufficientBalance(Wallet.objects.get(user_id=user_id).balance)
+            else:
+                Wallet.objects.filter(user_id=user_id).update(balance=F('balance') + amount, last_updated=now)
+
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.filter(user_id__in=(sender.id, recipient.id)).only('id', 'user_id', 'balance')
+        }
+        suffix = f": {note}" if note else ""
+        sent, received = WalletTransaction.objects.bulk_create([
+            WalletTransaction(
+                wallet=wallets[sender.id], amount=-amount, transaction_type='transfer', timestamp=now,
+                description=f"Transfer to {recipient.first_name} {recipient.last_name}{suffix}",
+            ),
+            WalletTransaction(
+                wallet=wallets[recipient.id], amount=amount, transaction_type='transfer', timestamp=now,
+                description=f"Transfer from {sender.first_name} {sender.last_name}{suffix}",
+            ),
+        ])
+        record_balance_change(sender, wallets[sender.id].balance)
+        record_balance_change(recipient, wallets[recipient.id].balance)
+        pin_to_primary([sender.id, recipient.id])
+        home.invalidate([sender.id, recipient.id])
+    return sent, received
+
+
+def transfer(sender, recipient, amount, note=''):
+    """
+    Move ``amount`` points from ``sender``'s wallet to ``recipient``'s.
+
+    Returns the (debit, credit) WalletTransaction pair. Raises
+    InsufficientBalance if the sender can't cover it. Lock timeouts,
+    deadlocks and serialization failures are retried with jittered
+    backoff, unless the caller's own transaction is open (the whole
+    transaction has to be retried then).
+    """
+    if sender.id == recipient.id:
+        raise ValueError('Cannot transfer to the same wallet')
+    if amount <= 0:
+        raise ValueError('Transfer amount must be positive')
+
+    retries = 0 if transaction.get_connection().in_atomic_block else TRANSFER_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return _transfer_once(sender, recipient, amount, note)
+        except OperationalError:
+            if attempt == retries:
+                raise
+            time.sleep(TRANSFER_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
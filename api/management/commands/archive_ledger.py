@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.archival import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_horizon, archive_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves wallet transactions and QR scan logs older than the horizon into the '
+        'archive tables in small batches. Safe to re-run; run nightly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                            help='Archive rows older than this many days')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches per table')
+
+    def handle(self, *args, **options):
+        horizon = archive_horizon(options['days'])
+        moved = archive_ledger(
+            horizon,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved['transactions']} transaction(s) and {moved['scans']} scan(s) "
+            f"older than {horizon:%Y-%m-%d %H:%M}"
+        ))
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bonuses import award_anniversary_bonuses
+
+
+class Command(BaseCommand):
+    help = 'Awards birthday and salvation-anniversary bonus points. Safe to re-run; run daily from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='YYYY-MM-DD, defaults to today')
+
+    def handle(self, *args, **options):
+        on_date = None
+        if options['date']:
+            try:
+                on_date = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        awarded = award_anniversary_bonuses(on_date)
+        for kind, count in awarded.items():
+            self.stdout.write(self.style.SUCCESS(f'{kind}: awarded {count} student(s)'))
@@ -0,0 +1,132 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from api import notifications
+from api.benchmarks.driver import percentile
+from api.models import Wallet, WalletTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures concurrent award throughput against the configured database '
+        '(SQLite by default, Postgres with DATABASE_URL). Needs seed_benchmark data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--awards', type=int, default=200, help='Awards per thread')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--compare-untuned', action='store_true',
+                            help='Also run the same load with DB_TUNING=off in a subprocess')
+
+    def handle(self, *args, **options):
+        wallet_ids = list(
+            Wallet.objects.filter(user__username__startswith='bench_student').values_list('id', 'user_id')
+        )
+        if not wallet_ids:
+            raise CommandError('No benchmark students found; run seed_benchmark first.')
+
+        self.describe_database()
+        result = self.run_load(wallet_ids, options['threads'], options['awards'], options['seed'])
+        self.report('tuned' if os.environ.get('DB_TUNING', 'on') != 'off' else 'untuned', result)
+
+        if options['compare_untuned']:
+            command = [
+                sys.executable, sys.argv[0], 'bench_db_concurrency',
+                '--threads', str(options['threads']),
+                '--awards', str(options['awards']),
+                '--seed', str(options['seed']),
+            ]
+            self.stdout.write('')
+            subprocess.run(command, env={**os.environ, 'DB_TUNING': 'off'}, check=True)
+
+    def describe_database(self):
+        config = settings.DATABASES['default']
+        self.stdout.write(f'backend: {connection.vendor}')
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.stdout.write(f'  {pragma} = {cursor.fetchone()[0]}')
+            self.stdout.write(f"  transaction_mode = {config.get('OPTIONS', {}).get('transaction_mode', 'DEFERRED')}")
+        else:
+            pool = config.get('OPTIONS', {}).get('pool')
+            self.stdout.write(f"  pool = {pool or 'off'}, CONN_MAX_AGE = {config.get('CONN_MAX_AGE')}")
+        connection.close()
+
+    def run_load(self, wallet_ids, threads, awards, seed):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def award(wallet_id, user_id):
+            with transaction.atomic():
+                Wallet.objects.filter(pk=wallet_id).update(balance=F('balance') + 1)
+                WalletTransaction.objects.create(
+                    wallet_id=wallet_id, amount=1, transaction_type='earn', description='Concurrency benchmark'
+                )
+                notifications.notify(user_id, 'You earned 1 point!')
+
+        def worker(index):
+            rng = random.Random(seed + index)
+            local_latencies, local_errors = [], []
+            start.wait()
+            try:
+                for _ in range(awards):
+                    wallet_id, user_id = rng.choice(wallet_ids)
+                    began = time.perf_counter()
+                    try:
+                        award(wallet_id, user_id)
+                    except OperationalError as exc:
+                        local_errors.append(str(exc))
+                    else:
+                        local_latencies.append(time.perf_counter() - began)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'threads': threads,
+            'attempted': threads * awards,
+            'committed': len(latencies),
+            'errors': errors,
+            'wall': wall,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+
+    def report(self, label, result):
+        self.stdout.write(
+            f"{label}: {result['committed']}/{result['attempted']} awards committed by "
+            f"{result['threads']} threads in {result['wall']:.2f}s "
+            f"({result['committed'] / result['wall']:.0f} awards/s)"
+        )
+        self.stdout.write(
+            f"  latency p50 {result['p50'] * 1000:.1f} ms, p95 {result['p95'] * 1000:.1f} ms, "
+            f"p99 {result['p99'] * 1000:.1f} ms"
+        )
+        if result['errors']:
+            distinct = sorted(set(result['errors']))
+            self.stdout.write(f"  {len(result['errors'])} failed: {', '.join(distinct[:3])}")
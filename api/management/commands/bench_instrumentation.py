@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api.metrics import registry
+from api.middleware import QueryRecorder, RequestMetricsMiddleware
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-query and per-request overhead of RequestMetricsMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5_000)
+        parser.add_argument('--queries-per-request', type=int, default=10)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        per_request = options['queries_per_request']
+
+        def run_queries():
+            with connection.cursor() as cursor:
+                for _ in range(per_request):
+                    cursor.execute('SELECT 1')
+            return HttpResponse('ok')
+
+        def timed(func):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            return (time.perf_counter() - started) / iterations
+
+        request = RequestFactory().get('/api/bench/')
+        middleware = RequestMetricsMiddleware(lambda request: run_queries())
+        logging.getLogger('api.requests').disabled = True  # measure recording, not console I/O
+
+        run_queries()  # open the connection outside the timings
+        baseline = timed(run_queries)
+        with connection.execute_wrapper(QueryRecorder()):
+            wrapped = timed(run_queries)
+        instrumented = timed(lambda: middleware(request))
+        registry.reset()
+
+        self.stdout.write(f'{iterations} requests x {per_request} queries ({connection.vendor})')
+        self.stdout.write(f'  plain                 : {baseline * 1e6:8.1f} us/request')
+        self.stdout.write(f'  execute_wrapper only  : {wrapped * 1e6:8.1f} us/request '
+                          f'(+{(wrapped - baseline) / per_request * 1e6:.2f} us/query)')
+        self.stdout.write(f'  full middleware       : {instrumented * 1e6:8.1f} us/request '
+                          f'(+{(instrumented - baseline) * 1e6:.1f} us/request)')
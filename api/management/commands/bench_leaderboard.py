@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import RankBoard
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the in-process leaderboard against sorting every wallet per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--queries', type=int, default=2_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        students = options['students']
+        queries = options['queries']
+        balances = {user_id: rng.randint(0, 5_000) for user_id in range(1, students + 1)}
+        lookups = [rng.randint(1, students) for _ in range(queries)]
+
+        def naive_top_and_rank(user_id):
+            ordered = sorted(balances.items(), key=lambda item: (-item[1], item[0]))
+            top = ordered[:10]
+            rank = next(i for i, (uid, _) in enumerate(ordered, 1) if uid == user_id)
+            return top, rank
+
+        started = time.perf_counter()
+        for user_id in lookups:
+            naive_top_and_rank(user_id)
+        naive = time.perf_counter() - started
+
+        started = time.perf_counter()
+        board = RankBoard(balances)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user_id in lookups:
+            board.top(10)
+            board.rank(user_id)
+        ranked = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user_id in lookups:
+            board.add(user_id, rng.randint(1, 50))
+        updates = time.perf_counter() - started
+
+        self.stdout.write(f'{students} students, {queries} top-10 + my-rank queries')
+        self.stdout.write(f'  naive sort per request : {naive / queries * 1e6:10.1f} us/query')
+        self.stdout.write(f'  rank board build       : {build * 1e3:10.1f} ms (once per rebuild)')
+        self.stdout.write(f'  rank board query       : {ranked / queries * 1e6:10.1f} us/query')
+        self.stdout.write(f'  rank board update      : {updates / queries * 1e6:10.1f} us/award')
+        self.stdout.write(self.style.SUCCESS(f'Speed-up: {naive / ranked:.0f}x'))
@@ -0,0 +1,42 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks.driver import Call, run_wsgi, summarize
+from api.benchmarks.scenarios import build_context
+from api.middleware import brotli
+
+ENCODINGS = [('identity', 'identity')] + [('gzip', 'gzip')] + ([('br', 'br')] if brotli else [])
+
+
+class Command(BaseCommand):
+    help = 'Bytes and time per request for the largest endpoints, per Accept-Encoding (after seed_benchmark)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+
+    def handle(self, *args, **options):
+        from backend.wsgi import application
+
+        logging.getLogger('api.requests').setLevel(logging.WARNING)
+        context = build_context()
+        if not context.teachers or not context.students:
+            raise CommandError('No benchmark data found; run seed_benchmark first.')
+        _, teacher_token = context.teachers[0]
+        student, student_token = context.students[0]
+        endpoints = [
+            ('roster', '/api/students/', teacher_token),
+            ('catalog', '/api/products/', student_token),
+            ('users', '/api/users/', teacher_token),
+            ('history', f'/api/history/?limit=200&student_id={student.id}', teacher_token),
+        ]
+
+        self.stdout.write(f"{'endpoint':10} {'encoding':9} {'bytes':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, path, token in endpoints:
+            for label, encoding in ENCODINGS:
+                calls = [Call('GET', path, token=token, headers={'Accept-Encoding': encoding})] * options['iterations']
+                samples, wall = run_wsgi(application, calls, concurrency=1)
+                row = summarize(samples, wall)
+                self.stdout.write(
+                    f"{name:10} {label:9} {row['bytes_mean']:>10,} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}"
+                )
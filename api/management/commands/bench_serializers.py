@@ -0,0 +1,74 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import student_rows, transaction_rows
+from api.models import DimStudent, User, Wallet, WalletTransaction
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import StudentSerializer, WalletTransactionSerializer
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark: rows serialized per second, DRF ModelSerializer vs the .values() fast path (no database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        count = options['rows']
+        now = timezone.now()
+        types = ['earn', 'earn', 'earn', 'spend', 'refund']
+
+        transactions = [
+            WalletTransaction(id=i, amount=rng.randint(1, 100), transaction_type=rng.choice(types),
+                              description='Awarded by Teacher: attendance', timestamp=now - timedelta(minutes=i))
+            for i in range(count)
+        ]
+        transaction_values = [
+            {'id': t.id, 'transaction_type': t.transaction_type, 'amount': t.amount,
+             'description': t.description, 'timestamp': t.timestamp}
+            for t in transactions
+        ]
+
+        students, student_values = [], []
+        for i in range(count):
+            user = User(id=i, first_name='Juan', last_name='Santos', gender=rng.choice(['male', 'female']))
+            user.wallet = Wallet(user=user, balance=rng.randint(0, 500), last_updated=now)
+            students.append(DimStudent(id=i, user=user, level=2, streak=3, last_activity=now))
+            student_values.append({
+                'id': i, 'level': 2, 'streak': 3, 'last_activity': now,
+                'user__first_name': 'Juan', 'user__last_name': 'Santos', 'user__is_active': True,
+                'user__gender': user.gender, 'user__last_login': None,
+                'user__wallet__balance': user.wallet.balance, 'user__wallet__last_updated': now,
+            })
+
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+        cases = [
+            ('transactions', lambda: drf.render(WalletTransactionSerializer(transactions, many=True).data),
+             lambda: fast.render(transaction_rows(transaction_values))),
+            ('students', lambda: drf.render(StudentSerializer(students, many=True).data),
+             lambda: fast.render(student_rows(student_values))),
+        ]
+
+        self.stdout.write(f"{count} rows, best of {options['repeat']}, JSON via {'orjson' if orjson else 'stdlib json'}")
+        for name, before, after in cases:
+            slow = self._best(before, options['repeat'])
+            quick = self._best(after, options['repeat'])
+            self.stdout.write(
+                f'  {name:12} ModelSerializer {count / slow:>10,.0f} rows/s   '
+                f'fast path {count / quick:>10,.0f} rows/s   ({slow / quick:.1f}x)'
+            )
+
+    def _best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
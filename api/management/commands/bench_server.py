@@ -0,0 +1,58 @@
+import logging
+import random
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks.driver import run_http, summarize
+from api.benchmarks.scenarios import SCENARIOS, build_context
+from api.benchmarks.server import PROFILES, Server, available
+
+
+class Command(BaseCommand):
+    help = 'Serves the app with each gunicorn profile (after seed_benchmark) and reports throughput and memory per worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help='Repeatable; defaults to every profile whose worker is installed')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Repeatable; defaults to every scenario')
+        parser.add_argument('--iterations', type=int, default=50, help='Iterations per scenario')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--workers', type=int, help="Per profile (default: gunicorn.conf.py's sizing)")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        context = build_context()
+        if not context.teachers or not context.students:
+            raise CommandError('No benchmark data found; run seed_benchmark first.')
+        logging.getLogger('api.requests').setLevel(logging.WARNING)
+
+        profiles = options['profile'] or [profile for profile in PROFILES if available(profile)]
+        for profile in profiles:
+            if not available(profile):
+                self.stdout.write(self.style.WARNING(f'{profile}: skipped, its worker class is not installed'))
+                continue
+            with Server(profile, options['workers'], options['port']) as server:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{profile}: {server.workers} worker(s), ready in {server.boot_seconds:.1f}s'
+                ))
+                for name in options['scenario'] or list(SCENARIOS):
+                    rng = random.Random(f"{options['seed']}:{name}")
+                    calls = [call for _ in range(options['iterations']) for call in SCENARIOS[name](context, rng)]
+                    row = summarize(*run_http(server.address, calls, options['concurrency']))
+                    self.stdout.write(
+                        f"  {name:11} n={row['requests']:<5} err={row['errors']:<3} "
+                        f"p50={row['p50_ms']:8.1f}ms p95={row['p95_ms']:8.1f}ms "
+                        f"{row['throughput_rps']:8.1f} req/s"
+                    )
+                master, workers = server.memory()
+
+            rss = [worker.rss_kb for worker in workers]
+            pss = [worker.pss_kb for worker in workers]
+            self.stdout.write(
+                f'  memory: master {master.rss_kb / 1024:.0f} MB RSS; per worker '
+                f'{statistics.mean(rss) / 1024:.0f} MB RSS, {statistics.mean(pss) / 1024:.0f} MB PSS; '
+                f'total {(master.pss_kb + sum(pss)) / 1024:.0f} MB PSS'
+            )
@@ -0,0 +1,37 @@
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.startup import by_package, probe
+
+
+class Command(BaseCommand):
+    help = 'Measures worker cold start: import-time profile and time to first response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help='Rows in the import summaries')
+
+    def handle(self, *args, **options):
+        probes = [probe() for _ in range(options['runs'])]
+        top = options['top']
+
+        # Import profile from the median run
+        probes.sort(key=lambda p: p.first_response)
+        median = probes[len(probes) // 2]
+
+        self.stdout.write(f'Slowest imports by cumulative time (median of {len(probes)} runs):')
+        for cumulative_us, self_us, name in sorted(median.imports, reverse=True)[:top]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {name.strip()}')
+
+        self.stdout.write('Self time by top-level package:')
+        for package, self_us in by_package(median.imports)[:top]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {package}')
+
+        def ms(values):
+            return f'median {statistics.median(values) * 1000:.0f} ms, max {max(values) * 1000:.0f} ms'
+
+        self.stdout.write(f'{len(median.modules)} modules loaded after the first response')
+        self.stdout.write(f'boot (import backend.wsgi): {ms([p.boot for p in probes])}')
+        self.stdout.write(f'time to first response:     {ms([p.first_response for p in probes])}')
+        self.stdout.write(f'process incl. interpreter:  {ms([p.process for p in probes])}')
@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from api.benchmarks.driver import percentile
+from api.fast_serializers import STUDENT_VALUES
+from api.models import DimStudent, User
+from api.search import SEARCH_FIELDS, search_students, search_terms
+
+
+def naive_search(query, limit):
+    """What a plain icontains filter over the same fields costs."""
+    condition = Q()
+    for term in search_terms(query):
+        condition &= Q(*[Q(**{f'user__{field}__icontains': term}) for field in SEARCH_FIELDS], _connector=Q.OR)
+    return list(
+        DimStudent.objects.filter(condition, user__user_type=2)
+        .order_by('user__last_name', 'user__first_name', 'id')
+        .values(*STUDENT_VALUES)[:limit]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the indexed student search with an icontains scan. Seed first, '
+        'e.g. seed_benchmark --students 50000 --transactions 0.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        students = list(
+            User.objects.filter(user_type=2).values_list('first_name', 'last_name', 'username', 'phone_number')
+        )
+        if not students:
+            raise CommandError('No students found; run seed_benchmark first.')
+
+        def make_query():
+            first, last, username, phone = rng.choice(students)
+            kind = rng.randrange(4)
+            if kind == 0:
+                return first[:rng.randint(2, len(first))]
+            if kind == 1:
+                return f'{first} {last[:3]}'
+            if kind == 2:
+                return username
+            return (phone or username)[:7]
+
+        queries = [make_query() for _ in range(options['queries'])]
+        self.stdout.write(f'{len(students)} students on {connection.vendor}, {len(queries)} queries')
+
+        for label, search in (('icontains scan', naive_search), ('indexed search', search_students)):
+            search(queries[0], options['limit'])  # warm up
+            latencies, rows = [], 0
+            for query in queries:
+                started = time.perf_counter()
+                rows += len(search(query, options['limit']))
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            self.stdout.write(
+                f'{label:15} p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  '
+                f'p95 {percentile(latencies, 0.95) * 1000:7.2f} ms  '
+                f'max {latencies[-1] * 1000:7.2f} ms  ({rows / len(queries):.1f} rows/query)'
+            )
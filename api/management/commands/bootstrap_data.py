@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bootstrap import BOOTSTRAP_CHUNK_SIZE, bootstrap_fixture
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads JSON fixtures on deploy: streams them, writes only new and changed rows, '
+        'and skips a fixture whose content hash matches the last applied one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='+', help='Paths to JSON fixtures')
+        parser.add_argument('--chunk-size', type=int, default=BOOTSTRAP_CHUNK_SIZE)
+        parser.add_argument('--force', action='store_true', help='Apply even if the hash is unchanged')
+        parser.add_argument('--insert-only', action='store_true',
+                            help='Never overwrite rows that already exist')
+
+    def handle(self, *args, **options):
+        for path in options['fixtures']:
+            started = time.perf_counter()
+            try:
+                stats = bootstrap_fixture(
+                    path,
+                    chunk_size=options['chunk_size'],
+                    force=options['force'],
+                    insert_only=options['insert_only'],
+                )
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'{path}: {exc}')
+            elapsed = time.perf_counter() - started
+
+            if stats is None:
+                self.stdout.write(f'{path}: unchanged since last deploy, skipped ({elapsed * 1000:.0f} ms)')
+                continue
+            for label, counts in stats.items():
+                self.stdout.write(
+                    f"  {label}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged"
+                )
+            self.stdout.write(self.style.SUCCESS(f'{path}: applied in {elapsed * 1000:.0f} ms'))
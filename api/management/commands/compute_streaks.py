@@ -0,0 +1,158 @@
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.models import DimStudent, JobCheckpoint, QRScanLog, WalletTransaction
+
+CHECKPOINT_NAME = 'compute_streaks'
+EPOCH = date(1970, 1, 1)
+# 1970-01-01 was a Thursday; shifting by 3 days makes weekly buckets start on Monday
+BUCKET_SHIFT_DAYS = 3
+
+# Whole days since 1970-01-01 (UTC) for a timestamp column, per backend
+DAY_NUMBER_SQL = {
+    'sqlite': "(CAST(julianday({col}) + 0.5 AS INTEGER) - 2440588)",
+    'postgresql': "(CAST({col} AS date) - DATE '1970-01-01')",
+    'mysql': "DATEDIFF({col}, '1970-01-01')",
+}
+
+# Gaps-and-islands: consecutive buckets share the same (bucket - dense_rank),
+# so the most recent island per student is their latest streak. Earn rows and
+# scans are read from the live and archive tables alike: archive_ledger moves
+# old rows out, but they still count towards a long streak and the level.
+STREAK_SQL = """
+WITH earns AS (
+    SELECT wallet_id, amount, timestamp FROM api_wallettransaction WHERE transaction_type = 'earn'
+    UNION ALL
+    SELECT wallet_id, amount, timestamp FROM api_archivedwallettransaction WHERE transaction_type = 'earn'
+),
+events AS (
+    SELECT w.user_id AS user_id, t.timestamp AS ts
+    FROM earns t
+    JOIN api_wallet w ON w.id = t.wallet_id
+    UNION ALL
+    SELECT l.user_id AS user_id, l.timestamp AS ts
+    FROM api_qrscanlog l
+    UNION ALL
+    SELECT l.user_id AS user_id, l.timestamp AS ts
+    FROM api_archivedqrscanlog l
+),
+candidates AS (
+    SELECT DISTINCT e.user_id
+    FROM events e
+    JOIN api_dimstudent s ON s.user_id = e.user_id
+    {since_filter}
+),
+days AS (
+    SELECT DISTINCT e.user_id, {day} + {shift} AS day
+    FROM events e
+    JOIN candidates c ON c.user_id = e.user_id
+),
+buckets AS (
+    SELECT DISTINCT user_id, (day - (day % {period})) / {period} AS bucket
+    FROM days
+),
+islands AS (
+    SELECT user_id, bucket,
+           bucket - DENSE_RANK() OVER (PARTITION BY user_id ORDER BY bucket) AS island
+    FROM buckets
+),
+runs AS (
+    SELECT user_id, COUNT(*) AS length, MAX(bucket) AS last_bucket,
+           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY MAX(bucket) DESC) AS recency
+    FROM islands
+    GROUP BY user_id, island
+),
+earned AS (
+    SELECT w.user_id AS user_id, SUM(t.amount) AS total
+    FROM earns t
+    JOIN api_wallet w ON w.id = t.wallet_id
+    JOIN candidates c ON c.user_id = w.user_id
+    GROUP BY w.user_id
+)
+SELECT r.user_id, r.length, r.last_bucket, COALESCE(e.total, 0)
+FROM runs r
+LEFT JOIN earned e ON e.user_id = r.user_id
+WHERE r.recency = 1
+"""
+
+
+def bucket_for(day, period):
+    return ((day - EPOCH).days + BUCKET_SHIFT_DAYS) // period
+
+
+def bucket_start(bucket, period):
+    return EPOCH + timedelta(days=bucket * period - BUCKET_SHIFT_DAYS)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes DimStudent.streak and DimStudent.level from earn transactions and scan logs '
+        '(archived ones included). '
+        'Meant to run nightly (e.g. a Render cron job); only students active since the last run are recomputed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Ignore the checkpoint and recompute every student')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        period = settings.STREAK_PERIOD_DAYS
+        points_per_level = settings.POINTS_PER_LEVEL
+        started = timezone.now()
+        current_bucket = bucket_for(timezone.localdate(started), period)
+
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        since = None if options['full'] else checkpoint.last_run_at
+
+        sql = STREAK_SQL.format(
+            since_filter='WHERE e.ts >= %s' if since else '',
+            day=DAY_NUMBER_SQL[connection.vendor].format(col='e.ts'),
+            shift=BUCKET_SHIFT_DAYS,
+            period=int(period),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [since] if since else [])
+            results = {
+                user_id: (length if last_bucket >= current_bucket - 1 else 0, 1 + int(total) // points_per_level)
+                for user_id, length, last_bucket, total in cursor.fetchall()
+            }
+
+        updated = 0
+        user_ids = list(results)
+        chunk_size = options['chunk_size']
+        with transaction.atomic():
+            for start in range(0, len(user_ids), chunk_size):
+                changed = []
+                profiles = DimStudent.objects.filter(
+                    user_id__in=user_ids[start:start + chunk_size]
+                ).only('id', 'user_id', 'streak', 'level')
+                for profile in profiles:
+                    streak, level = results[profile.user_id]
+                    if (profile.streak, profile.level) != (streak, level):
+                        profile.streak, profile.level = streak, level
+                        changed.append(profile)
+                DimStudent.objects.bulk_update(changed, ['streak', 'level'])
+                updated += len(changed)
+
+            # Students with no activity in this or the previous period lose their streak
+            cutoff = timezone.make_aware(datetime.combine(bucket_start(current_bucket - 1, period), time.min))
+            broken = DimStudent.objects.filter(streak__gt=0).exclude(
+                Exists(QRScanLog.objects.filter(user_id=OuterRef('user_id'), timestamp__gte=cutoff))
+            ).exclude(
+                Exists(WalletTransaction.objects.filter(
+                    wallet__user_id=OuterRef('user_id'), transaction_type='earn', timestamp__gte=cutoff
+                ))
+            ).update(streak=0)
+
+            checkpoint.last_run_at = started
+            checkpoint.save(update_fields=['last_run_at', 'updated_at'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {len(results)} students ({updated} changed, {broken} streaks reset) '
+            f'in {(timezone.now() - started).total_seconds():.2f}s'
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.outbox import BATCH_SIZE, dispatch, prune
+
+PRUNE_EVERY_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs pending outbox events (scan logs, activity and notifications of point awards), '
+        'once or every --interval seconds. When this runs as a worker, set '
+        'OUTBOX_DISPATCH_IN_PROCESS=false for the web processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Keep polling every this many seconds')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--prune-days', type=int, default=7,
+                            help='Delete events dispatched longer ago than this (0 keeps them)')
+
+    def handle(self, *args, **options):
+        last_pruned = None
+        while True:
+            due = last_pruned is None or time.monotonic() - last_pruned >= PRUNE_EVERY_SECONDS
+            if options['prune_days'] and due:
+                pruned = prune(options['prune_days'])
+                last_pruned = time.monotonic()
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} dispatched events')
+
+            started = time.perf_counter()
+            attempted = dispatch(options['batch_size'])
+            if attempted or not options['interval']:
+                self.stdout.write(f'Dispatched {attempted} events in {(time.perf_counter() - started) * 1000:.0f} ms')
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,37 @@
+import time
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.rendering import RENDER_WORKERS
+from api.statements import FORMATS, generate
+
+
+class Command(BaseCommand):
+    help = "Writes every student's monthly points statement (CSV and/or PDF) to a directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='YYYY-MM (default: last month)')
+        parser.add_argument('--output', default='statements',
+                            help='Directory; statements go in a YYYY-MM folder inside it')
+        parser.add_argument('--format', action='append', choices=FORMATS,
+                            help='Repeatable; defaults to every format')
+        parser.add_argument('--workers', type=int, default=RENDER_WORKERS)
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month takes YYYY-MM, e.g. 2025-09')
+        else:
+            today = timezone.localdate()
+            month = date(today.year - (today.month == 1), (today.month - 2) % 12 + 1, 1)
+
+        started = time.perf_counter()
+        count, files = generate(month, options['output'], options['format'] or FORMATS, options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} statement(s) for {month:%B %Y}, {files} file(s) written to '
+            f'{options["output"]}/{month:%Y-%m} in {time.perf_counter() - started:.1f}s'
+        ))
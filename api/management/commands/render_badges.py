@@ -0,0 +1,50 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.badges import badge_pngs, badge_rows, badge_sheet, pages_of
+from api.rendering import RENDER_WORKERS
+
+
+class Command(BaseCommand):
+    help = 'Renders a printable sheet of QR badges (QR plus name) for all active or the listed students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='badges.pdf',
+                            help='PDF file, or for --format png the prefix of one file per page')
+        parser.add_argument('--format', choices=('pdf', 'png'), default='pdf')
+        parser.add_argument('--students', help='Comma-separated user ids (default: every active student)')
+        parser.add_argument('--workers', type=int, default=RENDER_WORKERS)
+
+    def handle(self, *args, **options):
+        student_ids = None
+        if options['students']:
+            try:
+                student_ids = [int(pk) for pk in options['students'].split(',')]
+            except ValueError:
+                raise CommandError('--students takes comma-separated user ids')
+        badges = badge_rows(student_ids)
+        if not badges:
+            raise CommandError('No students with a QR code selected.')
+
+        started = time.perf_counter()
+        output = Path(options['output'])
+        if options['format'] == 'pdf':
+            with open(output, 'wb') as sheet:
+                for chunk in badge_sheet(badges, options['workers']):
+                    sheet.write(chunk)
+            written = [output]
+        else:
+            stem = output.with_suffix('')
+            written = []
+            for number, png in enumerate(badge_pngs(badges, options['workers']), start=1):
+                path = stem.with_name(f'{stem.name}-{number:03d}.png')
+                path.write_bytes(png)
+                written.append(path)
+
+        shown = ', '.join(map(str, written[:3])) + (' ...' if len(written) > 3 else '')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(badges)} badges on {len(pages_of(badges))} page(s) written to {shown} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,125 @@
+import json
+import logging
+import random
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.benchmarks.driver import run_asgi, run_wsgi, summarize
+from api.benchmarks.scenarios import SCENARIOS, build_context
+
+BASELINE_DIR = Path(settings.BASE_DIR) / 'benchmarks' / 'baselines'
+
+
+class Command(BaseCommand):
+    help = 'Runs the load scenarios against the WSGI/ASGI apps (after seed_benchmark) and reports latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Repeatable; defaults to every scenario')
+        parser.add_argument('--iterations', type=int, default=100, help='Iterations per scenario')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='wsgi')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--save', metavar='NAME', help='Save results as a JSON baseline')
+        parser.add_argument('--compare', metavar='NAME', help='Compare against a saved baseline')
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Allowed relative slowdown before flagging a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        context = build_context()
+        if not context.teachers or not context.students:
+            raise CommandError('No benchmark data found; run seed_benchmark first.')
+
+        from backend.asgi import application as asgi_application
+        from backend.wsgi import application as wsgi_application
+
+        # Set after the app imports, which re-apply LOGGING; per-request log lines would dominate the timings
+        logging.getLogger('api.requests').setLevel(logging.WARNING)
+
+        servers = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+        scenarios = options['scenario'] or list(SCENARIOS)
+        results = {}
+        for server in servers:
+            results[server] = {}
+            for name in scenarios:
+                rng = random.Random(f"{options['seed']}:{name}")
+                calls = [call for _ in range(options['iterations']) for call in SCENARIOS[name](context, rng)]
+                if server == 'wsgi':
+                    samples, wall = run_wsgi(wsgi_application, calls, options['concurrency'])
+                else:
+                    samples, wall = run_asgi(asgi_application, calls, options['concurrency'])
+                results[server][name] = summarize(samples, wall)
+                self._print_row(server, name, results[server][name])
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'commit': self._git_commit(),
+            'database': connection.vendor,
+            'students': len(context.students),
+            'iterations': options['iterations'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        if options['save']:
+            BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+            path = BASELINE_DIR / f"{options['save']}.json"
+            path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {path}'))
+        if options['compare']:
+            regressions = self._compare(report, options['compare'], options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} regression(s) against {options["compare"]}')
+
+    def _print_row(self, server, name, row):
+        self.stdout.write(
+            f"{server:4} {name:11} n={row['requests']:<5} err={row['errors']:<3} "
+            f"p50={row['p50_ms']:8.1f}ms p95={row['p95_ms']:8.1f}ms p99={row['p99_ms']:8.1f}ms "
+            f"{row['throughput_rps']:8.1f} req/s  {row['queries_mean']:5.1f} queries/req"
+        )
+
+    def _compare(self, report, name, tolerance):
+        path = BASELINE_DIR / f'{name}.json'
+        if not path.exists():
+            raise CommandError(f'No baseline at {path}')
+        baseline = json.loads(path.read_text())
+        self.stdout.write(f"\nCompared with {name} (commit {baseline.get('commit') or '?'}):")
+
+        regressions = 0
+        for server, scenarios in report['results'].items():
+            for scenario, row in scenarios.items():
+                old = baseline['results'].get(server, {}).get(scenario)
+                if not old:
+                    continue
+                problems = []
+                if old['p95_ms'] and row['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+                    problems.append('p95')
+                if old['throughput_rps'] and row['throughput_rps'] < old['throughput_rps'] * (1 - tolerance):
+                    problems.append('throughput')
+                if row['queries_mean'] > old['queries_mean']:
+                    problems.append('queries')
+                regressions += bool(problems)
+                line = (
+                    f"  {server:4} {scenario:11} p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f}ms, "
+                    f"{old['throughput_rps']:.1f} -> {row['throughput_rps']:.1f} req/s, "
+                    f"{old['queries_mean']:.1f} -> {row['queries_mean']:.1f} queries/req"
+                )
+                if problems:
+                    self.stdout.write(self.style.ERROR(f"{line}  REGRESSION ({', '.join(problems)})"))
+                else:
+                    self.stdout.write(line)
+        return regressions
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmarks.seed import seed
+from api.models import Product, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills a scratch database with a deterministic benchmark dataset. '
+        'Point DATABASE_URL at a throwaway database first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--transactions', type=int, default=20_000)
+        parser.add_argument('--products', type=int, default=40)
+        parser.add_argument('--weeks', type=int, default=26, help='How far back activity goes')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--reset', action='store_true', help='Delete a previous benchmark dataset first')
+        parser.add_argument(
+            '--allow-existing-data', action='store_true',
+            help='Seed even though the database holds non-benchmark users',
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.exclude(username__startswith='bench_').exists() and not options['allow_existing_data']:
+            raise CommandError(
+                'This database contains real users. Point DATABASE_URL at a scratch database '
+                'or pass --allow-existing-data.'
+            )
+        if User.objects.filter(username__startswith='bench_').exists():
+            if not options['reset']:
+                raise CommandError('A benchmark dataset already exists; pass --reset to replace it.')
+            User.objects.filter(username__startswith='bench_').delete()
+            Product.objects.filter(description='Benchmark product').delete()
+
+        summary = seed(
+            teachers=options['teachers'],
+            students=options['students'],
+            transactions=options['transactions'],
+            products=options['products'],
+            weeks=options['weeks'],
+            seed_value=options['seed'],
+        )
+        details = ', '.join(f'{value} {name}' for name, value in summary.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {connection.vendor} database: {details}'))
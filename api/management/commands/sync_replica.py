@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.replicas import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the SQLite primary onto the SQLite replica, once or every --interval '
+        'seconds, to stand in for replication when testing read-replica routing locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying with this many seconds of simulated lag')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('Set DATABASE_REPLICA_URL to configure a replica.')
+        primary, replica = connections['default'], connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError(
+                'Only SQLite files can be synced this way; use streaming replication for Postgres.'
+            )
+
+        while True:
+            started = time.perf_counter()
+            self.copy(primary.settings_dict['NAME'], replica.settings_dict['NAME'])
+            self.stdout.write(f'Replica synced in {(time.perf_counter() - started) * 1000:.0f} ms')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path):
+        source = sqlite3.connect(str(source_path))
+        target = sqlite3.connect(str(target_path))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
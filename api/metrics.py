@@ -0,0 +1,122 @@
+"""
+In-process request metrics.
+
+Each worker keeps a rolling window of latency histograms per URL name,
+plus query counts and DB time, and renders them in the Prometheus text
+exposition format for /api/metrics/.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW_SECONDS = getattr(settings, 'METRICS_WINDOW_SECONDS', 300)
+SLOT_SECONDS = 60
+
+
+class _Slot:
+    __slots__ = ('started', 'buckets', 'count', 'latency_sum', 'db_sum', 'queries_sum')
+
+    def __init__(self, started):
+        self.started = started
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.latency_sum = 0.0
+        self.db_sum = 0.0
+        self.queries_sum = 0
+
+
+class RollingHistogram:
+    """Latency histogram over the last WINDOW_SECONDS, in SLOT_SECONDS slices."""
+
+    def __init__(self):
+        self._slots = []
+
+    def observe(self, latency, db_time, queries, now):
+        slot_start = now - now % SLOT_SECONDS
+        if not self._slots or self._slots[-1].started != slot_start:
+            self._slots.append(_Slot(slot_start))
+            horizon = now - WINDOW_SECONDS
+            while self._slots and self._slots[0].started + SLOT_SECONDS <= horizon:
+                self._slots.pop(0)
+        slot = self._slots[-1]
+        slot.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        slot.count += 1
+        slot.latency_sum += latency
+        slot.db_sum += db_time
+        slot.queries_sum += queries
+
+    def snapshot(self, now):
+        horizon = now - WINDOW_SECONDS
+        buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        totals = {'count': 0, 'latency_sum': 0.0, 'db_sum': 0.0, 'queries_sum': 0}
+        for slot in self._slots:
+            if slot.started + SLOT_SECONDS <= horizon:
+                continue
+            for i, value in enumerate(slot.buckets):
+                buckets[i] += value
+            totals['count'] += slot.count
+            totals['latency_sum'] += slot.latency_sum
+            totals['db_sum'] += slot.db_sum
+            totals['queries_sum'] += slot.queries_sum
+        return buckets, totals
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view_name, latency, db_time, queries):
+        now = time.time()
+        with self._lock:
+            histogram = self._histograms.get(view_name)
+            if histogram is None:
+                histogram = self._histograms[view_name] = RollingHistogram()
+            histogram.observe(latency, db_time, queries, now)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        now = time.time()
+        with self._lock:
+            snapshots = {name: h.snapshot(now) for name, h in sorted(self._histograms.items())}
+
+        lines = [
+            f'# HELP api_request_duration_seconds View latency over the last {WINDOW_SECONDS}s.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for name, (buckets, totals) in snapshots.items():
+            label = _label(name)
+            cumulative = 0
+            for bound, value in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += value
+                lines.append(f'api_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'api_request_duration_seconds_sum{{view="{label}"}} {totals["latency_sum"]:.6f}')
+            lines.append(f'api_request_duration_seconds_count{{view="{label}"}} {totals["count"]}')
+
+        lines += [
+            f'# HELP api_request_db_seconds_sum Database time over the last {WINDOW_SECONDS}s.',
+            '# TYPE api_request_db_seconds_sum gauge',
+        ]
+        for name, (_, totals) in snapshots.items():
+            lines.append(f'api_request_db_seconds_sum{{view="{_label(name)}"}} {totals["db_sum"]:.6f}')
+
+        lines += [
+            f'# HELP api_request_queries_sum SQL queries executed over the last {WINDOW_SECONDS}s.',
+            '# TYPE api_request_queries_sum gauge',
+        ]
+        for name, (_, totals) in snapshots.items():
+            lines.append(f'api_request_queries_sum{{view="{_label(name)}"}} {totals["queries_sum"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
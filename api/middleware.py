@@ -0,0 +1,225 @@
+import gzip
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+from . import replicas
+from .metrics import registry
+
+logger = logging.getLogger('api.requests')
+
+SLOWEST_QUERIES = getattr(settings, 'METRICS_SLOWEST_QUERIES', 3)
+SQL_PREVIEW_CHARS = 200
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook counting queries and DB time for one request."""
+
+    def __init__(self, keep=SLOWEST_QUERIES):
+        self.count = 0
+        self.duration = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (duration, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def slowest_queries(self):
+        return [
+            {'ms': round(elapsed * 1000, 2), 'sql': sql[:SQL_PREVIEW_CHARS]}
+            for elapsed, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, DB time and view latency for every request.
+
+    The numbers go out as a Server-Timing header and a structured log line,
+    and are folded into the per-URL-name histograms behind /api/metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or 'unmatched'
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+        registry.observe(view_name, elapsed, recorder.duration, recorder.count)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'db_ms': round(recorder.duration * 1000, 2),
+                'queries': recorder.count,
+                'slowest': recorder.slowest_queries(),
+            }))
+        return response
+
+
+COMPRESSION_MIN_BYTES = getattr(settings, 'COMPRESSION_MIN_BYTES', 1024)
+COMPRESSION_GZIP_LEVEL = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+COMPRESSION_BROTLI_QUALITY = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+def accepted_encodings(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression for API responses.
+
+    Only bodies of at least COMPRESSION_MIN_BYTES with a text-like content
+    type are compressed, brotli is preferred when installed and accepted,
+    and the original body is kept if compression would not shrink it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < COMPRESSION_MIN_BYTES:
+            return response
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+_jwt = JWTAuthentication()
+
+
+def request_user_id(request):
+    """The caller's user id from the session or bearer token, without a query."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return _jwt.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except (InvalidToken, TokenError):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves safe requests from the read replica.
+
+    Unsafe requests stay on the primary and pin their user to it for a few
+    seconds afterwards, as do safe requests from a pinned user. Does
+    nothing unless a replica database is configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas.replica_configured():
+            return self.get_response(request)
+
+        user_id = request_user_id(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if user_id is not None and response.status_code < 400:
+                replicas.pin_to_primary([user_id])
+            return response
+
+        if replicas.is_pinned(user_id):
+            return self.get_response(request)
+        with replicas.use_replica():
+            return self.get_response(request)
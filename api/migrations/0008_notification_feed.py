@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_unread_counts(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    counts = (
+        User.objects.annotate(unread=Count('notifications', filter=Q(notifications__is_read=False)))
+        .filter(unread__gt=0)
+        .values_list('pk', 'unread')
+    )
+    for pk, unread in counts:
+        User.objects.filter(pk=pk).update(unread_notifications=unread)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_remove_dimstudent_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_feed_idx'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
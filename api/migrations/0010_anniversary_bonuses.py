@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_month_day_keys(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    users = User.objects.exclude(birthday=None, salvation_date=None).only('birthday', 'salvation_date')
+    for user in users:
+        user.birthday_md = user.birthday.month * 100 + user.birthday.day if user.birthday else None
+        user.salvation_md = user.salvation_date.month * 100 + user.salvation_date.day if user.salvation_date else None
+        user.save(update_fields=['birthday_md', 'salvation_md'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_jobcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='birthday_md',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='salvation_md',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='BonusAward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('birthday', 'Birthday'), ('salvation', 'Salvation anniversary')], max_length=20)),
+                ('year', models.IntegerField()),
+                ('points', models.IntegerField()),
+                ('awarded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bonus_awards', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'year'), name='unique_bonus_per_year')],
+            },
+        ),
+        migrations.RunPython(backfill_month_day_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_anniversary_bonuses'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', '-timestamp', '-id'], name='wallet_txn_history_idx'),
+        ),
+    ]
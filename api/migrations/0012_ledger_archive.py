@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_wallet_txn_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='opening_balance',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='opening_balance_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedQRScanLog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('points_given', models.IntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('scanned_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_scanner_logs', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_scanned_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedWalletTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.IntegerField()),
+                ('transaction_type', models.CharField(choices=[('earn', 'Earn'), ('spend', 'Spend'), ('transfer', 'Transfer'), ('refund', 'Refund'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='api.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', '-timestamp', '-id'], name='archived_txn_history_idx')],
+            },
+        ),
+    ]
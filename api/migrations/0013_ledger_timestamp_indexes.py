@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_ledger_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qrscanlog',
+            index=models.Index(fields=['timestamp'], name='qrscan_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['timestamp'], name='wallet_txn_timestamp_idx'),
+        ),
+    ]
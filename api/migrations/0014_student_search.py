@@ -0,0 +1,42 @@
+from django.db import migrations
+
+PG_SEARCH_INDEX = """
+    CREATE INDEX IF NOT EXISTS student_search_trgm_idx ON api_user USING gin (
+        (lower(first_name || ' ' || last_name || ' ' || username || ' ' || coalesce(phone_number, '')))
+        gin_trgm_ops
+    )
+"""
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(PG_SEARCH_INDEX)
+    elif connection.vendor == 'sqlite':
+        from api.search import install_sqlite_search
+
+        with connection.cursor() as cursor:
+            install_sqlite_search(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS student_search_trgm_idx')
+    elif connection.vendor == 'sqlite':
+        for trigger in ('api_student_search_ai', 'api_student_search_ad', 'api_student_search_au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS api_student_search')
+
+
+class Migration(migrations.Migration):
+    # Backend-specific search index for api.search; other backends get none
+
+    dependencies = [
+        ('api', '0013_ledger_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:25
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+REFUND_DESCRIPTION = re.compile(r'^Refund of transaction #(\d+)$')
+
+
+def backfill_refund_links(apps, schema_editor):
+    """Link the refunds written by refund_spends (matched by description) to their spends."""
+    WalletTransaction = apps.get_model('api', 'WalletTransaction')
+    linked = set()
+    refunds = WalletTransaction.objects.filter(
+        transaction_type='refund', description__startswith='Refund of transaction #'
+    ).order_by('id').values_list('id', 'description')
+    for pk, description in refunds:
+        match = REFUND_DESCRIPTION.match(description)
+        if match and int(match[1]) not in linked:  # the first refund of a spend keeps the link
+            linked.add(int(match[1]))
+            WalletTransaction.objects.filter(pk=pk).update(refund_of_id=int(match[1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='refund_of',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='refund', to='api.wallettransaction'),
+        ),
+        migrations.RunPython(backfill_refund_links, migrations.RunPython.noop),
+    ]
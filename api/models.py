@@ -1,8 +1,13 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import uuid
 
+def month_day_key(value):
+    return value.month * 100 + value.day if value else None
+
+
 # -------------------
 # Custom User
 # -------------------
@@ -21,13 +26,24 @@ class User(AbstractUser):
     qr_value = models.CharField(max_length=100, unique=True, blank=True, null=True)
     qr_image = models.ImageField(upload_to="qr_codes/", null=True, blank=True)
     profile_pic = models.ImageField(upload_to="profiles/", null=True, blank=True)
+    unread_notifications = models.PositiveIntegerField(default=0)  # kept in step by api.notifications
+    # month * 100 + day, indexed so the daily bonus job can find anniversaries without a table scan
+    birthday_md = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True, editable=False)
+    salvation_md = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True, editable=False)
 
 
     def save(self, *args, **kwargs):
         if not self.qr_value:
             self.qr_value = str(uuid.uuid4())
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"birthday", "salvation_date"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "birthday_md", "salvation_md"}
         super().save(*args, **kwargs)
 
+    def sync_anniversary_keys(self):
+        self.birthday_md = month_day_key(self.birthday)
+        self.salvation_md = month_day_key(self.salvation_date)
+
     def __str__(self):
         return self.username
 
@@ -55,26 +71,41 @@ class Wallet(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="wallet")
     balance = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
+    # Net of the transactions moved to ArchivedWalletTransaction, as of opening_balance_at
+    opening_balance = models.IntegerField(default=0)
+    opening_balance_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Wallet({self.user.username}) - {self.balance}"
 
 
+TRANSACTION_TYPE_CHOICES = [
+    ("earn", "Earn"),
+    ("spend", "Spend"),
+    ("transfer", "Transfer"),
+    ("refund", "Refund"),
+    ("adjustment", "Adjustment"),
+]
+
+
 class WalletTransaction(models.Model):
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="transactions")
     amount = models.IntegerField()
-    transaction_type = models.CharField(
-        max_length=20,
-        choices=[
-            ("earn", "Earn"),
-            ("spend", "Spend"),
-            ("transfer", "Transfer"),
-            ("refund", "Refund"),
-            ("adjustment", "Adjustment"),
-        ],
-    )
+    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
     description = models.TextField(blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
+    # The spend a refund credits back; unique, so a spend is refunded at most once.
+    # No database constraint: archive_ledger may move the spend out before its refund.
+    refund_of = models.OneToOneField(
+        "self", null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="refund"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet", "-timestamp", "-id"], name="wallet_txn_history_idx"),
+            # Admin date hierarchy and archival both range-scan on timestamp alone
+            models.Index(fields=["timestamp"], name="wallet_txn_timestamp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} {self.amount} ({self.wallet.user.username})"
@@ -150,6 +181,11 @@ class QRScanLog(models.Model):
     points_given = models.IntegerField()
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["timestamp"], name="qrscan_timestamp_idx"),
+        ]
+
     def __str__(self):
         return f"{self.scanned_by.username} scanned {self.user.username} ({self.points_given} pts)"
 
@@ -160,5 +196,135 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notification_feed_idx"),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username}"
+
+
+class ScanSession(models.Model):
+    """An attendance burst: every student scanned gets the same points once (see api.scan_sessions)."""
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name="scan_sessions")
+    points = models.PositiveIntegerField()
+    reason = models.CharField(max_length=500)
+    opened_at = models.DateTimeField(default=timezone.now)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    awarded_count = models.PositiveIntegerField(default=0)  # students credited by flushes so far
+    last_flushed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Scan session {self.pk} by {self.teacher.username} ({self.points} pts)"
+
+
+class ScanSessionEntry(models.Model):
+    """A flushed scan; the unique constraint dedupes scans buffered by different workers."""
+    session = models.ForeignKey(ScanSession, on_delete=models.CASCADE, related_name="entries")
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="scan_session_entries")
+    scanned_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "student"], name="unique_scan_per_session"),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} in scan session {self.session_id}"
+
+
+class BonusAward(models.Model):
+    KIND_CHOICES = [
+        ("birthday", "Birthday"),
+        ("salvation", "Salvation anniversary"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bonus_awards")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    year = models.IntegerField()
+    points = models.IntegerField()
+    awarded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "kind", "year"], name="unique_bonus_per_year"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} bonus {self.year} ({self.user.username})"
+
+
+# -------------------
+# Archive (rows moved out of the hot tables by api.archival)
+# -------------------
+class ArchivedWalletTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # keeps the original WalletTransaction id
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="archived_transactions")
+    amount = models.IntegerField()
+    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
+    description = models.TextField(blank=True)
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet", "-timestamp", "-id"], name="archived_txn_history_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} {self.amount} (archived)"
+
+
+class ArchivedQRScanLog(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # keeps the original QRScanLog id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_scanned_logs")
+    scanned_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_scanner_logs")
+    points_given = models.IntegerField()
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.scanned_by_id} scanned {self.user_id} ({self.points_given} pts, archived)"
+
+
+# -------------------
+# Background Jobs
+# -------------------
+class OutboxEvent(models.Model):
+    """A side effect recorded with the write that caused it, run later by api.outbox."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed back after a failed attempt
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only the pending rows are indexed, so the dispatcher's poll stays cheap as done rows pile up
+            models.Index(
+                fields=["available_at", "id"], condition=models.Q(status="pending"), name="outbox_pending_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
+
+
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    value = models.CharField(max_length=255, blank=True)  # job-specific marker, e.g. a content hash
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_run_at}"
@@ -0,0 +1,120 @@
+"""
+Notification service.
+
+Every notification write goes through these helpers so the denormalized
+``User.unread_notifications`` counter stays in step with the Notification
+rows and the badge count never needs a COUNT(*).
+"""
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, User
+
+BROADCAST_CHUNK_SIZE = 500
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def notify(user_id, message):
+    """Create a single notification and bump the user's unread counter."""
+    with transaction.atomic():
+        notification = Notification.objects.create(user_id=user_id, message=message)
+        User.objects.filter(pk=user_id).update(
+            unread_notifications=F('unread_notifications') + 1
+        )
+    return notification
+
+
+def broadcast(user_ids, message, chunk_size=BROADCAST_CHUNK_SIZE):
+    """
+    Send the same message to many users.
+
+    Rows are written with bulk_create and the counters bumped with one
+    UPDATE per chunk, so a whole class costs a handful of queries.
+    Returns the number of notifications created.
+    """
+    created_at = timezone.now()
+    sent = 0
+    with transaction.atomic():
+        for chunk in _chunked(user_ids, chunk_size):
+            Notification.objects.bulk_create(
+                [Notification(user_id=uid, message=message, created_at=created_at) for uid in chunk]
+            )
+            User.objects.filter(pk__in=chunk).update(
+                unread_notifications=F('unread_notifications') + 1
+            )
+            sent += len(chunk)
+    return sent
+
+
+def notify_many(messages):
+    """
+    Send different messages to different users: ``messages`` is an iterable
+    of ``(user_id, message)``. One bulk insert, and one counter UPDATE per
+    distinct number of messages a user received. Returns the number sent.
+    """
+    messages = list(messages)
+    if not messages:
+        return 0
+    created_at = timezone.now()
+    received = Counter(user_id for user_id, _ in messages)
+    by_count = defaultdict(list)
+    for user_id, count in received.items():
+        by_count[count].append(user_id)
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, message=message, created_at=created_at) for user_id, message in messages],
+            batch_size=BROADCAST_CHUNK_SIZE,
+        )
+        for count, user_ids in by_count.items():
+            User.objects.filter(pk__in=user_ids).update(unread_notifications=F('unread_notifications') + count)
+    return len(messages)
+
+
+def unread_count(user):
+    """Read the counter straight off the user row."""
+    return User.objects.filter(pk=user.pk).values_list('unread_notifications', flat=True).first() or 0
+
+
+def mark_read(user, notification_id):
+    """Mark one notification read. Returns False if it was missing or already read."""
+    with transaction.atomic():
+        updated = Notification.objects.filter(
+            pk=notification_id, user=user, is_read=False
+        ).update(is_read=True)
+        if updated:
+            User.objects.filter(pk=user.pk).update(
+                unread_notifications=Greatest(F('unread_notifications') - 1, 0)
+            )
+    return bool(updated)
+
+
+def mark_all_read(user):
+    """Mark every notification read with a single UPDATE and zero the counter."""
+    with transaction.atomic():
+        updated = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        User.objects.filter(pk=user.pk).update(unread_notifications=0)
+    return updated
+
+
+def recount_unread(user_ids=None):
+    """Rebuild counters from the rows, e.g. after notifications were edited in the admin."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    counts = users.annotate(
+        unread=Count('notifications', filter=Q(notifications__is_read=False))
+    ).values_list('pk', 'unread', 'unread_notifications')
+    with transaction.atomic():
+        for pk, unread, stored in counts:
+            if unread != stored:
+                User.objects.filter(pk=pk).update(unread_notifications=unread)
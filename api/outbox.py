@@ -0,0 +1,230 @@
+"""
+Transactional outbox for the side effects of ledger writes.
+
+publish() records an OutboxEvent in the caller's transaction, so a side
+effect exists if and only if the balance change that caused it commits.
+dispatch() drains pending events in batches: a batch is claimed, handled
+and marked done in one transaction, so the handlers' writes commit with
+the "done" mark and are never applied twice. A handler receives every
+payload of its topic in the batch at once. If a batch fails it is retried
+one event at a time; an event that keeps failing backs off exponentially
+and is parked as failed after OUTBOX_MAX_ATTEMPTS.
+
+Events are drained by ``python manage.py dispatch_outbox`` or, with
+OUTBOX_DISPATCH_IN_PROCESS (the default), by a thread in each web process
+that wakes when a publishing transaction commits.
+"""
+import logging
+import threading
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import notifications
+from .models import DimStudent, OutboxEvent, QRScanLog
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+BACKOFF_SECONDS = 5  # doubled after each failed attempt
+POLL_SECONDS = getattr(settings, 'OUTBOX_POLL_SECONDS', 5)
+DISPATCH_IN_PROCESS = getattr(settings, 'OUTBOX_DISPATCH_IN_PROCESS', True)
+
+HANDLERS = {}
+
+
+def handler(topic):
+    """Register ``func(payloads)`` as the handler for a topic."""
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def publish(topic, payload):
+    """Record a side effect; call inside the transaction that causes it."""
+    event = OutboxEvent.objects.create(topic=topic, payload=payload)
+    if DISPATCH_IN_PROCESS:
+        transaction.on_commit(dispatcher.wake)
+    return event
+
+
+def _run(topic, events):
+    handle = HANDLERS.get(topic)
+    if handle is None:
+        raise LookupError(f'No outbox handler for {topic!r}')
+    handle([event.payload for event in events])
+
+
+def _claim(limit, pk=None):
+    events = OutboxEvent.objects.filter(status='pending', available_at__lte=timezone.now())
+    if pk is not None:
+        events = events.filter(pk=pk)
+    if connections[events.db].features.has_select_for_update_skip_locked:
+        events = events.select_for_update(skip_locked=True)  # concurrent dispatchers take different rows
+    return list(events.order_by('available_at', 'id')[:limit])
+
+
+def _handle(events):
+    """Run events, a savepoint per topic. Returns (done, [(event, error)])."""
+    by_topic = defaultdict(list)
+    for event in events:
+        by_topic[event.topic].append(event)
+    done, failed = [], []
+    for topic, group in by_topic.items():
+        try:
+            with transaction.atomic():
+                _run(topic, group)
+            done.extend(group)
+            continue
+        except Exception:
+            if len(group) == 1:
+                failed.append((group[0], traceback.format_exc(limit=5)))
+                continue
+        for event in group:  # one at a time, to find the event that broke the batch
+            try:
+                with transaction.atomic():
+                    _run(topic, [event])
+                done.append(event)
+            except Exception:
+                failed.append((event, traceback.format_exc(limit=5)))
+    return done, failed
+
+
+def _mark(done, failed):
+    now = timezone.now()
+    OutboxEvent.objects.filter(pk__in=[event.pk for event in done]).update(
+        status='done', dispatched_at=now, attempts=F('attempts') + 1
+    )
+    for event, error in failed:
+        event.attempts += 1
+        event.last_error = error
+        if event.attempts >= MAX_ATTEMPTS:
+            event.status = 'failed'
+        else:
+            event.available_at = now + timedelta(seconds=BACKOFF_SECONDS * 2 ** (event.attempts - 1))
+        logger.warning('Outbox event %s (%s) failed, attempt %s:\n%s', event.pk, event.topic, event.attempts, error)
+    OutboxEvent.objects.bulk_update([event for event, _ in failed], ['attempts', 'last_error', 'status', 'available_at'])
+
+
+def dispatch_batch(batch_size=BATCH_SIZE):
+    """Handle up to ``batch_size`` due events. Returns how many were attempted."""
+    events = []
+    try:
+        with transaction.atomic():
+            events = _claim(batch_size)
+            _mark(*_handle(events))
+        return len(events)
+    except DatabaseError:
+        if not events:
+            raise
+    # A deferred constraint (e.g. a foreign key) failed at commit, which no
+    # savepoint catches: run the batch again with a transaction per event.
+    # The rows are claimed afresh, since _mark already counted an attempt on
+    # the instances of the rolled-back batch.
+    for event in events:
+        try:
+            with transaction.atomic():
+                claimed = _claim(1, pk=event.pk)
+                if claimed:
+                    _run(event.topic, claimed)
+                    _mark(claimed, [])
+        except Exception:
+            error = traceback.format_exc(limit=5)
+            with transaction.atomic():
+                claimed = _claim(1, pk=event.pk)
+                if claimed:
+                    _mark([], [(claimed[0], error)])
+    return len(events)
+
+
+def dispatch(batch_size=BATCH_SIZE, max_batches=None):
+    """Drain due events batch by batch. Returns how many were attempted."""
+    attempted = batches = 0
+    while max_batches is None or batches < max_batches:
+        handled = dispatch_batch(batch_size)
+        attempted += handled
+        batches += 1
+        if handled < batch_size:
+            break
+    return attempted
+
+
+def prune(older_than_days):
+    """Delete events dispatched more than ``older_than_days`` ago."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = OutboxEvent.objects.filter(status='done', dispatched_at__lt=cutoff).delete()
+    return deleted
+
+
+class Dispatcher:
+    """In-process dispatcher: a daemon thread woken by publishing commits."""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            # Lazily, so a preloading server forks before the thread exists
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                dispatch()
+            except Exception:
+                logger.exception('Outbox dispatch failed')
+            finally:
+                connections.close_all()  # this thread's connections only
+
+
+dispatcher = Dispatcher()
+
+
+# ===== HANDLERS =====
+AWARD_MESSAGE = "You earned {points} points: {reason}"
+DEDUCTION_MESSAGE = "{points} points were deducted: {reason}"
+
+
+@handler('points_awarded')
+def record_points_awarded(payloads):
+    """Scan logs, last_activity and notifications for award_points."""
+    awarded_at = [parse_datetime(payload['at']) for payload in payloads]
+
+    QRScanLog.objects.bulk_create([
+        QRScanLog(
+            user_id=payload['student_id'], scanned_by_id=payload['teacher_id'],
+            points_given=payload['points'], timestamp=at,
+        )
+        for payload, at in zip(payloads, awarded_at) if not payload['is_deduction']
+    ])
+
+    latest = {}
+    for payload, at in zip(payloads, awarded_at):
+        latest[payload['student_id']] = max(at, latest.get(payload['student_id'], at))
+    DimStudent.objects.filter(user_id__in=latest).update(last_activity=Case(
+        *[When(user_id=user_id, then=Value(at)) for user_id, at in latest.items()],
+        output_field=DateTimeField(),
+    ))
+
+    notifications.notify_many(
+        (payload['student_id'], (DEDUCTION_MESSAGE if payload['is_deduction'] else AWARD_MESSAGE).format(
+            points=payload['points'], reason=payload['reason'],
+        ))
+        for payload in payloads
+    )
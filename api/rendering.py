@@ -0,0 +1,71 @@
+"""
+Shared plumbing for the batch renderers (badge sheets, wallet statements).
+
+render_ordered fans documents out to a process pool and hands the results
+back in order through a bounded window, so memory stays flat however many
+documents there are. PdfWriter is a minimal PDF serializer: the renderers
+emit numbered objects as they go and the cross-reference table last, so a
+document can be streamed while it is being produced.
+
+This module must not import models: spawned pool workers import it before
+django.setup() has run.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+RENDER_WORKERS = getattr(settings, 'RENDER_WORKERS', None) or os.cpu_count() or 1
+
+
+def _init_worker():
+    import django
+    django.setup()  # spawned workers start without Django
+
+
+def render_ordered(render, items, workers=RENDER_WORKERS):
+    """Yield render(item) for each item in order, at most 2 x workers items in flight."""
+    if workers <= 1:
+        yield from map(render, items)
+        return
+    # Spawned, not forked: the caller may be a threaded web worker
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        window = deque()
+        for item in items:
+            window.append(pool.submit(render, item))
+            if len(window) >= 2 * workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+class PdfWriter:
+    """Serializes numbered PDF objects, tracking their offsets for the xref table."""
+
+    def __init__(self):
+        self.offsets = {}
+        self.position = 0
+
+    def _out(self, chunk):
+        self.position += len(chunk)
+        return chunk
+
+    def header(self):
+        return self._out(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def obj(self, number, body, stream=None):
+        self.offsets[number] = self.position
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        return self._out(chunk + b'\nendobj\n')
+
+    def trailer(self, root=1):
+        size = max(self.offsets) + 1
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        xref += [f'{self.offsets[number]:010d} 00000 n \n' for number in range(1, size)]
+        xref.append(f'trailer\n<< /Size {size} /Root {root} 0 R >>\nstartxref\n{self.position}\n%%EOF\n')
+        return self._out(''.join(xref).encode())
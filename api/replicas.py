@@ -0,0 +1,78 @@
+"""
+Read-replica routing.
+
+When a ``replica`` database is configured (``DATABASE_REPLICA_URL``), reads
+made while routing is set to the replica go there and everything else goes
+to the primary. ReplicaRoutingMiddleware turns the replica on for safe
+requests; ``use_replica()`` does the same for reports and commands.
+
+A user whose data was just written is pinned to the primary for
+REPLICA_STICKY_SECONDS (longer than the expected replication lag), so a
+student who was just awarded points reads their new balance, not the
+replica's copy from before the award.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+REPLICA_ALIAS = 'replica'
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+PIN_KEY = 'replica-pin:{}'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def _reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def use_replica():
+    """Send reads inside the block to the replica (if one is configured)."""
+    return _reading_from(REPLICA_ALIAS if replica_configured() else None)
+
+
+def use_primary():
+    """Send reads inside the block to the primary, even within a replica request."""
+    return _reading_from(None)
+
+
+def pin_to_primary(user_ids):
+    """Keep these users' reads on the primary until the replica has caught up."""
+    keys = {PIN_KEY.format(user_id): True for user_id in user_ids}
+    if not keys or not replica_configured():
+        return
+    # Pin once the write is visible, i.e. after commit
+    transaction.on_commit(lambda: cache.set_many(keys, timeout=STICKY_SECONDS))
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    """Database router for the primary/replica pair; see module docstring."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
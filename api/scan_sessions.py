@@ -0,0 +1,247 @@
+"""
+Write-behind scan sessions for attendance bursts.
+
+A teacher opens a ScanSession with a fixed point value and scans the whole
+room. A scan only resolves the QR value and appends to this process's
+in-memory buffer, deduped per session, so it is acknowledged without a
+write. The buffer is flushed to Wallet/WalletTransaction/QRScanLog in one
+transaction per session by a background thread every
+SCAN_SESSION_FLUSH_SECONDS (sooner once SCAN_SESSION_FLUSH_SIZE scans are
+waiting), and synchronously when the session is closed.
+
+Points are durable once flushed: a worker that dies loses the scans it had
+not flushed yet. When a flush fails, its scans are retried one student at
+a time, so one bad row (say, a deleted student) doesn't hold back the
+rest of the session; a scan that fails SCAN_SESSION_FLUSH_MAX_ATTEMPTS
+times is parked and logged instead of retried forever.
+
+Each worker keeps its own buffer, so ScanSessionEntry's unique
+(session, student) constraint dedupes scans that reached different
+workers. A worker re-reads a session's closed_at at most every
+SCAN_SESSION_RECHECK_SECONDS, so once another worker closes the session
+it rejects scans within that window; the few it accepted in between are
+dropped at flush, with a warning.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import notifications
+from .leaderboard import leaderboards
+from .ledger import credit_many
+from .models import DimStudent, QRScanLog, ScanSession, ScanSessionEntry
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = getattr(settings, 'SCAN_SESSION_FLUSH_SECONDS', 2)
+FLUSH_SIZE = getattr(settings, 'SCAN_SESSION_FLUSH_SIZE', 100)
+FLUSH_MAX_ATTEMPTS = getattr(settings, 'SCAN_SESSION_FLUSH_MAX_ATTEMPTS', 5)
+RECHECK_SECONDS = getattr(settings, 'SCAN_SESSION_RECHECK_SECONDS', 1)
+
+AWARD_DESCRIPTION = "Awarded by {first_name} {last_name}: {reason}"
+AWARD_MESSAGE = "You earned {points} points: {reason}"
+
+
+class SessionClosed(Exception):
+    pass
+
+
+def flush_scans(session_id, scans):
+    """
+    Write buffered scans (``{student_id: scanned_at}``) in one transaction.
+
+    Students already credited in this session, and scans made after it was
+    closed, are skipped. Returns the number of students credited.
+    """
+    with transaction.atomic():
+        session = ScanSession.objects.select_for_update().select_related('teacher').get(pk=session_id)
+        if session.closed_at is not None:
+            late = [student_id for student_id, at in scans.items() if at > session.closed_at]
+            if late:
+                logger.warning('Dropping %s scan(s) made after scan session %s closed: %s',
+                               len(late), session_id, late)
+                scans = {student_id: at for student_id, at in scans.items() if at <= session.closed_at}
+        already = set(
+            ScanSessionEntry.objects.filter(session=session, student_id__in=scans)
+            .values_list('student_id', flat=True)
+        )
+        fresh = {student_id: at for student_id, at in scans.items() if student_id not in already}
+        now = timezone.now()
+
+        if fresh:
+            teacher = session.teacher
+            description = AWARD_DESCRIPTION.format(
+                first_name=teacher.first_name, last_name=teacher.last_name, reason=session.reason
+            )
+            ScanSessionEntry.objects.bulk_create(
+                [ScanSessionEntry(session=session, student_id=student_id, scanned_at=at)
+                 for student_id, at in fresh.items()]
+            )
+            credit_many((student_id, session.points, description) for student_id in fresh)
+            QRScanLog.objects.bulk_create(
+                [QRScanLog(user_id=student_id, scanned_by_id=teacher.id, points_given=session.points, timestamp=at)
+                 for student_id, at in fresh.items()]
+            )
+            DimStudent.objects.filter(user_id__in=fresh).update(last_activity=now)
+            notifications.broadcast(list(fresh), AWARD_MESSAGE.format(points=session.points, reason=session.reason))
+            transaction.on_commit(leaderboards.invalidate)
+
+        ScanSession.objects.filter(pk=session_id).update(
+            awarded_count=F('awarded_count') + len(fresh), last_flushed_at=now
+        )
+    return len(fresh)
+
+
+class ScanBuffer:
+    """Per-process buffer of acknowledged, not yet flushed scans."""
+
+    def __init__(self, flush_seconds=FLUSH_SECONDS, flush_size=FLUSH_SIZE,
+                 max_attempts=FLUSH_MAX_ATTEMPTS, recheck_seconds=RECHECK_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self.max_attempts = max_attempts
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._sessions = {}  # session id -> (teacher id, when it was last seen open), for this process
+        self._seen = defaultdict(set)  # session id -> student ids scanned through this process
+        self._pending = defaultdict(dict)  # session id -> {student_id: scanned_at}
+        self._attempts = defaultdict(int)  # (session id, student id) -> failed flushes
+        self.parked = defaultdict(dict)  # session id -> {student_id: scanned_at} that kept failing
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _session_teacher(self, session_id):
+        with self._lock:
+            teacher_id, checked_at = self._sessions.get(session_id, (None, None))
+            if checked_at is not None and time.monotonic() - checked_at < self.recheck_seconds:
+                return teacher_id
+        session = ScanSession.objects.filter(pk=session_id).values('teacher_id', 'closed_at').first()
+        if session is None:
+            raise ScanSession.DoesNotExist
+        if session['closed_at'] is not None:
+            self.stop(session_id)  # closed by another worker; pending scans stay for flush()
+            raise SessionClosed
+        with self._lock:
+            self._sessions[session_id] = (session['teacher_id'], time.monotonic())
+        return session['teacher_id']
+
+    def add(self, session_id, teacher_id, student_id):
+        """
+        Buffer one scan. Returns False if the student was already scanned
+        in this session. Raises ScanSession.DoesNotExist for a session that
+        is missing or not the teacher's, and SessionClosed once it is closed.
+        """
+        if self._session_teacher(session_id) != teacher_id:
+            raise ScanSession.DoesNotExist
+        with self._lock:
+            if session_id not in self._sessions:
+                raise SessionClosed
+            seen = self._seen[session_id]
+            if student_id in seen:
+                return False
+            seen.add(student_id)
+            pending = self._pending[session_id]
+            pending[student_id] = timezone.now()
+            if len(pending) >= self.flush_size:
+                self._wake.set()
+            self._start()
+        return True
+
+    def pending_count(self, session_id):
+        with self._lock:
+            return len(self._pending.get(session_id, ()))
+
+    def flush(self, session_id):
+        """Write this process's pending scans for one session. Returns students credited."""
+        with self._lock:
+            scans = self._pending.pop(session_id, None)
+        if not scans:
+            return 0
+        try:
+            credited = flush_scans(session_id, scans)
+        except Exception:
+            if len(scans) == 1:
+                self._failed(session_id, scans)
+                return 0
+        else:
+            self._succeeded(session_id, scans)
+            return credited
+        # One scan may have broken the batch: retry student by student, so the rest get credited
+        credited = 0
+        for student_id, at in scans.items():
+            try:
+                credited += flush_scans(session_id, {student_id: at})
+            except Exception:
+                self._failed(session_id, {student_id: at})
+            else:
+                self._succeeded(session_id, {student_id: at})
+        return credited
+
+    def _succeeded(self, session_id, scans):
+        with self._lock:
+            for student_id in scans:
+                self._attempts.pop((session_id, student_id), None)
+
+    def _failed(self, session_id, scans):
+        """Keep failed scans for the next flush, or park them once they have used up their attempts."""
+        logger.exception('Flushing scan session %s failed for student(s) %s', session_id, list(scans))
+        with self._lock:
+            for student_id, at in scans.items():
+                key = (session_id, student_id)
+                self._attempts[key] += 1
+                if self._attempts[key] >= self.max_attempts:
+                    del self._attempts[key]
+                    self.parked[session_id][student_id] = at
+                    logger.error('Parked the scan of student %s in scan session %s after %s attempts',
+                                 student_id, session_id, self.max_attempts)
+                else:
+                    self._pending[session_id].setdefault(student_id, at)
+
+    def flush_all(self):
+        with self._lock:
+            session_ids = list(self._pending)
+        for session_id in session_ids:
+            self.flush(session_id)
+
+    def stop(self, session_id):
+        """Stop accepting scans for a session in this process; pending ones stay for flush()."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._seen.pop(session_id, None)
+
+    def _start(self):
+        # Lazily, so a preloading server forks before the thread exists
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='scan-session-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush_all()
+            connections.close_all()  # this thread's connections only
+
+
+buffer = ScanBuffer()
+atexit.register(buffer.flush_all)
+
+
+def open_session(teacher, points, reason):
+    return ScanSession.objects.create(teacher=teacher, points=points, reason=reason)
+
+
+def close_session(session):
+    """Close the session and flush this process's scans. Returns students credited by the flush."""
+    buffer.stop(session.pk)  # first, so every accepted scan predates closed_at
+    if session.closed_at is None:
+        session.closed_at = timezone.now()
+        ScanSession.objects.filter(pk=session.pk).update(closed_at=session.closed_at)
+    return buffer.flush(session.pk)
@@ -0,0 +1,124 @@
+"""
+Student search by name, username or phone number.
+
+Postgres matches with pg_trgm word similarity against a GIN trigram index
+on the combined, lower-cased fields (so typos still match) and ranks by
+similarity. SQLite uses an FTS5 table kept in step with api_user by
+triggers, matches every query word as a prefix and ranks by bm25. Other
+backends fall back to an unindexed icontains scan.
+
+Either way it is one query returning StudentViewSet.list rows.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .fast_serializers import STUDENT_VALUES
+from .models import DimStudent
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_FIELDS = ('first_name', 'last_name', 'username', 'phone_number')
+
+# Must match the expression of student_search_trgm_idx (migration 0014) exactly
+PG_SEARCH_TEXT = (
+    "lower(api_user.first_name || ' ' || api_user.last_name || ' ' || api_user.username"
+    " || ' ' || coalesce(api_user.phone_number, ''))"
+)
+
+
+class WordSimilar(Func):
+    """pg_trgm's ``query <% text``, the test student_search_trgm_idx serves."""
+    template = '%(expressions)s'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+
+class WordSimilarity(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+FTS_TABLE = 'api_student_search'
+FTS_TRIGGERS = {
+    'api_student_search_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS api_student_search_ai AFTER INSERT ON api_user BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, username, phone_number)
+            VALUES (new.id, new.first_name, new.last_name, new.username, new.phone_number);
+        END""",
+    'api_student_search_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS api_student_search_ad AFTER DELETE ON api_user BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, username, phone_number)
+            VALUES ('delete', old.id, old.first_name, old.last_name, old.username, old.phone_number);
+        END""",
+    'api_student_search_au': f"""
+        CREATE TRIGGER IF NOT EXISTS api_student_search_au
+        AFTER UPDATE OF first_name, last_name, username, phone_number ON api_user BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, username, phone_number)
+            VALUES ('delete', old.id, old.first_name, old.last_name, old.username, old.phone_number);
+            INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, username, phone_number)
+            VALUES (new.id, new.first_name, new.last_name, new.username, new.phone_number);
+        END""",
+}
+
+
+def install_sqlite_search(cursor):
+    """
+    Create the FTS5 index and its triggers if they are missing, rebuilding
+    the index when they were. SQLite migrations that rebuild api_user drop
+    its triggers, so this also runs after every migrate.
+    """
+    cursor.execute(
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            first_name, last_name, username, phone_number,
+            content='api_user', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )"""
+    )
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_user'")
+    present = {row[0] for row in cursor.fetchall()}
+    if set(FTS_TRIGGERS) <= present:
+        return
+    for sql in FTS_TRIGGERS.values():
+        cursor.execute(sql)
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_students(query, limit=SEARCH_DEFAULT_LIMIT):
+    """Best matches first, as rows of STUDENT_VALUES."""
+    terms = search_terms(query)
+    if not terms or len(''.join(terms)) < SEARCH_MIN_LENGTH:
+        return []
+    students = DimStudent.objects.filter(user__user_type=2)
+
+    if connection.vendor == 'postgresql':
+        text = Value(' '.join(terms))
+        search_text = RawSQL(PG_SEARCH_TEXT, ())  # api_user is joined by the user_type filter
+        students = (
+            students.filter(WordSimilar(text, search_text))
+            .annotate(rank=WordSimilarity(text, search_text))
+            .order_by('-rank', 'id')
+        )
+    elif connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        students = students.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = api_dimstudent.user_id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'rank': f'bm25({FTS_TABLE})'},
+            order_by=['rank', 'id'],
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(*[Q(**{f'user__{field}__icontains': term}) for field in SEARCH_FIELDS], _connector=Q.OR)
+        students = students.filter(condition).order_by('user__last_name', 'user__first_name', 'id')
+
+    return list(students.values(*STUDENT_VALUES)[:limit])
@@ -1,33 +1,34 @@
-from rest_framework import serializers
-from .models import *
-from rest_framework import serializers
-from .models import DimStudent
-
-from rest_framework import serializers
-from .models import User  # your custom User model
-from django.contrib.auth.hashers import make_password
-from .models import DimStudent, Wallet
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import serializers
-from .models import DimStudent, Wallet
 
-import qrcode
-from qrcode.constants import ERROR_CORRECT_H
-from io import BytesIO
-from django.core.files import File
-import random
-import string
+from .models import DimStudent, Notification, Product, ScanSession, User, Wallet, WalletTransaction
+
+# qrcode (and the PIL it pulls in), io and random are imported inside the
+# helpers that need them: they are only used when a student registers, and
+# loading them at import time slowed every worker boot and manage.py command.
+
 
+class SparseFieldsetMixin:
+    """Renders only the fields named in the ``fields`` argument (a ?fields= sparse fieldset)."""
 
-class UserSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'user_type', 'profile_pic']
+        read_only_fields = ['user_type']
 
-class WalletSerializer(serializers.ModelSerializer):
+class WalletSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = ['id', 'balance', 'last_updated']
+        read_only_fields = ['balance', 'last_updated']  # balances only move through api/ledger.py
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -101,6 +102,12 @@ class StudentSerializer(serializers.ModelSerializer):
         salvation_date = validated_data.pop("salvationDate", None)
         gender = validated_data.pop("gender", None)
 
+        import random
+        import string
+        from io import BytesIO
+
+        from django.core.files import File
+
         # 1️⃣ Generate random QR value
         qr_value = ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
 
@@ -215,20 +222,7 @@ class AwardPointsSerializer(serializers.Serializer):
     points = serializers.IntegerField(min_value=1)
     reason = serializers.CharField(max_length=500)
     is_deduction = serializers.BooleanField(default=False)  # NEW FIELD
-    
-    def validate(self, data):
-        if data.get('is_deduction', False):
-            # Validate student has enough balance
-            try:
-                student = User.objects.get(id=data['student_id'], user_type=2)
-                wallet = Wallet.objects.get(user=student)
-                if wallet.balance < data['points']:
-                    raise serializers.ValidationError(
-                        f"Insufficient balance. Student only has {wallet.balance} points"
-                    )
-            except (User.DoesNotExist, Wallet.DoesNotExist):
-                raise serializers.ValidationError("Student or wallet not found")
-        return data
+    # The balance is checked by the view's conditional UPDATE, which concurrent deductions can't race
 
     def validate_student_id(self, value):
         try:
@@ -259,9 +253,50 @@ class RecentTransactionSerializer(serializers.Serializer):
     timestamp = serializers.CharField()
     teacherAction = serializers.BooleanField()
 
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'message', 'is_read', 'created_at']
+        read_only_fields = fields
+
+
+class BroadcastSerializer(serializers.Serializer):
+    message = serializers.CharField(max_length=1000)
+    student_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )  # Optional, defaults to every active student
+
+class BonusRunSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)  # Optional, defaults to today
+
+    def validate_date(self, value):
+        # Bonuses are deduped per year: another year's date would pay them again.
+        # Other dates are left to `manage.py award_anniversary_bonuses --date`.
+        today = timezone.localdate()
+        if value.year != today.year or value > today:
+            raise serializers.ValidationError("Only dates earlier this year or today can be run")
+        return value
+
+class TransferSerializer(serializers.Serializer):
+    recipient_id = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1)
+    note = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    sender_id = serializers.IntegerField(required=False)  # Teachers only, defaults to the requester
+
+class ScanSessionSerializer(serializers.ModelSerializer):
+    points = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = ScanSession
+        fields = ['id', 'points', 'reason', 'opened_at', 'closed_at', 'awarded_count', 'last_flushed_at']
+        read_only_fields = ['opened_at', 'closed_at', 'awarded_count', 'last_flushed_at']
+
 #HELPERS
 def generate_qr_image(qr_value: str):
         """Generate a QR code image with custom colors and zero margins."""
+        import qrcode
+        from qrcode.constants import ERROR_CORRECT_H
+
         qr = qrcode.QRCode(
             version=1,  # QR complexity (1 is smallest)
             error_correction=ERROR_CORRECT_H,  # High error correction
@@ -0,0 +1,52 @@
+from django.db import connections
+from django.db.models.signals import post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from . import home
+from .models import Order, User, Wallet
+from .notifications import notify
+from .search import install_sqlite_search
+
+
+@receiver(pre_save, sender=User)
+def sync_user_anniversary_keys(sender, instance, **kwargs):
+    # Also runs for raw fixture saves, which bypass User.save()
+    instance.sync_anniversary_keys()
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    """Stash the stored status so post_save can tell whether it changed."""
+    if instance.pk:
+        instance._previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def notify_order_status_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if created or previous is None or previous == instance.status:
+        return
+    notify(
+        instance.user_id,
+        f"Your order #{instance.pk} is now {instance.get_status_display().lower()}.",
+    )
+
+
+@receiver(post_save, sender=Wallet)
+def invalidate_home_on_wallet_save(sender, instance, **kwargs):
+    # Bulk ledger writes bypass save() and invalidate in api.ledger instead
+    home.invalidate([instance.user_id])
+
+
+@receiver(post_migrate)
+def restore_student_search_triggers(sender, using, **kwargs):
+    """SQLite migrations that rebuild api_user drop its search triggers; put them back."""
+    connection = connections[using]
+    if sender.label != 'api' or connection.vendor != 'sqlite':
+        return
+    if User._meta.db_table not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        install_sqlite_search(cursor)
@@ -0,0 +1,274 @@
+"""
+Monthly wallet statements for parents.
+
+A statement covers one student's wallet for a calendar month: the opening
+balance, every ledger row with its running balance, totals per transaction
+type and the closing balance. All of a month's statements come from one
+pass over its ledger, read as a single streaming query ordered by wallet
+(live and archived rows together when the month reaches into the archive)
+and merge-joined with the student wallets, so memory holds one student's
+month at a time.
+
+Balances are anchored on Wallet.balance, the figure the app shows: the
+closing balance is today's balance less everything booked since the month
+ended, and the opening balance is the closing balance less the month's
+rows. The later rows are summed by subqueries of the wallet query itself,
+so a balance and the rows it is corrected by come from one snapshot. On
+Postgres and MySQL the whole pass also runs in one read-only REPEATABLE
+READ transaction, so the month's rows come from that snapshot too. SQLite
+offers no such transaction without taking the write lock, so a statement
+for the month in progress may miss or double a write that races the pass;
+closed months are exact everywhere.
+
+Statements are rendered to CSV and/or PDF, a file per student under
+<output>/<YYYY-MM>/, in the process pool from api/rendering.py. Reads go
+to the replica when one is configured.
+"""
+import csv
+import io
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .ledger import DEBIT_TYPES, signed_amount
+from .models import ArchivedWalletTransaction, Wallet, WalletTransaction
+from .rendering import RENDER_WORKERS, PdfWriter, render_ordered
+from .replicas import use_replica
+
+CHUNK_SIZE = 2000  # rows fetched per round trip by the streaming queries
+LEDGER_FIELDS = ('wallet_id', 'timestamp', 'id', 'transaction_type', 'amount', 'description')
+FORMATS = ('csv', 'pdf')
+
+
+@dataclass
+class Statement:
+    user_id: int
+    username: str
+    name: str
+    month: date
+    opening: int
+    closing: int
+    totals: dict  # transaction type -> signed total
+    rows: list  # (timestamp, transaction type, description, signed amount, balance after)
+
+    @property
+    def filename(self):
+        return f'{self.user_id}-{self.username}'
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime(month.year, month.month, 1))
+    following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return start, timezone.make_aware(datetime(following.year, following.month, 1))
+
+
+def signed_total():
+    return Sum(Case(When(transaction_type__in=DEBIT_TYPES, then=-F('amount')), default=F('amount')))
+
+
+def _archive_reaches(start):
+    """Whether archived rows can be dated on or after ``start``."""
+    horizon = Wallet.objects.aggregate(horizon=Max('opening_balance_at'))['horizon']
+    return horizon is not None and horizon > start
+
+
+def _booked_since(model, end):
+    """Signed total of a wallet's ``model`` rows dated on or after ``end``, as a subquery."""
+    total = (
+        model.objects.filter(wallet_id=OuterRef('id'), timestamp__gte=end)
+        .values('wallet_id').annotate(total=signed_total()).values('total')
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+@contextmanager
+def _snapshot():
+    """One read-only REPEATABLE READ transaction for the pass, on the backends that offer it."""
+    alias = router.db_for_read(Wallet) or 'default'
+    vendor = connections[alias].vendor
+    if vendor not in ('postgresql', 'mysql'):
+        yield
+        return
+    with transaction.atomic(using=alias):
+        if vendor == 'postgresql':
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        # MySQL's InnoDB reads at REPEATABLE READ already, from the first read on
+        yield
+
+
+def _ledger(start, end, with_archive):
+    rows = WalletTransaction.objects.filter(timestamp__gte=start, timestamp__lt=end).values_list(*LEDGER_FIELDS)
+    if with_archive:
+        rows = rows.union(
+            ArchivedWalletTransaction.objects.filter(timestamp__gte=start, timestamp__lt=end)
+            .values_list(*LEDGER_FIELDS),
+            all=True,
+        )
+    return rows.order_by('wallet_id', 'timestamp', 'id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def statements(month):
+    """Yield the Statement of every student wallet for ``month``, in wallet id order."""
+    start, end = month_bounds(month)
+    with_archive = _archive_reaches(start)
+    closing = F('balance') - _booked_since(WalletTransaction, end)
+    if with_archive:
+        closing -= _booked_since(ArchivedWalletTransaction, end)
+    wallets = (
+        Wallet.objects.filter(user__user_type=2).order_by('id')
+        .annotate(closing=closing)
+        .values_list('id', 'closing', 'user_id', 'user__username', 'user__first_name', 'user__last_name')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    ledger = groupby(_ledger(start, end, with_archive), key=itemgetter(0))
+    pending = next(ledger, None)
+
+    for wallet_id, closing, user_id, username, first_name, last_name in wallets:
+        while pending is not None and pending[0] < wallet_id:
+            pending = next(ledger, None)  # rows of a wallet that isn't a student's
+        rows = []
+        if pending is not None and pending[0] == wallet_id:
+            rows = [
+                (timestamp, kind, description, signed_amount(kind, amount))
+                for _, timestamp, _, kind, amount, description in pending[1]
+            ]
+            pending = next(ledger, None)
+
+        opening = running = closing - sum(row[3] for row in rows)
+        totals = defaultdict(int)
+        lines = []
+        for timestamp, kind, description, amount in rows:
+            running += amount
+            totals[kind] += amount
+            lines.append((timestamp, kind, description, amount, running))
+        yield Statement(
+            user_id=user_id,
+            username=username,
+            name=f'{first_name} {last_name}'.strip() or username,
+            month=month,
+            opening=opening,
+            closing=closing,
+            totals=dict(totals),
+            rows=lines,
+        )
+
+
+# ===== RENDERING (runs in the pool) =====
+def render_csv(statement):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerows([
+        ['Student', statement.name],
+        ['Username', statement.username],
+        ['Month', f'{statement.month:%Y-%m}'],
+        ['Opening balance', statement.opening],
+        [],
+        ['Date', 'Type', 'Description', 'Amount', 'Balance'],
+    ])
+    for timestamp, kind, description, amount, balance in statement.rows:
+        writer.writerow([f'{timezone.localtime(timestamp):%Y-%m-%d %H:%M}', kind, description, amount, balance])
+    writer.writerow([])
+    for kind, total in sorted(statement.totals.items()):
+        writer.writerow([f'Total {kind}', total])
+    writer.writerow(['Closing balance', statement.closing])
+    return out.getvalue().encode('utf-8-sig')  # the BOM makes Excel read it as UTF-8
+
+
+PDF_PAGE = (595.28, 841.89)  # A4, in points
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 9
+PDF_LEADING = 13
+PDF_COLUMNS = 90  # Courier 9pt characters across the text width
+PDF_LINES_PER_PAGE = int((PDF_PAGE[1] - 2 * PDF_MARGIN) // PDF_LEADING)
+
+
+def statement_lines(statement):
+    lines = [
+        f'Points statement - {statement.month:%B %Y}',
+        f'{statement.name} ({statement.username})',
+        '',
+        f'Opening balance: {statement.opening}',
+        '',
+        f'{"Date":16}  {"Type":10}  {"Amount":>7}  {"Balance":>8}  Description',
+    ]
+    for timestamp, kind, description, amount, balance in statement.rows:
+        lines.append(
+            f'{timezone.localtime(timestamp):%Y-%m-%d %H:%M}  {kind:10}  {amount:>+7}  {balance:>8}  {description}'
+        )
+    if not statement.rows:
+        lines.append('No points activity this month.')
+    lines.append('')
+    lines += [f'Total {kind}: {total:+}' for kind, total in sorted(statement.totals.items())]
+    lines.append(f'Closing balance: {statement.closing}')
+    return [line[:PDF_COLUMNS] for line in lines]
+
+
+def _pdf_string(line):
+    escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b'(' + escaped.encode('cp1252', errors='replace') + b')'
+
+
+def render_pdf(statement):
+    lines = statement_lines(statement)
+    pages = [lines[start:start + PDF_LINES_PER_PAGE] for start in range(0, len(lines), PDF_LINES_PER_PAGE)]
+
+    pdf = PdfWriter()
+    chunks = [
+        pdf.header(),
+        pdf.obj(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+        pdf.obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>'),
+    ]
+    kids = []
+    for index, page_lines in enumerate(pages):
+        page, content = 4 + 2 * index, 5 + 2 * index
+        kids.append(f'{page} 0 R')
+        text = (
+            f'BT /F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL {PDF_MARGIN} {PDF_PAGE[1] - PDF_MARGIN} Td\n'.encode()
+            + b''.join(_pdf_string(line) + b' Tj T*\n' for line in page_lines)
+            + b'ET'
+        )
+        stream = zlib.compress(text)
+        chunks.append(pdf.obj(page, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE[0]} {PDF_PAGE[1]}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content} 0 R >>'
+        ).encode()))
+        chunks.append(pdf.obj(content, f'<< /Length {len(stream)} /Filter /FlateDecode >>'.encode(), stream))
+    chunks.append(pdf.obj(2, f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()))
+    chunks.append(pdf.trailer())
+    return b''.join(chunks)
+
+
+RENDERERS = {'csv': render_csv, 'pdf': render_pdf}
+
+
+def write_statement(directory, formats, statement):
+    """Write one statement in each format. Returns how many files were written."""
+    for extension in formats:
+        (Path(directory) / f'{statement.filename}.{extension}').write_bytes(RENDERERS[extension](statement))
+    return len(formats)
+
+
+# ===== ENTRY POINT =====
+def generate(month, output, formats=FORMATS, workers=RENDER_WORKERS):
+    """Write every student's statement for ``month`` under <output>/<YYYY-MM>/. Returns (statements, files)."""
+    directory = Path(output) / f'{month:%Y-%m}'
+    directory.mkdir(parents=True, exist_ok=True)
+    count = files = 0
+    with use_replica(), _snapshot():  # a closed month tolerates replication lag
+        write = partial(write_statement, str(directory), tuple(formats))
+        for written in render_ordered(write, statements(month), workers):
+            count += 1
+            files += written
+    return count, files
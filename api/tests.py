@@ -1,3 +1,1116 @@
-from django.test import TestCase
+import csv
+import json
+import logging
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from gunicorn.config import Config
+from gunicorn.glogging import Logger
+from gunicorn.workers.base import Worker
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.gunicorn_workers import DrainingThreadWorker
+
+from . import bonuses, home, notifications, outbox, replicas, scan_sessions, warmup
+from .benchmarks.seed import BENCH_PASSWORD, seed
+from .benchmarks.startup import probe
+from .bootstrap import bootstrap_fixture
+from .fast_serializers import STUDENT_VALUES, TRANSACTION_VALUES, student_rows, transaction_rows
+from .leaderboard import RankBoard, leaderboards
+from .ledger import InsufficientBalance, InsufficientBalances, adjust_balances, refund_spends, transfer
+from .serializers import StudentSerializer, WalletTransactionSerializer
+from .statements import render_csv, statements
+from .models import (
+    ArchivedWalletTransaction, DimStudent, Notification, OutboxEvent, Product, QRScanLog, ScanSession,
+    ScanSessionEntry, User, Wallet, WalletTransaction,
+)
+
+
+# ===== QUERY BUDGETS =====
+# Maximum queries per URL name, measured under TestCase (so savepoints count).
+# Every API route must be listed here, and its count must not grow with the
+# number of rows (see QueryBudgetTests).
+QUERY_BUDGETS = {
+    'token_obtain_pair': 1,
+    'token_refresh': 1,
+    'token_verify': 0,
+    'teacher_stats': 10,
+    'recent_transactions': 1,
+    'transaction_history': 1,
+    'run_anniversary_bonuses': 4,
+    'leaderboard': 3,
+    'leaderboard_weekly': 3,
+    'leaderboard_gender': 3,
+    'leaderboard_me': 2,
+    'metrics': 0,
+    'user-list': 1,
+    'user-detail': 1,
+    'wallet-list': 1,
+    'wallet-detail': 1,
+    'product-list': 1,
+    'product-detail': 1,
+    'recent-activity-list': 1,
+    'recent-activity-detail': 1,
+    'student-list': 1,
+    'student-detail': 1,
+    'student-scan-qr': 1,
+    'student-search': 1,
+    'student-award-points': 9,
+    'notification-list': 1,
+    'notification-detail': 1,
+    'notification-read': 5,
+    'notification-unread-count': 1,
+    'notification-mark-all-read': 4,
+    'notification-broadcast': 5,
+    'transfer_points': 12,
+    'my_home': 2,
+    'scan-session-list': 1,
+    'scan-session-detail': 1,
+    'scan-session-scan': 2,
+    'scan-session-close': 20,
+    'badge_sheet': 1,
+    'health_live': 0,
+    'health_ready': 1,
+}
+
+# Routes generated by the router that the frontend never calls
+UNBUDGETED = {'api-root'}
+
+DATASET_SIZES = (
+    {'teachers': 2, 'students': 8, 'transactions': 60},
+    {'teachers': 4, 'students': 40, 'transactions': 400},
+)
+
+
+def fingerprint(sql):
+    """Collapse literals so the same statement with different values groups together."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def api_route_names():
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        if not str(pattern.pattern).startswith('api/'):
+            continue
+        if isinstance(pattern, URLResolver):
+            names.update(child.name for child in pattern.url_patterns if child.name)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def endpoint_requests(teacher, student):
+    """url name -> (user, method, path, body) exercising that route."""
+    wallet = Wallet.objects.get(user=student)
+    transaction = wallet.transactions.order_by('-timestamp').first()
+    notification = Notification.objects.filter(user=student).first()
+    product = Product.objects.first()
+    profile = student.student_profile
+    classmate = User.objects.filter(user_type=2).exclude(pk=student.pk).order_by('id').first()
+    session = ScanSession.objects.create(teacher=teacher, points=5, reason='Budget check')
+    refresh = RefreshToken.for_user(student)
+    return {
+        'token_refresh': (None, 'post', reverse('token_refresh'), {'refresh': str(refresh)}),
+        'token_verify': (None, 'post', reverse('token_verify'), {'token': str(refresh.access_token)}),
+        'token_obtain_pair': (None, 'post', reverse('token_obtain_pair'),
+                              {'username': student.username, 'password': BENCH_PASSWORD}),
+        'teacher_stats': (teacher, 'get', reverse('teacher_stats'), None),
+        'recent_transactions': (teacher, 'get', reverse('recent_transactions') + '?limit=20', None),
+        'transaction_history': (student, 'get', reverse('transaction_history') + '?limit=20', None),
+        'my_home': (student, 'get', reverse('my_home'), None),
+        'run_anniversary_bonuses': (teacher, 'post', reverse('run_anniversary_bonuses'),
+                                    {'date': f'{timezone.localdate():%Y}-01-01'}),
+        'leaderboard': (student, 'get', reverse('leaderboard') + '?limit=20', None),
+        'leaderboard_weekly': (student, 'get', reverse('leaderboard_weekly') + '?limit=20', None),
+        'leaderboard_gender': (student, 'get', reverse('leaderboard_gender', args=['female']) + '?limit=20', None),
+        'leaderboard_me': (student, 'get', reverse('leaderboard_me'), None),
+        'metrics': (teacher, 'get', reverse('metrics'), None),
+        'user-list': (teacher, 'get', reverse('user-list'), None),
+        'user-detail': (teacher, 'get', reverse('user-detail', args=[student.pk]), None),
+        'wallet-list': (teacher, 'get', reverse('wallet-list') + '?fields=id,balance', None),
+        'wallet-detail': (teacher, 'get', reverse('wallet-detail', args=[wallet.pk]), None),
+        'product-list': (student, 'get', reverse('product-list'), None),
+        'product-detail': (student, 'get', reverse('product-detail', args=[product.pk]), None),
+        'recent-activity-list': (student, 'get', reverse('recent-activity-list'), None),
+        'recent-activity-detail': (student, 'get', reverse('recent-activity-detail', args=[transaction.pk]), None),
+        'student-list': (teacher, 'get', reverse('student-list'), None),
+        'student-detail': (teacher, 'get', reverse('student-detail', args=[profile.pk]), None),
+        'student-scan-qr': (teacher, 'post', reverse('student-scan-qr'), {'qr_value': student.qr_value}),
+        'student-search': (teacher, 'get', reverse('student-search') + f'?q={student.first_name[:3]}', None),
+        'student-award-points': (teacher, 'post', reverse('student-award-points'),
+                                 {'student_id': student.pk, 'points': 5, 'reason': 'Budget check'}),
+        # after award-points, so the student can cover it
+        'transfer_points': (student, 'post', reverse('transfer_points'), {'recipient_id': classmate.pk, 'amount': 1}),
+        'notification-list': (student, 'get', reverse('notification-list'), None),
+        'notification-detail': (student, 'get', reverse('notification-detail', args=[notification.pk]), None),
+        'notification-read': (student, 'post', reverse('notification-read', args=[notification.pk]), None),
+        'notification-unread-count': (student, 'get', reverse('notification-unread-count'), None),
+        'notification-mark-all-read': (student, 'post', reverse('notification-mark-all-read'), None),
+        'notification-broadcast': (teacher, 'post', reverse('notification-broadcast'),
+                                   {'message': 'Budget check', 'student_ids': [student.pk]}),
+        'scan-session-list': (teacher, 'post', reverse('scan-session-list'), {'points': 5, 'reason': 'Budget check'}),
+        'scan-session-detail': (teacher, 'get', reverse('scan-session-detail', args=[session.pk]), None),
+        # scan before close, so close flushes a buffered scan
+        'scan-session-scan': (teacher, 'post', reverse('scan-session-scan', args=[session.pk]),
+                              {'qr_value': student.qr_value}),
+        'scan-session-close': (teacher, 'post', reverse('scan-session-close', args=[session.pk]), None),
+        'badge_sheet': (teacher, 'get', reverse('badge_sheet') + f'?student_ids={student.pk}', None),
+        'health_live': (None, 'get', reverse('health_live'), None),
+        'health_ready': (None, 'get', reverse('health_ready'), None),
+    }
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    """
+    Runs every API route against two dataset sizes. A route fails if it
+    exceeds its budget, or if its query count differs between the sizes
+    (an N+1), with the offending SQL fingerprints in the failure message.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.request_logger = logging.getLogger('api.requests')
+        cls.previous_level = cls.request_logger.level
+        cls.request_logger.setLevel(logging.WARNING)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.request_logger.setLevel(cls.previous_level)
+        super().tearDownClass()
+
+    def measure(self, size):
+        User.objects.filter(username__startswith='bench_').delete()
+        Product.objects.all().delete()
+        seed(**size)
+        teacher = User.objects.filter(user_type=1).order_by('id').first()
+        student = User.objects.filter(user_type=2).order_by('id').first()
+        student.gender = 'female'
+        student.save(update_fields=['gender'])
+        Notification.objects.create(user=student, message='Budget check')
+        WalletTransaction.objects.create(
+            wallet=student.wallet, amount=5, transaction_type='earn', description='Budget check'
+        )
+
+        warmup.warm_up()  # as the server does before traffic; health_ready then only checks the database
+        captured = {}
+        for name, (user, method, path, body) in endpoint_requests(teacher, student).items():
+            client = APIClient()
+            if user is not None:
+                client.force_authenticate(user)
+            leaderboards.invalidate()
+            cache.clear()  # measure cold, e.g. /api/me/home/ before its summary is cached
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(client, method)(path, body, format='json')
+            body = b'' if response.streaming else response.content[:200]
+            self.assertLess(response.status_code, 400, f'{name}: {response.status_code} {body}')
+            captured[name] = [query['sql'] for query in context.captured_queries]
+        return captured
+
+    def test_every_route_has_a_budget(self):
+        missing = api_route_names() - set(QUERY_BUDGETS) - UNBUDGETED
+        self.assertFalse(missing, f'Add query budgets for: {sorted(missing)}')
+
+    def test_query_budgets(self):
+        small, large = (self.measure(size) for size in DATASET_SIZES)
+        failures = []
+        for name, budget in QUERY_BUDGETS.items():
+            counts = (len(small[name]), len(large[name]))
+            if max(counts) <= budget and counts[0] == counts[1]:
+                continue
+            grown = Counter(map(fingerprint, large[name])) - Counter(map(fingerprint, small[name]))
+            report = '\n      '.join(
+                f'+{extra} x {sql}' for sql, extra in grown.most_common()
+            ) or '\n      '.join(sorted(set(map(fingerprint, large[name]))))
+            failures.append(f'{name}: budget {budget}, got {counts[0]} (small) / {counts[1]} (large)\n      {report}')
+        self.assertFalse(failures, 'Query budget exceeded:\n  ' + '\n  '.join(failures))
+
+
+# ===== ACCESS =====
+class AccountWriteTests(TestCase):
+    """Users and wallets can't be edited into privileges or points through the API."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        self.student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        self.wallet = Wallet.objects.create(user=self.student, balance=10)
+        self.client = APIClient()
+
+    def test_student_cannot_promote_themselves(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.patch(reverse('user-detail', args=[self.student.pk]), {'user_type': 1}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.user_type, 2)
+
+    def test_student_cannot_set_their_balance(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.patch(reverse('wallet-detail', args=[self.wallet.pk]), {'balance': 99999}, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, 10)
+
+    def test_teacher_edits_ignore_user_type(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.patch(
+            reverse('user-detail', args=[self.student.pk]), {'user_type': 1, 'email': 'new@example.com'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.user_type, self.student.email), (2, 'new@example.com'))
+
+
+class BadgeAccessTests(TestCase):
+    def test_teachers_print_badges(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        client = APIClient()
+        path = reverse('badge_sheet') + f'?student_ids={student.pk}'
+        client.force_authenticate(student)
+        self.assertEqual(client.get(path).status_code, 403)
+        client.force_authenticate(teacher)  # a teacher, not staff
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class BonusRunDateTests(TestCase):
+    def test_other_years_are_rejected(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        client = APIClient()
+        client.force_authenticate(teacher)
+        today = timezone.localdate()
+        for day in (today - timedelta(days=366), today + timedelta(days=1)):
+            response = client.post(reverse('run_anniversary_bonuses'), {'date': day.isoformat()}, format='json')
+            self.assertEqual(response.status_code, 400, day)
+        response = client.post(reverse('run_anniversary_bonuses'), {'date': today.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class AnniversaryBonusTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.student = User.objects.create_user(
+            username='s', password='x', email='s@example.com', user_type=2,
+            birthday=self.today.replace(year=self.today.year - 12),
+        )
+        Wallet.objects.create(user=self.student)
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        self.client = APIClient()
+        self.client.force_authenticate(teacher)
+
+    def run_bonuses(self):
+        response = self.client.post(reverse('run_anniversary_bonuses'), {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['awarded']
+
+    def test_a_rerun_awards_nothing(self):
+        self.assertEqual(self.run_bonuses(), {'birthday': 1, 'salvation': 0})
+        self.assertEqual(self.run_bonuses(), {'birthday': 0, 'salvation': 0})
+        self.assertEqual(Wallet.objects.get(user=self.student).balance, 50)
+
+    def test_losing_a_race_is_not_an_error(self):
+        credit_many = bonuses.credit_many
+        attempts = []
+
+        def lose_first_race(entries):
+            attempts.append(entries)
+            if len(attempts) == 1:
+                raise IntegrityError  # as if a concurrent run had inserted the same awards first
+            return credit_many(entries)
+
+        with mock.patch.object(bonuses, 'credit_many', lose_first_race):
+            self.assertEqual(self.run_bonuses(), {'birthday': 1, 'salvation': 0})
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(Wallet.objects.get(user=self.student).balance, 50)
+        self.assertEqual(self.student.bonus_awards.count(), 1)
+
+
+# ===== NOTIFICATIONS =====
+class UnreadCounterTests(TestCase):
+    """User.unread_notifications must track the unread rows through every write path."""
+
+    def setUp(self):
+        self.student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def unread(self, user=None):
+        user = user or self.student
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.data['unread'], Notification.objects.filter(user=user, is_read=False).count())
+        return response.data['unread']
+
+    def test_notify_and_read(self):
+        first, second = (notifications.notify(self.student.pk, f'Message {n}') for n in (1, 2))
+        self.assertEqual(self.unread(), 2)
+
+        response = self.client.post(reverse('notification-read', args=[first.pk]))
+        self.assertEqual(response.data['unread'], 1)
+        self.client.post(reverse('notification-read', args=[first.pk]))  # already read
+        self.assertEqual(self.unread(), 1)
+
+        response = self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(response.data, {'updated': 1, 'unread': 0})
+        self.assertEqual(self.unread(), 0)
+
+    def test_reading_never_takes_the_counter_below_zero(self):
+        notification = notifications.notify(self.student.pk, 'Hello')
+        User.objects.filter(pk=self.student.pk).update(unread_notifications=0)  # drifted
+        response = self.client.post(reverse('notification-read', args=[notification.pk]))
+        self.assertEqual(response.data['unread'], 0)
+
+    def test_broadcast(self):
+        classmate = User.objects.create_user(username='c', password='x', email='c@example.com', user_type=2)
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        notifications.notify(self.student.pk, 'Earlier')
+        self.client.force_authenticate(teacher)
+        response = self.client.post(
+            reverse('notification-broadcast'), {'message': 'See you Sunday!', 'student_ids': [self.student.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.unread(classmate), 0)
+
+    def test_a_non_numeric_id_is_not_found(self):
+        path = reverse('notification-list') + 'abc/read/'
+        self.assertEqual(self.client.post(path).status_code, 404)
+
+
+# ===== LEDGER =====
+class StaffCorrectionTests(TestCase):
+    def setUp(self):
+        self.rich, self.poor = (
+            User.objects.create_user(username=name, password='x', email=f'{name}@example.com', user_type=2)
+            for name in ('rich', 'poor')
+        )
+        Wallet.objects.bulk_create([Wallet(user=self.rich, balance=100), Wallet(user=self.poor, balance=10)])
+
+    def test_deduction_beyond_a_balance_changes_nothing(self):
+        with self.assertRaises(InsufficientBalances) as raised:
+            adjust_balances([self.rich.pk, self.poor.pk], -50, 'Lost badge')
+        self.assertEqual(raised.exception.user_ids, [self.poor.pk])
+        self.assertEqual(
+            dict(Wallet.objects.values_list('user_id', 'balance')), {self.rich.pk: 100, self.poor.pk: 10}
+        )
+        self.assertFalse(WalletTransaction.objects.exists())
+
+    def test_spend_is_refunded_once(self):
+        spend = WalletTransaction.objects.create(wallet=self.rich.wallet, amount=30, transaction_type='spend')
+        # Text alone doesn't mark a spend as refunded
+        WalletTransaction.objects.create(
+            wallet=self.rich.wallet, amount=0, transaction_type='refund',
+            description=f'Refund of transaction #{spend.pk}',
+        )
+        self.assertEqual(refund_spends([spend.pk]), 1)
+        self.assertEqual(refund_spends([spend.pk]), 0)
+        self.assertEqual(spend.refund.amount, 30)
+        self.assertEqual(Wallet.objects.get(user=self.rich).balance, 130)
+
+
+class DeductionTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        self.student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        self.wallet = Wallet.objects.create(user=self.student, balance=30)
+        self.client = APIClient()
+        self.client.force_authenticate(teacher)
+
+    def deduct(self, points):
+        return self.client.post(
+            reverse('student-award-points'),
+            {'student_id': self.student.pk, 'points': points, 'reason': 'Snacks', 'is_deduction': True},
+            format='json',
+        )
+
+    def test_a_refusal_reports_the_balance_it_was_refused_against(self):
+        # The view read the wallet before a concurrent deduction took it to 10
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=10)
+        with mock.patch.object(Wallet.objects, 'get_or_create', return_value=(self.wallet, False)):
+            response = self.deduct(20)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['current_balance'], 10)
+        self.assertIn('only has 10 points', response.data['error'])
+        self.assertFalse(WalletTransaction.objects.exists())
+
+    def test_deducting_the_whole_balance(self):
+        response = self.deduct(30)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['new_balance'], 0)
+
+
+# ===== HOME =====
+@override_settings(SHARED_CACHE=True)
+@mock.patch.object(home, 'CACHED', True)  # read from settings at import
+class HomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student, self.classmate = (
+            User.objects.create_user(username=name, password='x', email=f'{name}@example.com', user_type=2)
+            for name in ('s', 'c')
+        )
+        Wallet.objects.bulk_create([Wallet(user=self.student, balance=10), Wallet(user=self.classmate, balance=10)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def assertHomeMatchesWallet(self):
+        response = self.client.get(reverse('my_home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], Wallet.objects.get(user=self.student).balance)
+        latest = WalletTransaction.objects.filter(wallet__user=self.student).order_by('-timestamp', '-id').first()
+        self.assertEqual(
+            [row['id'] for row in response.data['recent_transactions'][:1]], [latest.pk] if latest else []
+        )
+
+    def test_the_summary_is_cached(self):
+        self.assertHomeMatchesWallet()
+        self.assertIsNotNone(cache.get(home.cache_key(self.student.pk)))
+        with self.assertNumQueries(0):
+            home.wallet_summary(self.student.pk)
+
+    def save_wallet(self):
+        wallet = Wallet.objects.get(user=self.student)
+        wallet.balance += 1
+        wallet.save()
+
+    @mock.patch.object(outbox, 'DISPATCH_IN_PROCESS', False)
+    def test_wallet_writes_drop_the_cached_summary(self):
+        teacher = APIClient()
+        teacher.force_authenticate(
+            User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        )
+        writes = {
+            'award': lambda: teacher.post(
+                reverse('student-award-points'), {'student_id': self.student.pk, 'points': 5, 'reason': 'Choir'},
+                format='json',
+            ),
+            'ledger': lambda: adjust_balances([self.student.pk], 5, 'Choir'),
+            'transfer out': lambda: transfer(self.student, self.classmate, 3),
+            'transfer in': lambda: transfer(self.classmate, self.student, 4),
+            'save': self.save_wallet,
+        }
+        self.assertHomeMatchesWallet()
+        for name, write in writes.items():
+            with self.subTest(name):
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                self.assertHomeMatchesWallet()
+
+# ===== LEADERBOARD =====
+class RankBoardTests(SimpleTestCase):
+    def assertMatchesNaiveSort(self, board, scores):
+        ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        naive = [
+            (1 + sum(other > score for other in scores.values()), user_id, score) for user_id, score in ordered
+        ]
+        self.assertEqual(board.top(len(scores) + 1), naive)
+        self.assertEqual(board.top(3, offset=2), naive[2:5])
+        for rank, user_id, score in naive:
+            self.assertEqual((board.rank(user_id), board.score(user_id)), (rank, score))
+        self.assertEqual(len(board), len(scores))
+
+    def test_ranks_and_ties_after_updates(self):
+        rng = random.Random(7)
+        scores = {user_id: rng.randint(0, 20) for user_id in range(1, 41)}  # small range, so many ties
+        board = RankBoard(scores)
+        self.assertMatchesNaiveSort(board, scores)
+        for _ in range(500):
+            user_id = rng.randint(1, 60)
+            operation = rng.choice(('set', 'add', 'remove'))
+            if operation == 'set':
+                scores[user_id] = rng.randint(0, 20)
+                board.set(user_id, scores[user_id])
+            elif operation == 'add':
+                delta = rng.randint(-5, 5)
+                scores[user_id] = scores.get(user_id, 0) + delta
+                board.add(user_id, delta)
+            else:
+                scores.pop(user_id, None)
+                board.remove(user_id)
+            self.assertMatchesNaiveSort(board, scores)
+        self.assertIsNone(board.rank(999))
+
+
+# ===== FAST SERIALIZERS =====
+class FastSerializerParityTests(TestCase):
+    """The .values() serializers must produce exactly what the DRF serializers they replace do."""
+
+    def test_students_match_student_serializer(self):
+        now = timezone.now().replace(microsecond=123456)
+        cases = [
+            # (gender, active, last login, profile's last activity, wallet)
+            ('male', True, now, None, True),
+            ('female', False, None, now - timedelta(days=2), True),
+            ('', True, None, None, True),  # falls back to the wallet's last update
+            ('other', True, None, None, False),  # no wallet yet
+        ]
+        for index, (gender, active, last_login, last_activity, has_wallet) in enumerate(cases):
+            user = User.objects.create_user(
+                username=f's{index}', password='x', email=f's{index}@example.com', user_type=2,
+                first_name=f'First{index}', gender=gender, is_active=active, last_login=last_login,
+            )
+            DimStudent.objects.create(user=user, level=index + 1, streak=index, last_activity=last_activity)
+            if has_wallet:
+                Wallet.objects.create(user=user, balance=10 * index)
+
+        students = DimStudent.objects.select_related('user__wallet').order_by('id')
+        expected = [list(row.items()) for row in StudentSerializer(students, many=True).data]
+        actual = [list(row.items()) for row in student_rows(students.values(*STUDENT_VALUES))]
+        self.assertEqual(actual, expected)  # same keys in the same order, too
+
+    def test_transactions_match_wallet_transaction_serializer(self):
+        student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        wallet = Wallet.objects.create(user=student)
+        timestamp = timezone.now().replace(microsecond=654321)
+        WalletTransaction.objects.bulk_create([
+            WalletTransaction(wallet=wallet, amount=5, transaction_type=kind, description=kind, timestamp=timestamp)
+            for kind in ('earn', 'spend', 'transfer', 'refund', 'adjustment', 'legacy')
+        ])
+
+        rows = WalletTransaction.objects.order_by('id')
+        expected = [list(row.items()) for row in WalletTransactionSerializer(rows, many=True).data]
+        actual = [list(row.items()) for row in transaction_rows(rows.values(*TRANSACTION_VALUES))]
+        self.assertEqual(actual, expected)
+
+
+# ===== STATEMENTS =====
+class StatementTests(TestCase):
+    """Balances anchored on Wallet.balance must agree with the ledger, archived rows included."""
+
+    def at(self, month, day):
+        return timezone.make_aware(datetime(2025, month, day, 12))
+
+    def test_march_statement(self):
+        alice, bob = (
+            User.objects.create_user(
+                username=name, password='x', email=f'{name}@example.com', user_type=2, first_name=name.title(),
+            )
+            for name in ('alice', 'bob')
+        )
+        # 40 earned in February and 100 on March 2 were archived (folded into the opening balance)
+        wallet = Wallet.objects.create(user=alice, balance=135, opening_balance=140, opening_balance_at=self.at(3, 3))
+        ArchivedWalletTransaction.objects.bulk_create([
+            ArchivedWalletTransaction(id=pk, wallet=wallet, amount=amount, transaction_type='earn', timestamp=at)
+            for pk, amount, at in ((1, 40, self.at(2, 10)), (2, 100, self.at(3, 2)))
+        ])
+        classmate = Wallet.objects.create(user=bob, balance=20)
+        WalletTransaction.objects.bulk_create([
+            WalletTransaction(wallet=wallet, amount=30, transaction_type='spend', timestamp=self.at(3, 5)),
+            WalletTransaction(wallet=wallet, amount=-20, transaction_type='transfer', timestamp=self.at(3, 10)),
+            WalletTransaction(wallet=classmate, amount=20, transaction_type='transfer', timestamp=self.at(3, 10)),
+            WalletTransaction(wallet=wallet, amount=5, transaction_type='adjustment', timestamp=self.at(3, 20)),
+            # after the month
+            WalletTransaction(wallet=wallet, amount=50, transaction_type='earn', timestamp=self.at(4, 2)),
+            WalletTransaction(wallet=wallet, amount=10, transaction_type='spend', timestamp=self.at(4, 3)),
+        ])
+
+        alices, bobs = statements(date(2025, 3, 1))
+        self.assertEqual((bobs.opening, bobs.closing, bobs.totals), (0, 20, {'transfer': 20}))
+        self.assertEqual((alices.opening, alices.closing), (40, 95))
+        self.assertEqual(alices.totals, {'earn': 100, 'spend': -30, 'transfer': -20, 'adjustment': 5})
+
+        rows = list(csv.reader(render_csv(alices).decode('utf-8-sig').splitlines()))
+        self.assertIn(['Opening balance', '40'], rows)
+        table = rows[rows.index(['Date', 'Type', 'Description', 'Amount', 'Balance']) + 1:]
+        self.assertEqual(table[:4], [
+            ['2025-03-02 12:00', 'earn', '', '100', '140'],
+            ['2025-03-05 12:00', 'spend', '', '-30', '110'],
+            ['2025-03-10 12:00', 'transfer', '', '-20', '90'],
+            ['2025-03-20 12:00', 'adjustment', '', '5', '95'],
+        ])
+        self.assertEqual(table[4:], [
+            [],
+            ['Total adjustment', '5'], ['Total earn', '100'], ['Total spend', '-30'], ['Total transfer', '-20'],
+            ['Closing balance', '95'],
+        ])
+
+
+# ===== REPLICAS =====
+@mock.patch.object(replicas, 'replica_configured', lambda: True)
+class ReplicaRoutingTests(TestCase):
+    """A second SQLite database stands in for a replica that hasn't caught up with the primary."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Not a test database the runner sets up: the alias exists only while this class runs
+        replica = {**connections.settings['default'], 'NAME': ':memory:', 'TEST': {}}
+        connections.settings[replicas.REPLICA_ALIAS] = connections.configure_settings(
+            {'default': connections.settings['default'], replicas.REPLICA_ALIAS: replica}
+        )[replicas.REPLICA_ALIAS]
+        with connections[replicas.REPLICA_ALIAS].schema_editor() as editor:
+            for model in (User, DimStudent, Wallet, WalletTransaction):
+                editor.create_model(model)
+        cls.databases = {'default', replicas.REPLICA_ALIAS}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[replicas.REPLICA_ALIAS].close()  # drops the in-memory database
+        del connections[replicas.REPLICA_ALIAS]
+        del connections.settings[replicas.REPLICA_ALIAS]
+
+    def setUp(self):
+        self.student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        Wallet.objects.create(user=self.student, balance=50)
+        User.objects.using(replicas.REPLICA_ALIAS).bulk_create([self.student])
+        Wallet.objects.using(replicas.REPLICA_ALIAS).create(user_id=self.student.pk, balance=10)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.student).access_token}')
+        cache.delete(replicas.PIN_KEY.format(self.student.pk))
+
+    def balance(self):
+        response = self.client.get(reverse('my_home'))
+        self.assertEqual(response.status_code, 200)
+        return response.data['balance']
+
+    def write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.balance(), 10)
+
+    def test_a_write_pins_its_user_to_the_primary(self):
+        self.write()
+        self.assertEqual(self.balance(), 50)
+
+    @mock.patch.object(replicas, 'STICKY_SECONDS', 1)
+    def test_the_pin_expires(self):
+        self.write()
+        self.assertEqual(self.balance(), 50)
+        time.sleep(1.1)
+        self.assertEqual(self.balance(), 10)
+
+    def test_awarded_students_are_pinned(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(outbox, 'DISPATCH_IN_PROCESS', False):
+            adjust_balances([self.student.pk], 5, 'Choir')
+        self.assertTrue(replicas.is_pinned(self.student.pk))
+        self.assertFalse(replicas.is_pinned(teacher.pk))
+        self.assertEqual(self.balance(), 55)
+
+
+# ===== SEARCH =====
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        for username, first_name, last_name in (
+            ('alovelace', 'Ada', 'Lovelace'), ('asmith', 'Adam', 'Smith'), ('ghopper', 'Grace', 'Hopper'),
+        ):
+            user = User.objects.create_user(
+                username=username, password='x', email=f'{username}@example.com', user_type=2,
+                first_name=first_name, last_name=last_name,
+            )
+            DimStudent.objects.create(user=user)
+        self.client = APIClient()
+        self.client.force_authenticate(teacher)
+
+    def names(self, query):
+        response = self.client.get(reverse('student-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.data)
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.names('ad'), ['Ada Lovelace', 'Adam Smith'])
+        self.assertEqual(self.names('hop'), ['Grace Hopper'])
+        self.assertEqual(self.names('ghop'), ['Grace Hopper'])  # username
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names('ada love'), ['Ada Lovelace'])
+        self.assertEqual(self.names('Lovelace, Ada'), ['Ada Lovelace'])
+        self.assertEqual(self.names('ada hopper'), [])
+
+    def test_no_match(self):
+        self.assertEqual(self.names('zzz'), [])
+        self.assertEqual(self.names('a'), [])  # too short to search
+
+
+# ===== SCAN SESSIONS =====
+class RecordingScanBuffer(scan_sessions.ScanBuffer):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.flushed = []
+
+    def flush(self, session_id):
+        credited = super().flush(session_id)
+        self.flushed.append(credited)
+        return credited
+
+
+class ScanSessionTests(TransactionTestCase):
+    """ScanBuffer instances stand in for the buffers of separate workers."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        self.students = [
+            User.objects.create_user(username=f's{index}', password='x', email=f's{index}@example.com', user_type=2)
+            for index in range(3)
+        ]
+        self.session = scan_sessions.open_session(self.teacher, 10, 'Sunday attendance')
+
+    def worker(self, **options):
+        """A buffer whose flusher thread never starts; the test flushes it."""
+        buffer = scan_sessions.ScanBuffer(**options)
+        buffer._start = lambda: None
+        return buffer
+
+    def scan(self, buffer, student):
+        return buffer.add(self.session.pk, self.teacher.pk, student.pk)
+
+    def wait_for_credits(self, buffer, credited, timeout=5):
+        """Wait for the buffer's flusher thread without reading tables it may be writing."""
+        deadline = time.monotonic() + timeout
+        while sum(buffer.flushed) < credited:
+            self.assertLess(time.monotonic(), deadline, 'Timed out waiting for the flusher')
+            time.sleep(0.02)
+
+    def balances(self):
+        wallets = dict(Wallet.objects.values_list('user_id', 'balance'))
+        return [wallets.get(student.pk) for student in self.students]
+
+    def test_a_student_is_credited_once(self):
+        first, second = self.worker(), self.worker()
+        self.assertTrue(self.scan(first, self.students[0]))
+        self.assertFalse(self.scan(first, self.students[0]))
+        self.assertTrue(self.scan(second, self.students[0]))  # another worker can't tell
+        self.assertEqual(first.flush(self.session.pk) + second.flush(self.session.pk), 1)
+        self.assertEqual(self.balances(), [10, None, None])
+        self.assertEqual(ScanSessionEntry.objects.count(), 1)
+
+    def test_flushes_at_the_threshold_and_on_the_timer(self):
+        by_size = RecordingScanBuffer(flush_seconds=60, flush_size=2)
+        self.scan(by_size, self.students[0])
+        self.scan(by_size, self.students[1])
+        self.wait_for_credits(by_size, 2)
+
+        by_timer = RecordingScanBuffer(flush_seconds=0.1, flush_size=100)
+        self.scan(by_timer, self.students[2])
+        self.wait_for_credits(by_timer, 1)
+        self.assertEqual(self.balances(), [10, 10, 10])
+
+    def test_close_elsewhere_rejects_new_scans_and_flushes_earlier_ones(self):
+        other = self.worker(recheck_seconds=0)
+        self.scan(other, self.students[0])
+        scan_sessions.close_session(self.session)  # on another worker
+        with self.assertRaises(scan_sessions.SessionClosed):
+            self.scan(other, self.students[1])
+        self.assertEqual(other.flush(self.session.pk), 1)
+        self.assertEqual(self.balances(), [10, None, None])
+
+    def test_a_failing_scan_does_not_hold_back_the_session(self):
+        buffer = self.worker(max_attempts=2)
+        self.scan(buffer, self.students[0])
+        buffer.add(self.session.pk, self.teacher.pk, 999_999)  # a deleted student: the foreign keys fail
+        with self.assertLogs('api.scan_sessions', 'WARNING'):
+            self.assertEqual(buffer.flush(self.session.pk), 1)
+        self.assertEqual(self.balances()[0], 10)
+        self.assertEqual(buffer.pending_count(self.session.pk), 1)
+        with self.assertLogs('api.scan_sessions', 'ERROR'):
+            self.assertEqual(buffer.flush(self.session.pk), 0)
+        self.assertEqual(buffer.pending_count(self.session.pk), 0)
+        self.assertEqual(list(buffer.parked[self.session.pk]), [999_999])
+
+
+# ===== TRANSFERS =====
+class TransferStressTests(TransactionTestCase):
+    """
+    Threads move points both ways between the same two wallets at once.
+    Nothing may deadlock or error out, no point may be created or lost, and
+    each balance must equal its opening balance plus its ledger rows.
+    """
+    THREADS = 8
+    TRANSFERS_PER_THREAD = 25
+    OPENING_BALANCE = 100
+
+    def test_crossing_transfers(self):
+        alice, bob = (
+            User.objects.create_user(username=name, password='x', email=f'{name}@example.com', user_type=2)
+            for name in ('stress_alice', 'stress_bob')
+        )
+        Wallet.objects.bulk_create([Wallet(user=user, balance=self.OPENING_BALANCE) for user in (alice, bob)])
+
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def run(index):
+            sender, recipient = (alice, bob) if index % 2 else (bob, alice)
+            try:
+                start.wait()
+                for amount in range(1, self.TRANSFERS_PER_THREAD + 1):
+                    try:
+                        transfer(sender, recipient, amount % 7 + 1, 'Stress test')
+                    except InsufficientBalance:
+                        pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        self.assertFalse([thread for thread in threads if thread.is_alive()], 'Transfers hung')
+        self.assertFalse(errors, errors)
+
+        wallets = Wallet.objects.filter(user__in=(alice, bob))
+        self.assertEqual(sum(wallet.balance for wallet in wallets), 2 * self.OPENING_BALANCE)
+        for wallet in wallets:
+            self.assertGreaterEqual(wallet.balance, 0)
+            ledger_total = wallet.transactions.aggregate(total=Sum('amount'))['total'] or 0
+            self.assertEqual(wallet.balance, self.OPENING_BALANCE + ledger_total)
+        transfers = WalletTransaction.objects.filter(transaction_type='transfer')
+        self.assertGreater(transfers.count(), 0)
+        self.assertEqual(transfers.count() % 2, 0)
+        self.assertEqual(transfers.aggregate(total=Sum('amount'))['total'], 0)
+
+
+# ===== ARCHIVAL =====
+class ArchivedLevelTests(TestCase):
+    """archive_ledger moves old earn rows out; compute_streaks must still count them."""
+
+    def test_level_survives_archiving(self):
+        student = User.objects.create_user(username='veteran', password='x', email='veteran@example.com', user_type=2)
+        profile = DimStudent.objects.create(user=student)
+        wallet = Wallet.objects.create(user=student, balance=250)
+        long_ago = timezone.now() - timedelta(days=400)
+        WalletTransaction.objects.bulk_create([
+            WalletTransaction(wallet=wallet, amount=200, transaction_type='earn', timestamp=long_ago),
+            WalletTransaction(wallet=wallet, amount=50, transaction_type='earn'),
+        ])
+
+        call_command('compute_streaks', '--full', stdout=StringIO())
+        profile.refresh_from_db()
+        self.assertEqual(profile.level, 3)
+
+        call_command('archive_ledger', stdout=StringIO())
+        self.assertEqual(ArchivedWalletTransaction.objects.filter(wallet=wallet).count(), 1)
+        call_command('compute_streaks', '--full', stdout=StringIO())
+        profile.refresh_from_db()
+        self.assertEqual(profile.level, 3)
+
+
+# ===== BOOTSTRAP =====
+class BootstrapFixtureTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/data.json'
+
+    def write(self, email, balance):
+        with open(self.path, 'w') as fixture:
+            json.dump([
+                {'model': 'api.user', 'pk': 7, 'fields': {
+                    'username': 'ada', 'password': 'x', 'email': email, 'user_type': 2,
+                }},
+                {'model': 'api.wallet', 'pk': 3, 'fields': {'user': 7, 'balance': balance}},
+            ], fixture)
+
+    def test_only_new_and_changed_rows_are_written(self):
+        self.write('ada@example.com', 10)
+        self.assertEqual(bootstrap_fixture(self.path), {
+            'api.User': {'inserted': 1, 'updated': 0, 'unchanged': 0},
+            'api.Wallet': {'inserted': 1, 'updated': 0, 'unchanged': 0},
+        })
+        User.objects.filter(pk=7).update(first_name='Ada')  # a column the fixture doesn't mention
+
+        self.write('ada@example.com', 25)
+        self.assertEqual(bootstrap_fixture(self.path), {
+            'api.User': {'inserted': 0, 'updated': 0, 'unchanged': 1},
+            'api.Wallet': {'inserted': 0, 'updated': 1, 'unchanged': 0},
+        })
+        self.assertEqual(Wallet.objects.get(pk=3).balance, 25)
+        self.assertEqual(User.objects.get(pk=7).first_name, 'Ada')
+
+    def test_insert_only_keeps_stored_rows(self):
+        self.write('ada@example.com', 10)
+        bootstrap_fixture(self.path)
+        self.write('new@example.com', 25)
+        stats = bootstrap_fixture(self.path, insert_only=True)
+        self.assertEqual(stats['api.Wallet'], {'inserted': 0, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(User.objects.get(pk=7).email, 'ada@example.com')
+        self.assertEqual(Wallet.objects.get(pk=3).balance, 10)
+
+    def test_an_applied_fixture_is_skipped(self):
+        self.write('ada@example.com', 10)
+        bootstrap_fixture(self.path)
+        Wallet.objects.filter(pk=3).update(balance=99)
+        self.assertIsNone(bootstrap_fixture(self.path))
+        self.assertEqual(Wallet.objects.get(pk=3).balance, 99)
+        self.assertEqual(bootstrap_fixture(self.path, force=True)['api.Wallet']['updated'], 1)
+        self.assertEqual(Wallet.objects.get(pk=3).balance, 10)
+
+    @mock.patch.object(home, 'CACHED', True)
+    def test_a_load_drops_the_caches_it_bypasses(self):
+        self.write('ada@example.com', 10)
+        bootstrap_fixture(self.path)
+        self.assertEqual(home.wallet_summary(7)['balance'], 10)
+        self.assertEqual(leaderboards.standing('overall', 7)[1], 10)
+
+        self.write('ada@example.com', 25)
+        with self.captureOnCommitCallbacks(execute=True):
+            bootstrap_fixture(self.path)
+        self.assertIsNone(cache.get(home.cache_key(7)))
+        self.assertEqual(home.wallet_summary(7)['balance'], 25)
+        self.assertEqual(leaderboards.standing('overall', 7)[1], 25)
+
+
+# ===== OUTBOX =====
+@mock.patch.object(outbox, 'DISPATCH_IN_PROCESS', False)  # the tests dispatch, not a background thread
+class OutboxDispatchTests(TransactionTestCase):
+    def test_award_side_effects_are_dispatched(self):
+        teacher = User.objects.create_user(username='t', password='x', email='t@example.com', user_type=1)
+        student = User.objects.create_user(username='s', password='x', email='s@example.com', user_type=2)
+        profile = DimStudent.objects.create(user=student)
+        Wallet.objects.create(user=student)
+        client = APIClient()
+        client.force_authenticate(teacher)
+        response = client.post(
+            reverse('student-award-points'), {'student_id': student.pk, 'points': 5, 'reason': 'Choir'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(QRScanLog.objects.exists())  # not until the outbox is drained
+
+        self.assertEqual(outbox.dispatch(), 1)
+        self.assertTrue(QRScanLog.objects.filter(user=student, scanned_by=teacher, points_given=5).exists())
+        self.assertEqual(
+            list(Notification.objects.filter(user=student).values_list('message', flat=True)),
+            ['You earned 5 points: Choir'],
+        )
+        student.refresh_from_db()
+        profile.refresh_from_db()
+        self.assertEqual(student.unread_notifications, 1)
+        self.assertIsNotNone(profile.last_activity)
+        self.assertEqual(OutboxEvent.objects.get().status, 'done')
+
+    def test_failing_events_back_off_then_are_parked(self):
+        payload = {
+            'student_id': 999_999, 'teacher_id': 999_999, 'points': 5, 'reason': 'Choir',
+            'is_deduction': False, 'at': timezone.now().isoformat(),
+        }
+        with transaction.atomic():
+            # The handler raises on the first; the second's missing users fail a foreign key at
+            # commit, which sends the whole batch through the per-event fallback
+            events = [
+                outbox.publish('points_awarded', {key: value for key, value in payload.items() if key != 'reason'}),
+                outbox.publish('points_awarded', payload),
+            ]
+        for attempt in range(1, outbox.MAX_ATTEMPTS + 1):
+            with self.assertLogs('api.outbox', 'WARNING'):
+                self.assertEqual(outbox.dispatch(), 2)
+            for event in events:
+                event.refresh_from_db()
+                self.assertEqual(event.attempts, attempt)  # one per dispatch, fallback or not
+            if attempt < outbox.MAX_ATTEMPTS:
+                self.assertEqual({event.status for event in events}, {'pending'})
+                self.assertGreater(min(event.available_at for event in events), timezone.now())
+                self.assertEqual(outbox.dispatch(), 0)  # backing off
+                OutboxEvent.objects.update(available_at=timezone.now())
+        self.assertEqual({event.status for event in events}, {'failed'})
+        self.assertEqual(outbox.dispatch(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+
+# ===== GUNICORN =====
+class DrainingWorkerTests(SimpleTestCase):
+    """A recycling worker serves the connections it already accepted before it exits."""
+
+    def slow_app(self, environ, start_response):
+        time.sleep(0.2)  # long enough for the worker to accept every waiting connection
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    def request(self, client):
+        client.sendall(b'GET / HTTP/1.0\r\n\r\n')
+        response = b''
+        while chunk := client.recv(4096):
+            response += chunk
+        return response.split(b'\r\n', 1)[0]
+
+    def test_accepted_connections_are_served_before_exit(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        cfg = Config()
+        for name, value in (('max_requests', 1), ('threads', 4), ('loglevel', 'warning')):
+            cfg.set(name, value)
+        worker = DrainingThreadWorker(0, os.getppid(), [listener], None, 30, cfg, Logger(cfg))
+        worker.wsgi = self.slow_app
+        self.addCleanup(worker.tmp.close)
+
+        first, idle = (socket.create_connection(listener.getsockname()) for _ in range(2))
+        self.addCleanup(first.close)
+        self.addCleanup(idle.close)
+        # Skip the process setup (signals, loading the app); the gthread loop itself runs as in production
+        with mock.patch.object(Worker, 'init_process', lambda worker: worker.run()):
+            thread = threading.Thread(target=worker.init_process, daemon=True)
+            thread.start()
+
+            self.assertEqual(self.request(first), b'HTTP/1.0 200 OK')  # the one request before recycling
+            # Plain gthread would already have exited and reset this accepted, not yet read connection
+            self.assertEqual(self.request(idle), b'HTTP/1.0 200 OK')
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(worker.accepting)
+        self.assertEqual(worker.nr, 2)
+
+
+# ===== STARTUP BUDGET =====
+# Modules that must stay out of a worker until a request needs them
+LAZY_MODULES = ('qrcode', 'PIL')
+STARTUP_MODULE_BUDGET = 900  # sys.modules after the first response (~800 today)
+STARTUP_BUDGET_SECONDS = 1.5  # import backend.wsgi + first response (~0.3 s today)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Boots a fresh worker (see api/benchmarks/startup.py) and checks what it loaded."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.probe = probe()
+
+    def test_first_response(self):
+        self.assertEqual(self.probe.status, 401)
+
+    def test_heavy_modules_load_lazily(self):
+        loaded = [
+            name for name in self.probe.modules
+            if name.split('.')[0] in LAZY_MODULES
+        ]
+        self.assertFalse(loaded, f'Imported at startup: {loaded}')
+
+    def test_module_budget(self):
+        self.assertLessEqual(len(self.probe.modules), STARTUP_MODULE_BUDGET)
+
+    @skipUnless(os.environ.get('BENCHMARK_TESTS'), 'wall-clock budget; set BENCHMARK_TESTS=1 on an idle machine')
+    def test_time_budget(self):
+        self.assertLess(
+            self.probe.first_response, STARTUP_BUDGET_SECONDS,
+            f'Slowest imports: {sorted(self.probe.imports, reverse=True)[:10]}',
+        )
@@ -1,15 +1,33 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import *
+from .views import (
+    NotificationViewSet, ProductViewSet, RecentActivityViewSet, ScanSessionViewSet, StudentViewSet, UserViewSet,
+    WalletViewSet, badge_sheet, health_live, health_ready, leaderboard, metrics, my_home, my_rank, recent_transactions, run_anniversary_bonuses,
+    teacher_stats, transaction_history, transfer_points,
+)
 
 router = DefaultRouter()
-router.register(r'users', UserViewSet)
-router.register(r'wallets', WalletViewSet)
+router.register(r'users', UserViewSet, basename="user")
+router.register(r'wallets', WalletViewSet, basename="wallet")
 router.register(r'products', ProductViewSet)
 router.register(r'recent-activity', RecentActivityViewSet, basename="recent-activity")
 router.register(r'students', StudentViewSet, basename="student")
+router.register(r'notifications', NotificationViewSet, basename="notification")
+router.register(r'scan-sessions', ScanSessionViewSet, basename="scan-session")
 
 urlpatterns = [
     path('teacher/stats/', teacher_stats, name='teacher_stats'),
     path('teacher/recent-transactions/', recent_transactions, name='recent_transactions'),
+    path('history/', transaction_history, name='transaction_history'),
+    path('me/home/', my_home, name='my_home'),
+    path('transfer/', transfer_points, name='transfer_points'),
+    path('teacher/bonuses/run/', run_anniversary_bonuses, name='run_anniversary_bonuses'),
+    path('leaderboard/', leaderboard, name='leaderboard'),
+    path('leaderboard/weekly/', leaderboard, {'board': 'weekly'}, name='leaderboard_weekly'),
+    path('leaderboard/gender/<str:gender>/', leaderboard, name='leaderboard_gender'),
+    path('leaderboard/me/', my_rank, name='leaderboard_me'),
+    path('metrics/', metrics, name='metrics'),
+    path('badges/', badge_sheet, name='badge_sheet'),
+    path('health/live/', health_live, name='health_live'),
+    path('health/ready/', health_ready, name='health_ready'),
 ] + router.urls
\ No newline at end of file
@@ -1,18 +1,40 @@
 # views.py
 # ADD THESE IMPORTS AT THE TOP (if not already there)
-from rest_framework import viewsets, generics, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework import mixins, viewsets, generics, permissions, status
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.pagination import CursorPagination
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum, Avg, Count
+from django.db import DatabaseError, connection, transaction as db_transaction
+from django.db.models import Sum, Avg, Count, F, Q
 from datetime import datetime, timedelta
-from .models import *
-from .serializers import *
+import base64
+import logging
+from .models import (
+    ArchivedQRScanLog, ArchivedWalletTransaction, DimStudent, Notification, Product, QRScanLog, ScanSession,
+    User, Wallet, WalletTransaction,
+)
+from .serializers import (
+    AwardPointsSerializer, BonusRunSerializer, BroadcastSerializer, NotificationSerializer,
+    ProductSerializer, QRStudentSerializer, ScanSessionSerializer, StudentSerializer, TransferSerializer,
+    UserSerializer, WalletSerializer, WalletTransactionSerializer,
+)
+from . import badges, home, notifications, outbox, replicas, scan_sessions, warmup
+from .bonuses import award_anniversary_bonuses
+from .metrics import registry as metrics_registry
+from .fast_serializers import STUDENT_VALUES, TRANSACTION_VALUES, student_rows, transaction_rows
+from .leaderboard import GENDER_BOARDS, leaderboards, record_balance_change, top_entries
+from .ledger import InsufficientBalance, transfer
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_students
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+logger = logging.getLogger(__name__)
+
 
 # ===== LOGIN API =====
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -38,18 +60,44 @@ class RecentActivityViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = WalletTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        # Hot path: plain rows instead of ModelSerializer instances
+        rows = self.get_queryset().values(*TRANSACTION_VALUES)
+        return Response(transaction_rows(rows))
+
     def get_queryset(self):
-        return WalletTransaction.objects.filter(
+        queryset = WalletTransaction.objects.filter(
             wallet__user=self.request.user
-        ).order_by("-timestamp")[:20]
+        ).order_by("-timestamp")
+        # Slicing only the list keeps detail lookups filterable
+        return queryset[:20] if self.action == 'list' else queryset
 
 
 # ===== STUDENT VIEWSET =====
 class StudentViewSet(viewsets.ModelViewSet):
-    queryset = DimStudent.objects.all()
+    queryset = DimStudent.objects.select_related('user', 'user__wallet')
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        # Hot path: the whole roster as plain rows in one query
+        rows = DimStudent.objects.order_by('id').values(*STUDENT_VALUES)
+        return Response(student_rows(rows))
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Find students by name, username or phone number, best match first
+        GET /api/students/search/?q=juan&limit=10
+        """
+        if request.user.user_type != 1:
+            return Response({'error': 'Only teachers can search students'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            limit = min(max(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(student_rows(search_students(request.GET.get('q', ''), limit)))
+
     @action(detail=False, methods=['post'], url_path='scan-qr')
     def scan_qr(self, request):
         """
@@ -66,11 +114,14 @@ class StudentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Find student by QR value
-            user = User.objects.get(qr_value=qr_value, user_type=2)
+            # Find student by QR value, with everything QRStudentSerializer reads
+            user = User.objects.select_related('wallet', 'student_profile').get(
+                qr_value=qr_value, user_type=2
+            )
             
             # Ensure wallet exists
-            Wallet.objects.get_or_create(user=user)
+            if not hasattr(user, 'wallet'):
+                Wallet.objects.create(user=user)
             
             # Serialize and return student data
             serializer = QRStudentSerializer(user, context={'request': request})
@@ -124,58 +175,60 @@ class StudentViewSet(viewsets.ModelViewSet):
         try:
             # Get student user
             student = get_object_or_404(User, id=student_id, user_type=2)
-            
-            # Get or create wallet
-            wallet, _ = Wallet.objects.get_or_create(user=student)
-            
-            # Validate sufficient balance for deductions
-            if is_deduction and wallet.balance < points:
-                return Response(
-                    {
-                        'error': f'Insufficient balance. Student only has {wallet.balance} points, cannot deduct {points} points.',
-                        'current_balance': wallet.balance
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Update balance based on mode
+
             if is_deduction:
-                wallet.balance -= points
                 transaction_type = 'spend'
                 action_verb = 'Deducted'
                 description = f"Purchase from {teacher.first_name} {teacher.last_name}: {reason}"
             else:
-                wallet.balance += points
                 transaction_type = 'earn'
                 action_verb = 'Awarded'
                 description = f"Awarded by {teacher.first_name} {teacher.last_name}: {reason}"
-            
-            wallet.save()
-            
-            # Create transaction record
-            transaction = WalletTransaction.objects.create(
-                wallet=wallet,
-                amount=points,
-                transaction_type=transaction_type,
-                description=description
-            )
-            
-            # Create QR scan log (only for awards, not deductions)
-            if not is_deduction:
-                QRScanLog.objects.create(
-                    user=student,
-                    scanned_by=teacher,
-                    points_given=points
+
+            # The request path is the balance UPDATE, the ledger row and an outbox
+            # row; the scan log, last_activity and notification follow from the
+            # outbox (api/outbox.py)
+            with db_transaction.atomic():
+                wallet, _ = Wallet.objects.get_or_create(user=student)
+                wallets = Wallet.objects.filter(pk=wallet.pk)
+                if is_deduction:
+                    # Conditional, so concurrent deductions can't overdraw
+                    wallets = wallets.filter(balance__gte=points)
+                if not wallets.update(
+                    balance=F('balance') + (-points if is_deduction else points), last_updated=timezone.now()
+                ):
+                    wallet.refresh_from_db(fields=['balance'])  # the balance the deduction was refused against
+                    return Response(
+                        {
+                            'error': (
+                                f'Insufficient balance. Student only has {wallet.balance} points, '
+                                f'cannot deduct {points} points.'
+                            ),
+                            'current_balance': wallet.balance
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                wallet.refresh_from_db(fields=['balance'])
+
+                # Create transaction record
+                transaction = WalletTransaction.objects.create(
+                    wallet=wallet,
+                    amount=points,
+                    transaction_type=transaction_type,
+                    description=description
                 )
-            
-            # Update student's last activity
-            try:
-                student_profile = DimStudent.objects.get(user=student)
-                student_profile.last_activity = timezone.now()
-                student_profile.save()
-            except DimStudent.DoesNotExist:
-                pass
-            
+                outbox.publish('points_awarded', {
+                    'student_id': student.id,
+                    'teacher_id': teacher.id,
+                    'points': points,
+                    'reason': reason,
+                    'is_deduction': is_deduction,
+                    'at': transaction.timestamp,
+                })
+                record_balance_change(student, wallet.balance, 0 if is_deduction else points)
+                replicas.pin_to_primary([student.id])
+                home.invalidate([student.id])
+
             # Serialize transaction
             transaction_serializer = WalletTransactionSerializer(transaction)
             
@@ -197,17 +250,140 @@ class StudentViewSet(viewsets.ModelViewSet):
             )
 
 
+# ===== SCAN SESSIONS =====
+class ScanSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Attendance bursts: scans are buffered and credited in batches (api/scan_sessions.py)
+    POST /api/scan-sessions/                 Body: { "points": 10, "reason": "Sunday attendance" }
+    GET  /api/scan-sessions/{id}/
+    POST /api/scan-sessions/{id}/scan/       Body: { "qr_value": "ABC123..." }
+    POST /api/scan-sessions/{id}/close/
+    """
+    serializer_class = ScanSessionSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        return ScanSession.objects.filter(teacher=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        if request.user.user_type != 1:
+            return Response({'error': 'Only teachers can open scan sessions'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        session = scan_sessions.open_session(request.user, **serializer.validated_data)
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        # Scans buffered by other workers are not counted until they flush
+        pending = scan_sessions.buffer.pending_count(session.pk)
+        return Response({**self.get_serializer(session).data, 'pending': pending})
+
+    @action(detail=True, methods=['post'])
+    def scan(self, request, pk=None):
+        """Acknowledge a scan without writing it; 202 when queued, 200 for a repeat scan"""
+        if request.user.user_type != 1:
+            return Response({'error': 'Only teachers can scan'}, status=status.HTTP_403_FORBIDDEN)
+        qr_value = request.data.get('qr_value')
+        if not qr_value:
+            return Response({'error': 'QR value is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        student = (
+            User.objects.filter(qr_value=qr_value, user_type=2)
+            .values('id', 'first_name', 'last_name').first()
+        )
+        if student is None:
+            return Response({'error': 'Student not found with this QR code'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            queued = scan_sessions.buffer.add(int(pk), request.user.id, student['id'])
+        except ScanSession.DoesNotExist:
+            return Response({'error': 'Scan session not found'}, status=status.HTTP_404_NOT_FOUND)
+        except scan_sessions.SessionClosed:
+            return Response({'error': 'Scan session is closed'}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            {
+                'queued': queued,
+                'duplicate': not queued,
+                'student': student,
+                'pending': scan_sessions.buffer.pending_count(int(pk)),
+            },
+            status=status.HTTP_202_ACCEPTED if queued else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        """Close the session and write this worker's buffered scans before responding"""
+        session = self.get_object()
+        flushed = scan_sessions.close_session(session)
+        session.refresh_from_db(fields=['awarded_count', 'last_flushed_at'])
+        return Response({**self.get_serializer(session).data, 'flushed': flushed})
+
+
 # ===== OTHER VIEWSETS =====
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class IdCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key, no COUNT(*)
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'id'
+
+
+class SparseFieldsetViewMixin:
+    """
+    Reads accept ?fields=id,balance: the serializer renders only those
+    fields and the queryset loads only their columns. Every field of
+    these serializers is a model field, so the names map straight to .only().
+    """
+
+    def requested_fields(self):
+        if self.request.method not in permissions.SAFE_METHODS or not self.request.query_params.get('fields'):
+            return None
+        requested = [name.strip() for name in self.request.query_params['fields'].split(',') if name.strip()]
+        unknown = sorted(set(requested) - set(self.get_serializer_class().Meta.fields))
+        if unknown:
+            raise ValidationError({'error': f"Unknown fields: {', '.join(unknown)}"})
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.requested_fields()
+        return queryset.only(*fields) if fields else queryset
+
+
+class UserViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    """Teachers see and edit every user, students only see themselves."""
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
 
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        if request.method not in permissions.SAFE_METHODS and request.user.user_type != 1:
+            self.permission_denied(request, message='Only teachers can change users')
 
-class WalletViewSet(viewsets.ModelViewSet):
-    queryset = Wallet.objects.all()
+    def get_queryset(self):
+        if self.request.user.user_type == 1:
+            return User.objects.all()
+        return User.objects.filter(pk=self.request.user.pk)
+
+
+class WalletViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """Teachers see every wallet, students only their own. Balances change through the ledger only."""
     serializer_class = WalletSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        if self.request.user.user_type == 1:
+            return Wallet.objects.all()
+        return Wallet.objects.filter(user=self.request.user)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -216,9 +392,184 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
+# ===== LEDGER HISTORY =====
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transaction_history(request):
+    """
+    Wallet transaction history, newest first, keyset-paginated
+    GET /api/history/?limit=50&type=earn&cursor=<next>&include_archived=1
+    Teachers may add ?student_id=<user id>; students always get their own.
+    include_archived also pages through rows moved out by archive_ledger.
+    """
+    owner_id = request.user.id
+    try:
+        if request.user.user_type == 1 and request.GET.get('student_id'):
+            owner_id = int(request.GET['student_id'])
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+        cursor = decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    except ValueError:
+        return Response({'error': 'Invalid student_id, limit or cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def page(model):
+        queryset = model.objects.filter(wallet__user_id=owner_id)
+        if request.GET.get('type'):
+            queryset = queryset.filter(transaction_type=request.GET['type'])
+        if cursor:
+            timestamp, pk = cursor
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+        return list(queryset.order_by('-timestamp', '-id').values(*TRANSACTION_VALUES)[:limit + 1])
+
+    rows = page(WalletTransaction)
+    if request.GET.get('include_archived') in ('1', 'true'):
+        # Archived rows keep their ids, so one (timestamp, id) cursor covers both tables
+        rows = sorted(
+            rows + page(ArchivedWalletTransaction),
+            key=lambda row: (row['timestamp'], row['id']),
+            reverse=True,
+        )[:limit + 1]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+    return Response({'results': transaction_rows(rows), 'next': next_cursor})
+
+
+# ===== STUDENT HOME =====
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_home(request):
+    """
+    Everything the app's start screen needs in one request
+    GET /api/me/home/
+    Profile, balance, level/streak, latest transactions and unread count.
+    """
+    return Response(home.home_payload(request, request.user))
+
+
+# ===== TRANSFERS =====
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def transfer_points(request):
+    """
+    Move points between two wallets
+    POST /api/transfer/
+    Body: { "recipient_id": 2, "amount": 10, "note": "Thanks!", "sender_id": 3 }
+    Students send from their own wallet to another student; teachers may
+    move points between any two wallets with sender_id.
+    """
+    input_serializer = TransferSerializer(data=request.data)
+    if not input_serializer.is_valid():
+        return Response({'error': input_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    data = input_serializer.validated_data
+
+    is_teacher = request.user.user_type == 1
+    if 'sender_id' in data and not is_teacher:
+        return Response({'error': 'Only teachers can transfer from another wallet'}, status=status.HTTP_403_FORBIDDEN)
+    sender_id = data.get('sender_id', request.user.id)
+    if sender_id == data['recipient_id']:
+        return Response({'error': 'Sender and recipient must differ'}, status=status.HTTP_400_BAD_REQUEST)
+
+    users = User.objects.only('id', 'first_name', 'last_name', 'user_type', 'gender').in_bulk(
+        [sender_id, data['recipient_id']]
+    )
+    sender, recipient = users.get(sender_id), users.get(data['recipient_id'])
+    if sender is None or recipient is None or (not is_teacher and recipient.user_type != 2):
+        return Response({'error': 'Sender or recipient not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        sent, received = transfer(sender, recipient, data['amount'], data['note'])
+    except InsufficientBalance as e:
+        return Response(
+            {'error': f"Insufficient balance. Only {e.balance} points available.", 'current_balance': e.balance},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    notifications.notify(
+        recipient.id, f"{sender.first_name} {sender.last_name} sent you {data['amount']} points"
+    )
+    return Response({
+        'success': True,
+        'sent': WalletTransactionSerializer(sent).data,
+        'received': WalletTransactionSerializer(received).data,
+    })
+
+
+# ===== NOTIFICATIONS =====
+class NotificationPagination(CursorPagination):
+    # Keyset pagination served by the (user, -created_at) index
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
+    lookup_value_regex = r'\d+'  # anything else is a 404, not a failed integer lookup
+
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        GET /api/notifications/unread-count/
+        """
+        return Response({'unread': notifications.unread_count(request.user)})
+
+    @action(detail=True, methods=['post'], url_path='read')
+    def read(self, request, pk=None):
+        """
+        POST /api/notifications/{id}/read/
+        """
+        notifications.mark_read(request.user, pk)
+        return Response({'unread': notifications.unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='mark-all-read')
+    def mark_all_read(self, request):
+        """
+        POST /api/notifications/mark-all-read/
+        """
+        updated = notifications.mark_all_read(request.user)
+        return Response({'updated': updated, 'unread': 0})
+
+    @action(detail=False, methods=['post'], url_path='broadcast')
+    def broadcast(self, request):
+        """
+        Send a message to the whole class (or the listed students)
+        POST /api/notifications/broadcast/
+        Body: { "message": "See you Sunday!", "student_ids": [1, 2] }
+        """
+        if request.user.user_type != 1:
+            return Response(
+                {'error': 'Only teachers can broadcast messages'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        input_serializer = BroadcastSerializer(data=request.data)
+        if not input_serializer.is_valid():
+            return Response(
+                {'error': input_serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        students = User.objects.filter(user_type=2, is_active=True)
+        student_ids = input_serializer.validated_data.get('student_ids')
+        if student_ids is not None:
+            students = students.filter(id__in=student_ids)
+
+        sent = notifications.broadcast(
+            list(students.values_list('id', flat=True)),
+            input_serializer.validated_data['message'],
+        )
+        return Response({'success': True, 'sent': sent}, status=status.HTTP_201_CREATED)
+
+
 # ===== 🆕 TEACHER DASHBOARD STATS =====
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replicas.use_replica()  # aggregates tolerate replication lag, even for pinned teachers
 def teacher_stats(request):
     """
     Get comprehensive statistics for teacher dashboard
@@ -244,10 +595,11 @@ def teacher_stats(request):
         last_activity__gte=week_ago
     ).count()
     
-    # Total points awarded by this teacher (from QR scans)
-    total_points_awarded = QRScanLog.objects.filter(
-        scanned_by=user
-    ).aggregate(total=Sum('points_given'))['total'] or 0
+    # Total points awarded by this teacher (from QR scans, archived ones included)
+    total_points_awarded = sum(
+        model.objects.filter(scanned_by=user).aggregate(total=Sum('points_given'))['total'] or 0
+        for model in (QRScanLog, ArchivedQRScanLog)
+    )
     
     # Points awarded this week
     this_week_points = QRScanLog.objects.filter(
@@ -345,6 +697,163 @@ def recent_transactions(request):
     return Response(transactions)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def run_anniversary_bonuses(request):
+    """
+    Award today's (or a missed earlier day this year's) birthday and salvation-anniversary bonuses
+    POST /api/teacher/bonuses/run/
+    Body: { "date": "2025-10-05" }  # Optional, this year and not in the future
+    """
+    if request.user.user_type != 1:
+        return Response({'error': 'Only teachers can run bonuses'}, status=status.HTTP_403_FORBIDDEN)
+
+    input_serializer = BonusRunSerializer(data=request.data)
+    if not input_serializer.is_valid():
+        return Response({'error': input_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    on_date = input_serializer.validated_data.get('date') or timezone.localdate()
+    awarded = award_anniversary_bonuses(on_date)
+    return Response({'success': True, 'date': on_date, 'awarded': awarded})
+
+
+# ===== LEADERBOARD =====
+LEADERBOARD_NAMES = ('overall', 'weekly') + GENDER_BOARDS
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboard(request, board='overall', gender=None):
+    """
+    Ranked students for a board
+    GET /api/leaderboard/?limit=10&offset=0           (current balance)
+    GET /api/leaderboard/weekly/                      (points earned this week)
+    GET /api/leaderboard/gender/<male|female>/        (current balance)
+    """
+    if gender is not None:
+        board = gender if gender in GENDER_BOARDS else None
+    if board not in LEADERBOARD_NAMES:
+        return Response({'error': f'Unknown leaderboard: {board}'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rank, points, total = leaderboards.standing(board, request.user.id)
+    return Response({
+        'board': board,
+        'total': total,
+        'entries': top_entries(board, limit, offset),
+        'me': {'rank': rank, 'points': points} if rank else None,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_rank(request):
+    """
+    The caller's rank on every board they appear on
+    GET /api/leaderboard/me/
+    """
+    ranks = {}
+    for board in LEADERBOARD_NAMES:
+        rank, points, total = leaderboards.standing(board, request.user.id)
+        if rank:
+            ranks[board] = {'rank': rank, 'points': points, 'total': total}
+    return Response(ranks)
+
+
+# ===== METRICS =====
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Per-view latency histograms, query counts and DB time for this worker (Prometheus text format)
+    GET /api/metrics/
+    """
+    return HttpResponse(
+        metrics_registry.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+# ===== HEALTH =====
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def health_live(request):
+    """
+    Liveness for the platform's health checks: never touches the database
+    GET /api/health/live/
+    """
+    return Response({'status': 'ok'})
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def health_ready(request):
+    """
+    Readiness: this worker is warmed up (see api/warmup.py) and the database answers.
+    The first call warms a worker the server didn't warm.
+    GET /api/health/ready/
+    """
+    try:
+        timings = warmup.warm_up()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        # Unauthenticated: driver messages can name the host and user, so they only go to the log
+        logger.exception('Readiness check failed')
+        return Response({'status': 'unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({
+        'status': 'ready',
+        'warm_up_ms': {step: round(seconds * 1000, 1) for step, seconds in timings.items()},
+    })
+
+
+# ===== QR BADGES =====
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def badge_sheet(request):
+    """
+    Printable QR badges, 12 to an A4 page, for the given (default: all active) students
+    GET /api/badges/?student_ids=1,2,3              -> PDF, streamed as pages render
+    GET /api/badges/?student_ids=1,2,3&output=png&page=2  -> one page as PNG
+    Pages render in this worker; `manage.py render_badges` uses the process pool.
+    """
+    if request.user.user_type != 1:
+        return Response({'error': 'Only teachers can print badges'}, status=status.HTTP_403_FORBIDDEN)
+    student_ids = request.query_params.get('student_ids')
+    output = request.query_params.get('output', 'pdf')
+    if output not in badges.FORMATS:
+        return Response({'error': f'output must be one of {", ".join(badges.FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        student_ids = [int(pk) for pk in student_ids.split(',')] if student_ids else None
+        page = int(request.query_params.get('page', 1))
+    except ValueError:
+        return Response({'error': 'student_ids and page must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = badges.badge_rows(student_ids)
+    if not rows:
+        return Response({'error': 'No students to print'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if output == 'png':
+        pages = badges.pages_of(rows)
+        if not 1 <= page <= len(pages):
+            return Response({'error': f'page must be between 1 and {len(pages)}'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(badges.render_png_page(pages[page - 1]), content_type=badges.FORMATS['png'])
+        response['Content-Disposition'] = f'inline; filename="badges-{page:03d}.png"'
+        return response
+
+    response = StreamingHttpResponse(badges.badge_sheet(rows, workers=1), content_type=badges.FORMATS['pdf'])
+    response['Content-Disposition'] = 'attachment; filename="badges.pdf"'
+    return response
+
+
 # ===== HELPER FUNCTIONS =====
 def calculate_trend(current, previous):
     """
@@ -357,6 +866,24 @@ def calculate_trend(current, previous):
     return round(change, 1)
 
 
+def encode_cursor(timestamp, pk):
+    """
+    Opaque keyset cursor for (timestamp, id) pagination
+    """
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor; raises ValueError on garbage
+    """
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(str(e))
+    return datetime.fromisoformat(timestamp), int(pk)
+
+
 def format_timestamp(dt):
     """
     Format timestamp in a human-readable way
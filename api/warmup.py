@@ -0,0 +1,107 @@
+"""
+Warm-up for a freshly started server process.
+
+A cold worker pays for the URLconf, views, serializers and the QR stack
+on its first requests, opens its database connections (or pool) on
+demand and builds the leaderboards from scratch, so the first scan and
+dashboard after a deploy are slow. warm_up() does all of that ahead of
+traffic and records how long each step took.
+
+gunicorn.conf.py runs it in the master after preloading, where imports,
+the leaderboards and the database pages touched by the catalog and roster
+queries end up shared with every forked worker, and again in each worker,
+which then only opens its own connections (the master's are released
+before forking). Other servers warm a worker on its first
+/api/health/ready/ instead. Nothing runs from AppConfig.ready: migrations,
+the shell and the tests don't want it.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+ROSTER_SAMPLE = 50  # rows serialized once to exercise the roster and catalog code paths
+
+_lock = threading.Lock()
+_done = {}  # step -> seconds, for this process
+_pid = None
+
+
+HOT_PATHS = ('/api/students/scan-qr/', '/api/students/award-points/', '/api/teacher/stats/', '/api/me/home/')
+
+
+def import_modules():
+    resolver = get_resolver()
+    for path in HOT_PATHS:
+        resolver.resolve(path)  # imports urls, views and serializers, and compiles the URL patterns on the way
+    from . import serializers
+    serializers.generate_qr_image('warm-up')  # qrcode and PIL are only imported on first use
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+        if getattr(connection, 'pool', None) is not None:
+            # The pool stays open with its min_size connections, ready for any thread
+            connection.close()
+    # Without a pool, Django connections are per thread: this only opens the
+    # warming thread's, which serves requests on sync workers but not gthread ones
+
+
+def release_connections():
+    """Close this process's connections and pools, so a fork inherits no open sockets."""
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if connection.alias in getattr(connection, '_connection_pools', {}):
+            connection.close_pool()
+
+
+def prime_caches():
+    from .fast_serializers import STUDENT_VALUES, TRANSACTION_VALUES, student_rows, transaction_rows
+    from .leaderboard import leaderboards
+    from .models import DimStudent, Product, User, WalletTransaction
+    from .serializers import ProductSerializer, QRStudentSerializer
+
+    leaderboards.top('overall', 1)  # builds every board
+    ProductSerializer(Product.objects.all()[:ROSTER_SAMPLE], many=True).data
+    student_rows(DimStudent.objects.order_by('id').values(*STUDENT_VALUES)[:ROSTER_SAMPLE])
+    transaction_rows(WalletTransaction.objects.order_by('-timestamp').values(*TRANSACTION_VALUES)[:ROSTER_SAMPLE])
+    student = User.objects.select_related('wallet', 'student_profile').filter(user_type=2).first()
+    if student is not None:
+        QRStudentSerializer(student).data
+
+
+# Imports and caches carry over a fork; connections belong to one process
+STEPS = {'imports': import_modules, 'connections': open_connections, 'caches': prime_caches}
+PER_PROCESS = {'connections'}
+
+
+def warm_up(steps=None):
+    """Run the given (default: all) steps not yet done in this process. Returns {step: seconds}."""
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            for step in PER_PROCESS:
+                _done.pop(step, None)
+            _pid = os.getpid()
+        ran = []
+        for name in steps or STEPS:
+            if name not in _done:
+                started = time.perf_counter()
+                STEPS[name]()
+                _done[name] = time.perf_counter() - started
+                ran.append(name)
+        if ran:
+            logger.info('Warmed up pid %s: %s', _pid, ', '.join(
+                f'{name} {_done[name] * 1000:.0f} ms' for name in ran
+            ))
+        return dict(_done)
+
+
+def is_warm():
+    return _pid == os.getpid() and len(_done) == len(STEPS)
@@ -0,0 +1,76 @@
+"""
+Database configuration and connection tuning.
+
+Postgres (``DATABASE_URL``) gets psycopg 3's built-in connection pool when
+psycopg and psycopg_pool are installed, and persistent connections
+otherwise. The SQLite fallback used for small deployments is switched to
+WAL with pragmas applied on every new connection, so concurrent scans wait
+for the write lock instead of failing with "database is locked".
+
+Set ``DB_TUNING=off`` to get Django's defaults back (for benchmarking).
+"""
+import os
+from importlib.util import find_spec
+
+import dj_database_url
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',        # readers no longer block the writer
+    'synchronous': 'NORMAL',      # safe with WAL, far fewer fsyncs
+    'busy_timeout': 5000,         # ms to wait for the write lock
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,         # KiB (negative = size, not pages)
+    'temp_store': 'MEMORY',
+}
+SQLITE_TIMEOUT_SECONDS = 20
+
+
+def tuning_enabled():
+    return os.environ.get('DB_TUNING', 'on').lower() not in ('0', 'off', 'false', 'no')
+
+
+def pool_available():
+    return find_spec('psycopg') is not None and find_spec('psycopg_pool') is not None
+
+
+def tune_sqlite(config, replica=False):
+    options = config.setdefault('OPTIONS', {})
+    options['init_command'] = ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items())
+    if not replica:
+        # Take the write lock at BEGIN so lock upgrades can't fail mid-transaction
+        options['transaction_mode'] = 'IMMEDIATE'
+    options['timeout'] = SQLITE_TIMEOUT_SECONDS
+    return config
+
+
+def tune_postgres(config):
+    if not pool_available() or os.environ.get('DB_POOL', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return config
+    # Pooling replaces persistent connections; Django rejects both at once
+    config['CONN_MAX_AGE'] = 0
+    config.setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+    return config
+
+
+def database_config(base_dir, url=None, replica=False):
+    """The settings dict for one database alias; ``replica`` aliases are only read from."""
+    url = url or os.environ.get('DATABASE_URL')
+    if url:
+        config = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    else:
+        config = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+        }
+
+    if not tuning_enabled():
+        return config
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        return tune_sqlite(config, replica)
+    if config['ENGINE'] == 'django.db.backends.postgresql':
+        return tune_postgres(config)
+    return config
@@ -0,0 +1,55 @@
+"""
+Gunicorn worker classes used by gunicorn.conf.py.
+
+Gunicorn's gthread worker stops the moment it reaches max_requests, and
+connections it had already accepted but not started reading are reset.
+Under load that is a failed request or two on every recycle.
+
+DrainingThreadWorker reaches into ThreadWorker's internals (poller,
+_lock, nr_conns, and the max_requests check in handle_request), which
+are not a public API. It is written against gunicorn 23.0 (pinned in
+requirements.txt); check it against gthread.py before upgrading.
+DrainingWorkerTests in api/tests.py exercises the drain.
+"""
+import sys
+import time
+
+from gunicorn.workers.gthread import ThreadWorker
+
+
+class DrainingThreadWorker(ThreadWorker):
+    """gthread, but a recycling worker stops accepting and finishes its connections before exiting."""
+
+    def init_process(self):
+        # Take over the max_requests check so the base class never stops mid-queue
+        self.recycle_after, self.max_requests = self.max_requests, sys.maxsize
+        self.draining_since = None
+        self.accepting = True
+        super().init_process()
+
+    def handle_request(self, req, conn):
+        keepalive = super().handle_request(req, conn)
+        if self.nr >= self.recycle_after and self.draining_since is None:
+            self.log.info('Autorestarting worker after %s requests.', self.nr)
+            self.draining_since = time.monotonic()
+        return keepalive and self.draining_since is None
+
+    def finish_request(self, fs):
+        super().finish_request(fs)
+        self._stop_when_drained()
+
+    def notify(self):
+        # Called by the main loop on every pass, so the listeners are only touched from its thread
+        super().notify()
+        if self.draining_since is not None and self.accepting:
+            with self._lock:
+                for sock in self.sockets:
+                    self.poller.unregister(sock)  # the other workers take new connections
+            self.accepting = False
+        self._stop_when_drained()
+
+    def _stop_when_drained(self):
+        if self.draining_since is None or self.accepting:
+            return
+        if self.nr_conns <= 0 or time.monotonic() - self.draining_since > self.cfg.graceful_timeout:
+            self.alive = False
@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-import dj_database_url
+
+from .db import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.RequestMetricsMiddleware',  # query count, DB time and latency per request
+    'api.middleware.CompressionMiddleware',  # brotli/gzip above COMPRESSION_MIN_BYTES
+    'api.middleware.ReplicaRoutingMiddleware',  # safe requests read from DATABASE_REPLICA_URL
     'corsheaders.middleware.CorsMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,23 +103,36 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 #     }
 # }
 
-# Database configuration
-if 'DATABASE_URL' in os.environ:
-    DATABASES = {
-        'default': dj_database_url.config(
-            default=os.environ['DATABASE_URL'],
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
-    }
-else:
-    DATABASES = {
+# Database configuration (pooling and SQLite pragmas live in backend/db.py)
+DATABASES = {
+    'default': database_config(BASE_DIR),
+}
+
+# Cache shared by every server process: the /api/me/home/ summaries (api/home.py)
+# and the replica pins below must look the same from every worker. Without
+# REDIS_URL each process gets its own in-memory cache, the home summaries
+# aren't cached at all and gunicorn.conf.py defaults to a single worker.
+SHARED_CACHE = bool(os.environ.get('REDIS_URL'))
+if SHARED_CACHE:
+    CACHES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
         }
     }
 
+# Optional read replica for safe requests and reports (see api/replicas.py).
+# Users are pinned to the primary for REPLICA_STICKY_SECONDS after a write;
+# set REDIS_URL (above) when running more than one process. Run the
+# test suite without it: TestCase data is uncommitted, so a mirror can't see it.
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = database_config(
+        BASE_DIR, url=os.environ['DATABASE_REPLICA_URL'], replica=True
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['api.replicas.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -176,12 +193,70 @@ from datetime import timedelta
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+    ),
+    # Compact JSON (orjson when installed); the browsable API only while debugging
+    "DEFAULT_RENDERER_CLASSES": ("api.renderers.FastJSONRenderer",)
+    + (("rest_framework.renderers.BrowsableAPIRenderer",) if DEBUG else ()),
 }
 
+# Response compression (see api.middleware.CompressionMiddleware)
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
 }
 
+
+# Request metrics (see api/middleware.py and /api/metrics/)
+METRICS_WINDOW_SECONDS = 300
+METRICS_SLOWEST_QUERIES = 3
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # One JSON line per request from RequestMetricsMiddleware, logged at
+        # INFO; off unless REQUEST_LOG_LEVEL=INFO (/api/metrics/ has the totals)
+        "api.requests": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Gamification
+LEADERBOARD_TTL_SECONDS = 300
+HOME_CACHE_SECONDS = 300  # /api/me/home/ wallet summary (SHARED_CACHE only), invalidated on wallet writes
+STREAK_PERIOD_DAYS = 7  # youth group meets weekly, so a streak counts consecutive weeks
+POINTS_PER_LEVEL = 100
+BIRTHDAY_BONUS_POINTS = 50
+SALVATION_BONUS_POINTS = 50
+
+# Ledger archival (python manage.py archive_ledger, see api/archival.py)
+LEDGER_ARCHIVE_AFTER_DAYS = int(os.environ.get('LEDGER_ARCHIVE_AFTER_DAYS', 365))
+LEDGER_ARCHIVE_BATCH_SIZE = 1000
+
+# Scan sessions buffer scans per worker and write them in batches (see api/scan_sessions.py)
+SCAN_SESSION_FLUSH_SECONDS = 2
+SCAN_SESSION_FLUSH_SIZE = 100
+SCAN_SESSION_FLUSH_MAX_ATTEMPTS = 5  # then a scan that keeps failing is parked and logged
+SCAN_SESSION_RECHECK_SECONDS = 1  # how long a worker trusts that a session is still open
+
+# Side effects of point awards go through a transactional outbox (see api/outbox.py). Each web
+# process drains it in a background thread unless a `manage.py dispatch_outbox --interval 1`
+# worker does, in which case set OUTBOX_DISPATCH_IN_PROCESS=false.
+OUTBOX_DISPATCH_IN_PROCESS = os.environ.get('OUTBOX_DISPATCH_IN_PROCESS', 'true').lower() != 'false'
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_POLL_SECONDS = 5
+
+# render_badges and generate_statements render in a process pool (see api/rendering.py); unset means one per CPU
+RENDER_WORKERS = int(os.environ['RENDER_WORKERS']) if os.environ.get('RENDER_WORKERS') else None
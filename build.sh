@@ -7,7 +7,7 @@ python manage.py collectstatic --no-input
 python manage.py migrate
 python manage.py create_superuser
 
-# Load initial data if it exists
+# Load initial data if it exists (skipped when data.json hasn't changed)
 if [ -f data.json ]; then
-    python manage.py loaddata data.json
+    python manage.py bootstrap_data data.json --insert-only
 fi
\ No newline at end of file
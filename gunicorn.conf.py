@@ -0,0 +1,129 @@
+"""
+Gunicorn production profile, read from the working directory: start the app
+with plain `gunicorn` (an app argument on the command line would override
+wsgi_app below).
+
+The app is preloaded in the master so Django, DRF and the project's modules
+are imported once and shared copy-on-write by every worker; gc.freeze()
+before each fork keeps the collector from touching (and so copying) those
+pages. Workers are gthread by default: requests mostly wait on the
+database, so a few threads per process serve more than extra processes
+would, for far less memory. GUNICORN_WORKER_CLASS=uvicorn serves
+backend/asgi.py instead.
+
+Sizing follows the host: 2 x CPUs + 1 workers, capped by the memory
+available to the container at GUNICORN_WORKER_MEMORY_MB each. That needs
+the shared cache (REDIS_URL, see backend/settings.py): replica pins and
+home summaries kept in a per-process cache go stale across workers, so
+without it the default is a single worker and its threads. Workers are
+recycled after roughly GUNICORN_MAX_REQUESTS requests, with jitter so they
+don't all restart together. Every knob can be overridden from the
+environment; WEB_CONCURRENCY sets the worker count outright.
+
+The master and then each worker run api.warmup before taking traffic.
+
+Compare profiles with `python manage.py bench_server`.
+"""
+import gc
+import importlib.util
+import os
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+def memory_bytes():
+    """Memory available to this container: the cgroup limit if there is one, else physical RAM."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as limit:
+                value = limit.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # cgroup v1 reports "no limit" as a huge number
+            return int(value)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_workers(worker_memory_mb):
+    if not os.environ.get('REDIS_URL'):
+        return 1  # settings.SHARED_CACHE is off: every process would have its own cache
+    workers = 2 * cpu_count() + 1
+    memory = memory_bytes()
+    if memory:
+        # Leave a worker's worth for the master and the preloaded, shared pages
+        workers = min(workers, memory // (worker_memory_mb * 1024 * 1024) - 1)
+    return max(workers, 1)
+
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'backend.gunicorn_workers.DrainingThreadWorker',  # gthread that recycles without resets
+    # uvicorn-worker is where UvicornWorker lives since uvicorn deprecated its copy
+    'uvicorn': 'uvicorn_worker.UvicornWorker' if importlib.util.find_spec('uvicorn_worker')
+    else 'uvicorn.workers.UvicornWorker',
+}
+worker_type = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+wsgi_app = 'backend.asgi:application' if worker_type == 'uvicorn' else 'backend.wsgi:application'
+worker_class = WORKER_CLASSES[worker_type]
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = env_int('WEB_CONCURRENCY', default_workers(env_int('GUNICORN_WORKER_MEMORY_MB', 128)))
+threads = env_int('GUNICORN_THREADS', 4) if worker_type == 'gthread' else 1
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 5)
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = 30
+keepalive = 5  # the platform's proxy keeps connections open between requests
+
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'  # heartbeat file; a slow container disk can stall it into a timeout
+
+
+def warm(log, steps=None):
+    from api import warmup
+
+    try:
+        warmup.warm_up(steps)
+    except Exception:
+        log.exception('Warm-up failed; /api/health/ready/ retries it')
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        warm(server.log, steps=('imports', 'caches'))  # in the master, so every worker shares the result
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        from api.warmup import release_connections
+
+        # In the master: a connection inherited by a worker would share its socket
+        # with every other worker, and closing it there would end the master's session
+        release_connections()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:  # otherwise the worker hasn't loaded Django yet
+        from django.db import connections
+
+        connections.close_all()  # the worker opens its own connections on first use
+
+
+def post_worker_init(worker):
+    warm(worker.log)  # the worker's own connections, plus everything else without preload